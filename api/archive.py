@@ -0,0 +1,208 @@
+"""Move tombstones past the retention window out of the hot tables, in small batches.
+
+Soft deletes leave the row behind with deleted_at set, so GET /changes can report
+the removal. Once a tombstone is older than ARCHIVE_RETENTION_DAYS it is moved to
+<table>_archive (same columns plus archived_at): one DELETE ... RETURNING feeding
+an INSERT per statement, at most ARCHIVE_BATCH_SIZE tombstones per transaction, so
+the job never holds many locks or builds a long transaction. The partial
+idx_*_tombstones indexes find the candidates without touching live rows, and after
+the move the tables and their indexes only hold the live catalog plus recent
+tombstones.
+
+Order per run:
+  1) solution_parts, solution_modules tombstones
+  2) solutions, together with every link still pointing at them (live or not; ON
+     DELETE CASCADE would drop those without archiving them)
+  3) modules, together with their remaining solution_modules rows
+
+Each batch enqueues graph sync intents for what it removed in the same
+transaction (api.outbox), so Neo4j drops whatever of it is still there; normally
+the soft delete's own sync has done that already. Live parents whose links to an
+archived solution go away get their effective BOM refreshed (a MAIN losing its
+last child gets its direct modules back), "bom" synced and their tree versions
+bumped; a module batch bumps the trees of the solutions that used it. Candidates are claimed with FOR
+UPDATE SKIP LOCKED, so the job can run in every API worker at once
+(ARCHIVE_INTERVAL, 0 disables it) or standalone.
+
+Change-feed consumers have to poll more often than the retention window: older
+tombstones are only in the archive tables.
+
+Usage:
+  python -m api.archive                        # archive everything past the retention window, then exit
+  python -m api.archive --dry-run              # count candidates only
+  python -m api.archive --retention-days 7 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+from typing import Dict, List
+
+from sqlalchemy import BigInteger, any_, delete, func, insert, literal, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal, engine
+from .effective_bom import refresh_effective_bom
+from .models import ARCHIVE_TABLES, Module, Solution, SolutionModule, SolutionPart
+from .outbox import enqueue
+from .settings import load_settings
+from .trees import bump_tree_versions
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("archive")
+
+
+def _ids(values: List[int]):
+    return any_(literal(values, ARRAY(BigInteger)))
+
+
+def _expired(model, cutoff):
+    # deleted_at < cutoff implies deleted_at IS NOT NULL, so idx_*_tombstones applies
+    return model.deleted_at < cutoff
+
+
+async def _move(db: AsyncSession, model, where) -> List[int]:
+    """Move the rows of `model` matching `where` to its archive table; returns their first key column."""
+    source = model.__table__
+    archive = ARCHIVE_TABLES[source.name]
+    names = [c.name for c in source.c]
+    moved = delete(source).where(where).returning(*source.c).cte("moved")
+    stmt = (
+        insert(archive)
+        .from_select(names, select(*(moved.c[n] for n in names)))
+        .add_cte(moved)
+        .returning(archive.c[source.primary_key.columns.values()[0].name])
+    )
+    return list((await db.execute(stmt)).scalars())
+
+
+async def _claim(db: AsyncSession, model, keys, cutoff, limit: int):
+    return (await db.execute(
+        select(*keys)
+        .where(_expired(model, cutoff))
+        .order_by(model.deleted_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )).all()
+
+
+async def _link_batch(db: AsyncSession, model, keys, kind: str, cutoff, limit: int) -> int:
+    claimed = await _claim(db, model, keys, cutoff, limit)
+    if claimed:
+        owners = await _move(db, model, tuple_(*keys).in_([tuple(r) for r in claimed]))
+        # "parts" is keyed by parent, "bom" by solution: the first key column
+        await enqueue(db, kind, owners)
+    return len(claimed)
+
+
+async def _solution_batch(db: AsyncSession, cutoff, limit: int) -> int:
+    ids = [r[0] for r in await _claim(db, Solution, (Solution.id,), cutoff, limit)]
+    if ids:
+        parents = await _move(db, SolutionPart, or_(
+            SolutionPart.parent_solution_id == _ids(ids), SolutionPart.child_solution_id == _ids(ids),
+        ))
+        await _move(db, SolutionModule, SolutionModule.solution_id == _ids(ids))
+        await _move(db, Solution, Solution.id == _ids(ids))
+        # parents that lost a child: a MAIN left without children gets its direct modules back
+        losers = set(parents) - set(ids)
+        await refresh_effective_bom(db, losers)
+        await bump_tree_versions(db, losers)
+        await enqueue(db, "solution", ids)
+        await enqueue(db, "parts", parents)
+        await enqueue(db, "bom", losers)
+    return len(ids)
+
+
+async def _module_batch(db: AsyncSession, cutoff, limit: int) -> int:
+    ids = [r[0] for r in await _claim(db, Module, (Module.id,), cutoff, limit)]
+    if ids:
+        # while the BOM rows still exist, like DELETE /modules/{id}
+        await bump_tree_versions(db, module_ids=ids)
+        users = await _move(db, SolutionModule, SolutionModule.module_id == _ids(ids))
+        await _move(db, Module, Module.id == _ids(ids))
+        await enqueue(db, "module", ids)
+        # their effective BOM rows go with the modules (ON DELETE CASCADE)
+        await enqueue(db, "bom", users)
+    return len(ids)
+
+
+_STEPS = (
+    ("solution_parts", lambda db, cutoff, limit: _link_batch(
+        db, SolutionPart, (SolutionPart.parent_solution_id, SolutionPart.child_solution_id), "parts", cutoff, limit)),
+    ("solution_modules", lambda db, cutoff, limit: _link_batch(
+        db, SolutionModule, (SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.role), "bom", cutoff, limit)),
+    ("solutions", _solution_batch),
+    ("modules", _module_batch),
+)
+
+
+async def archive_once(retention_days: float, batch_size: int) -> Dict[str, int]:
+    """Archive every tombstone older than `retention_days`; returns tombstones moved per table."""
+    cutoff = func.now() - timedelta(days=retention_days)
+    moved: Dict[str, int] = {}
+    for name, batch in _STEPS:
+        moved[name] = 0
+        while True:
+            async with SessionLocal() as db:
+                n = await batch(db, cutoff, batch_size)
+                await db.commit()
+            moved[name] += n
+            if n < batch_size:
+                break
+    if any(moved.values()):
+        LOGGER.info("Archived tombstones older than %g days: %s", retention_days, moved)
+    return moved
+
+
+async def pending(retention_days: float) -> Dict[str, int]:
+    """Tombstones older than `retention_days` per table (what archive_once would move)."""
+    cutoff = func.now() - timedelta(days=retention_days)
+    async with SessionLocal() as db:
+        return {
+            model.__tablename__: (await db.execute(
+                select(func.count()).select_from(model).where(_expired(model, cutoff))
+            )).scalar_one()
+            for model in (SolutionPart, SolutionModule, Solution, Module)
+        }
+
+
+async def run_archiver(stop: asyncio.Event, interval: float) -> None:
+    """Archive expired tombstones every `interval` seconds until `stop` is set."""
+    while not stop.is_set():
+        try:
+            await archive_once(settings.archive_retention_days, settings.archive_batch_size)
+        except Exception:
+            LOGGER.exception("Tombstone archive run failed")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _main(retention_days: float, batch_size: int, dry_run: bool) -> int:
+    try:
+        if dry_run:
+            LOGGER.info("Tombstones older than %g days: %s", retention_days, await pending(retention_days))
+        else:
+            LOGGER.info("Archived: %s", await archive_once(retention_days, batch_size))
+    finally:
+        await engine.dispose()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move soft-deleted rows past the retention window to the archive tables")
+    parser.add_argument("--retention-days", type=float, default=settings.archive_retention_days)
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    parser.add_argument("--dry-run", action="store_true", help="Only count the tombstones that would be archived")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    raise SystemExit(asyncio.run(_main(args.retention_days, args.batch_size, args.dry_run)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Set-based write path for solution_parts / solution_modules.
+
+- changed_part_rows / changed_bom_rows: one read of the solutions' current links,
+  returning only the submitted rows that differ from it (new, other qty, or
+  soft-deleted), so a repeated full-state PUT writes nothing.
+- upsert_part_rows / upsert_bom_rows: one multi-row INSERT ... ON CONFLICT per call
+  (used by the PUT handlers). Rows that are already current are not rewritten.
+- parse_link_rows + copy_merge: bulk import of NDJSON/CSV bodies; rows are
+  validated one by one, binary-COPYed (asyncpg copy_records_to_table) into a temp
+  table and merged with a single INSERT ... SELECT, so a full-catalog reload runs
+  at COPY speed.
+"""
+
+import csv
+import io
+import json
+from typing import Dict, List, Sequence, Set, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import BigInteger, any_, func, literal, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import SolutionModule, SolutionPart
+
+
+PartRow = Tuple[int, int, int]  # (parent_solution_id, child_solution_id, qty)
+BomRow = Tuple[int, int, int, str]  # (solution_id, module_id, qty, role)
+
+# table -> (key columns, value columns, referenced (column, table) pairs)
+BULK_TABLES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[Tuple[str, str], ...]]] = {
+    "solution_parts": (
+        ("parent_solution_id", "child_solution_id"),
+        ("qty",),
+        (("parent_solution_id", "solutions"), ("child_solution_id", "solutions")),
+    ),
+    "solution_modules": (
+        ("solution_id", "module_id", "role"),
+        ("qty",),
+        (("solution_id", "solutions"), ("module_id", "modules")),
+    ),
+}
+
+# Postgres caps bind parameters at 65535 per statement.
+_ROWS_PER_STATEMENT = 10_000
+
+# ON CONFLICT DO UPDATE does not apply Column.onupdate; a re-upserted link also
+# revives a soft-deleted row. Rows already current are left alone, so no-op pushes
+# neither rewrite rows nor move updated_at (GET /changes).
+_REVIVE_SQL = "updated_at = clock_timestamp(), deleted_at = NULL"
+
+
+def _revive(stmt) -> dict:
+    return {"qty": stmt.excluded.qty, "updated_at": func.clock_timestamp(), "deleted_at": None}
+
+
+def _changed(model, stmt):
+    return model.qty.is_distinct_from(stmt.excluded.qty) | model.deleted_at.isnot(None)
+
+
+def _dedupe_parts(rows: Sequence[PartRow]) -> List[PartRow]:
+    # ON CONFLICT cannot touch the same row twice in one statement; last one wins.
+    return list({(p, c): (p, c, q) for p, c, q in rows}.values())
+
+
+def _dedupe_bom(rows: Sequence[BomRow]) -> List[BomRow]:
+    return list({(s, m, r): (s, m, q, r) for s, m, q, r in rows}.values())
+
+
+async def changed_part_rows(db: AsyncSession, rows: Sequence[PartRow]) -> List[PartRow]:
+    rows = _dedupe_parts(rows)
+    parents = sorted({p for p, _, _ in rows})
+    if not parents:
+        return []
+    current = {
+        (p, c): q
+        for p, c, q in (await db.execute(
+            select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id, SolutionPart.qty)
+            .where(SolutionPart.parent_solution_id == any_(literal(parents, ARRAY(BigInteger))))
+            .where(SolutionPart.deleted_at.is_(None))
+        )).all()
+    }
+    return [(p, c, q) for p, c, q in rows if current.get((p, c)) != q]
+
+
+async def changed_bom_rows(db: AsyncSession, rows: Sequence[BomRow]) -> List[BomRow]:
+    rows = _dedupe_bom(rows)
+    solutions = sorted({s for s, *_ in rows})
+    if not solutions:
+        return []
+    current = {
+        (s, m, r): q
+        for s, m, q, r in (await db.execute(
+            select(SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.qty, SolutionModule.role)
+            .where(SolutionModule.solution_id == any_(literal(solutions, ARRAY(BigInteger))))
+            .where(SolutionModule.deleted_at.is_(None))
+        )).all()
+    }
+    return [(s, m, q, r) for s, m, q, r in rows if current.get((s, m, r)) != q]
+
+
+async def upsert_part_rows(db: AsyncSession, rows: Sequence[PartRow]) -> None:
+    rows = _dedupe_parts(rows)
+    for i in range(0, len(rows), _ROWS_PER_STATEMENT):
+        stmt = pg_insert(SolutionPart).values(
+            [{"parent_solution_id": p, "child_solution_id": c, "qty": q} for p, c, q in rows[i:i + _ROWS_PER_STATEMENT]]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SolutionPart.parent_solution_id, SolutionPart.child_solution_id],
+                set_=_revive(stmt),
+                where=_changed(SolutionPart, stmt),
+            )
+        )
+
+
+async def upsert_bom_rows(db: AsyncSession, rows: Sequence[BomRow]) -> None:
+    rows = _dedupe_bom(rows)
+    for i in range(0, len(rows), _ROWS_PER_STATEMENT):
+        stmt = pg_insert(SolutionModule).values(
+            [{"solution_id": s, "module_id": m, "qty": q, "role": r} for s, m, q, r in rows[i:i + _ROWS_PER_STATEMENT]]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.role],
+                set_=_revive(stmt),
+                where=_changed(SolutionModule, stmt),
+            )
+        )
+
+
+def parse_link_rows(body: bytes, content_type: str, model: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[dict]]:
+    """Parse an NDJSON or CSV body into validated models.
+
+    Returns ([(line, model), ...], [{"line": n, "error": ...}, ...]). Line numbers are
+    1-based and count the CSV header, so they match what an editor shows.
+    """
+    valid: List[Tuple[int, BaseModel]] = []
+    errors: List[dict] = []
+    text_body = body.decode("utf-8-sig")
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(text_body))
+        records = ((idx, {k: (v if v != "" else None) for k, v in row.items()}) for idx, row in enumerate(reader, start=2))
+    else:
+        records = _ndjson_records(text_body, errors)
+    for line, record in records:
+        try:
+            valid.append((line, model.model_validate(record)))
+        except ValidationError as e:
+            errors.append({"line": line, "error": e.errors(include_url=False)})
+    return valid, errors
+
+
+def _ndjson_records(text_body: str, errors: List[dict]):
+    for idx, raw in enumerate(text_body.splitlines(), start=1):
+        if not raw.strip():
+            continue
+        try:
+            yield idx, json.loads(raw)
+        except json.JSONDecodeError as e:
+            errors.append({"line": idx, "error": f"invalid JSON: {e.msg}"})
+
+
+async def copy_merge(db: AsyncSession, table: str, rows: Sequence[Tuple[int, tuple]]) -> Tuple[List[dict], Set[int]]:
+    """COPY (line, *key, *value) rows into a temp table and merge them into `table`.
+
+    Returns (errors, ids): rows referencing unknown solutions/modules are reported
+    per line and nothing is merged in that case; otherwise ids are the solutions
+    (first key column) whose rows were inserted or actually changed. The caller owns
+    the transaction.
+    """
+    keys, values, refs = BULK_TABLES[table]
+    cols = keys + values
+    tmp = f"tmp_bulk_{table}"
+    col_types = {"role": "text", "qty": "int"}
+    await db.execute(text(
+        f"CREATE TEMP TABLE {tmp} (line int, "
+        + ", ".join(f"{c} {col_types.get(c, 'bigint')}" for c in cols)
+        + ") ON COMMIT DROP"
+    ))
+
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        tmp, records=[(line, *values_row) for line, values_row in rows], columns=["line", *cols]
+    )
+
+    missing = " OR ".join(
+        f"NOT EXISTS (SELECT 1 FROM {ref_table} x WHERE x.id = t.{col})" for col, ref_table in refs
+    )
+    bad = (await db.execute(text(f"SELECT t.line, {', '.join('t.' + c for c in cols)} FROM {tmp} t WHERE {missing} ORDER BY t.line"))).all()
+    if bad:
+        return [
+            {"line": r[0], "error": "unknown reference: " + ", ".join(f"{c}={v}" for c, v in zip(cols, r[1:]) if c in dict(refs))}
+            for r in bad
+        ], set()
+
+    changed = await db.execute(text(
+        f"INSERT INTO {table} ({', '.join(cols)}) "
+        f"SELECT DISTINCT ON ({', '.join(keys)}) {', '.join(cols)} FROM {tmp} "
+        f"ORDER BY {', '.join(keys)}, line DESC "
+        f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET "
+        + ", ".join(f"{c} = EXCLUDED.{c}" for c in values)
+        + f", {_REVIVE_SQL} WHERE "
+        + " OR ".join(f"{table}.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in values)
+        + f" OR {table}.deleted_at IS NOT NULL "
+        f"RETURNING {keys[0]}"
+    ))
+    return [], set(changed.scalars())
@@ -0,0 +1,130 @@
+"""Read-through cache for single-entity GETs.
+
+EntityCache is a bounded LRU with TTL and single-flight loading: concurrent misses
+for the same key await one loader coroutine instead of all hitting Postgres. The
+loader runs in its own task and every caller awaits it shielded, so a cancelled
+caller (client disconnect) neither cancels the shared load nor fails the others.
+Write handlers invalidate exactly the ids they touched; an invalidation that races an
+in-flight load prevents that (possibly stale) result from being stored.
+
+Entries carry the row's updated_at, from which ETag/Last-Modified are derived so
+clients can revalidate with If-None-Match / If-Modified-Since and get a 304.
+The cache is per worker process; the TTL bounds staleness across workers.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+
+class _Flight:
+    __slots__ = ("task", "invalidated")
+
+    def __init__(self) -> None:
+        self.task: "asyncio.Task[Any]"
+        self.invalidated = False
+
+
+class EntityCache:
+    def __init__(self, name: str, maxsize: int, ttl: float) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value or load it once; None results are not cached.
+
+        Runs on the event loop only, so bookkeeping between awaits needs no lock.
+        """
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+        self.misses += 1
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        else:
+            flight = self._inflight[key] = _Flight()
+            flight.task = asyncio.create_task(self._load(key, flight, loader))
+            # mark an error retrieved when every caller has gone away
+            flight.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(flight.task)
+
+    async def _load(self, key: Hashable, flight: _Flight, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+        finally:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+        if value is not None and not flight.invalidated:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, *keys: Hashable) -> None:
+        for key in keys:
+            self.invalidations += 1
+            self._data.pop(key, None)
+            flight = self._inflight.get(key)
+            if flight is not None:
+                flight.invalidated = True
+
+    def clear(self) -> None:
+        self._data.clear()
+        for flight in self._inflight.values():
+            flight.invalidated = True
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def make_etag(key: Hashable, updated_at: datetime) -> str:
+    return f'W/"{key}-{int(updated_at.timestamp() * 1_000_000)}"'
+
+
+def conditional_response(request: Request, key: Hashable, body: dict, updated_at: datetime) -> Response:
+    """JSON response with ETag/Last-Modified, or 304 if the client's copy is current."""
+    etag = make_etag(key, updated_at)
+    headers = {"ETag": etag, "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), usegmt=True)}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag in (t.strip() for t in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and since.tzinfo is not None and updated_at.replace(microsecond=0) <= since:
+                return Response(status_code=304, headers=headers)
+    return JSONResponse(body, headers=headers)
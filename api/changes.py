@@ -0,0 +1,184 @@
+"""Change feed over the core tables, driven by updated_at watermarks.
+
+GET /changes streams every solution, module, solution_parts and solution_modules
+row with since <= updated_at < until as NDJSON, one table after the other, each
+in (updated_at, primary key) order so the updated_at indexes serve it as a range
+scan. Soft-deleted rows are tombstones (op "delete"); hard deletes are not in the
+feed.
+
+`until` is the high watermark, fixed when a poll starts: the start time of the
+oldest transaction that has written something and not finished yet, or the
+current time if there is none. updated_at is set with clock_timestamp() (table
+defaults, Column.onupdate, the link upserts), so a row is never stamped earlier
+than its transaction's start; every row below the watermark is therefore committed
+and no later commit can land behind it. Rows updated again while a poll runs move
+above the watermark and come with the next poll.
+
+Writers are found in pg_stat_activity, which only shows backend_xid / xact_start of
+other roles' sessions to roles with pg_read_all_stats. So every transaction still
+running in the current snapshot (pg_current_snapshot()) has to be matched there;
+if one cannot be, its start is unknown and the poll is refused with a 503 instead
+of returning a watermark that commits could still land behind. check_privileges()
+logs at startup when the role lacks pg_read_all_stats.
+
+Lines:
+  {"entity": "solution", "op": "upsert", "key": {"id": 1}, "updated_at": "...", "data": {...}}
+  {"entity": "bom", "op": "delete", "key": {"solution_id": 1, "module_id": 2, "role": "x"}, "updated_at": "..."}
+  {"checkpoint": "<cursor>"}                     after every chunk; resume with ?cursor=
+  {"next": "<cursor>", "watermark": "..."}       last line; poll again with ?cursor=
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Column, literal, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+from .models import Module, Solution, SolutionModule, SolutionPart
+from .pagination import STREAM_CHUNK_ROWS, decode_state, encode_state
+
+
+LOGGER = logging.getLogger("changes")
+
+# Same kind names as graph_sync_outbox; nodes first so consumers see them before edges.
+FEEDS: List[Tuple[str, type, Tuple[Column, ...]]] = [
+    ("solution", Solution, (Solution.id,)),
+    ("module", Module, (Module.id,)),
+    ("parts", SolutionPart, (SolutionPart.parent_solution_id, SolutionPart.child_solution_id)),
+    ("bom", SolutionModule, (SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.role)),
+]
+_FEED_NAMES = [name for name, _, _ in FEEDS]
+
+# Sessions of other roles only show backend_xid / xact_start with pg_read_all_stats;
+# `unseen` counts running transactions (any database, xid8 folded to the 32-bit xid
+# pg_stat_activity shows) without a visible session, e.g. another role's writers.
+_HIGH_WATERMARK = text("""
+WITH writers AS (
+    SELECT backend_xid::text AS xid, xact_start, datname FROM pg_stat_activity
+    WHERE backend_xid IS NOT NULL AND pid <> pg_backend_pid()
+)
+SELECT
+    LEAST(clock_timestamp(), (SELECT min(xact_start) FROM writers WHERE datname = current_database())) AS watermark,
+    (SELECT count(*) FROM pg_snapshot_xip(pg_current_snapshot()) AS x
+     WHERE pg_xact_status(x) = 'in progress'
+       AND NOT EXISTS (SELECT 1 FROM writers w WHERE w.xid = (x::text::bigint % 4294967296)::text)) AS unseen
+""")
+_CAN_READ_ALL_STATS = text(
+    "SELECT pg_has_role('pg_read_all_stats', 'USAGE') OR (SELECT rolsuper FROM pg_roles WHERE rolname = current_user)"
+)
+
+
+async def high_watermark(db: AsyncSession) -> datetime:
+    """Start of the oldest running writer, or now; 503 if a running writer is invisible."""
+    watermark, unseen = (await db.execute(_HIGH_WATERMARK)).one()
+    if unseen:
+        LOGGER.error("Change feed watermark: %d running transaction(s) not visible in pg_stat_activity", unseen)
+        raise HTTPException(status_code=503, detail=(
+            f"{unseen} running transaction(s) are not visible to this database role, so no safe watermark "
+            "exists; grant it pg_read_all_stats, or retry once they finish"
+        ))
+    return watermark
+
+
+async def check_privileges() -> None:
+    """Log loudly if the API role cannot see other roles' transactions (see high_watermark)."""
+    async with SessionLocal() as db:
+        if not (await db.execute(_CAN_READ_ALL_STATS)).scalar_one():
+            LOGGER.error(
+                "Database role lacks pg_read_all_stats: GET /changes returns 503 while another role's "
+                "transaction is running (GRANT pg_read_all_stats TO <api role>)"
+            )
+
+
+def parse_since(since: Optional[str]) -> Optional[datetime]:
+    """ISO-8601 timestamp; naive values are taken as UTC."""
+    if not since:
+        return None
+    try:
+        ts = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO-8601 timestamp")
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def _timestamp(value) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def decode_changes_cursor(cursor: str) -> dict:
+    state = decode_state(cursor)
+    try:
+        start = {
+            "since": _timestamp(state.get("since")),
+            "until": _timestamp(state.get("until")),
+            "entity": state.get("entity", _FEED_NAMES[0]),
+            "after": None,
+        }
+        if start["entity"] not in _FEED_NAMES:
+            raise ValueError(start["entity"])
+        if state.get("after") is not None:
+            ts, *key = state["after"]
+            start["after"] = (datetime.fromisoformat(ts), *key)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return start
+
+
+def _cursor(since: Optional[datetime], until: Optional[datetime], entity: str, after: Optional[tuple]) -> str:
+    return encode_state({
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None,
+        "entity": entity,
+        "after": [after[0].isoformat(), *after[1:]] if after else None,
+    })
+
+
+def _line(entity: str, keys: Tuple[Column, ...], row) -> str:
+    out = {
+        "entity": entity,
+        "op": "delete" if row["deleted_at"] is not None else "upsert",
+        "key": {c.key: row[c.key] for c in keys},
+        "updated_at": row["updated_at"].isoformat(),
+    }
+    if out["op"] == "upsert":
+        out["data"] = {k: v for k, v in row.items() if k not in ("updated_at", "deleted_at")}
+    return json.dumps(out, default=str, ensure_ascii=False) + "\n"
+
+
+async def _stream(since: Optional[datetime], until: datetime, entity: str,
+                  after: Optional[tuple]) -> AsyncIterator[bytes]:
+    async with SessionLocal() as db:
+        for name, model, keys in FEEDS[_FEED_NAMES.index(entity):]:
+            order = (model.updated_at, *keys)
+            stmt = select(*model.__table__.c).where(model.updated_at < until).order_by(*order)
+            if since is not None:
+                stmt = stmt.where(model.updated_at >= since)
+            if after is not None and name == entity:
+                stmt = stmt.where(tuple_(*order) > tuple_(*(literal(v, c.type) for v, c in zip(after, order))))
+            result = await db.stream(stmt.execution_options(yield_per=STREAM_CHUNK_ROWS))
+            async for partition in result.mappings().partitions():
+                last = partition[-1]
+                position = (last["updated_at"], *(last[c.key] for c in keys))
+                checkpoint = json.dumps({"checkpoint": _cursor(since, until, name, position)}) + "\n"
+                yield ("".join(_line(name, keys, row) for row in partition) + checkpoint).encode("utf-8")
+    done = {"next": _cursor(until, None, _FEED_NAMES[0], None), "watermark": until.isoformat()}
+    yield (json.dumps(done) + "\n").encode("utf-8")
+
+
+async def changes_response(since: Optional[str], cursor: Optional[str]) -> StreamingResponse:
+    if since and cursor:
+        raise HTTPException(status_code=400, detail="Pass either since or cursor, not both")
+    if cursor:
+        start = decode_changes_cursor(cursor)
+    else:
+        start = {"since": parse_since(since), "until": None, "entity": _FEED_NAMES[0], "after": None}
+    if start["until"] is None:
+        # fixed before streaming starts, so a 503 can still be returned
+        async with SessionLocal() as db:
+            start["until"] = await high_watermark(db)
+    return StreamingResponse(_stream(**start), media_type="application/x-ndjson")
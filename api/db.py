@@ -1,16 +1,26 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import DeclarativeBase
+from .metrics import TimedAsyncQueuePool, instrument_engine
 from .settings import load_settings
 
 
 settings = load_settings()
 
-engine = create_engine(settings.postgres_dsn, pool_pre_ping=True, future=True)
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def async_dsn(dsn: str) -> str:
+    """Map a psycopg2-style DSN onto asyncpg (driver name and sslmode -> ssl)."""
+    scheme, sep, rest = dsn.partition("://")
+    if scheme in ("postgresql", "postgres", "postgresql+psycopg2", "postgresql+psycopg"):
+        scheme = "postgresql+asyncpg"
+    return f"{scheme}{sep}{rest.replace('sslmode=', 'ssl=')}"
 
 
-class Base(DeclarativeBase):
-    pass
+engine = create_async_engine(async_dsn(settings.postgres_dsn), pool_pre_ping=True, poolclass=TimedAsyncQueuePool)
+instrument_engine(engine)
 
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
+
+class Base(DeclarativeBase):
+    pass
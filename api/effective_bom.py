@@ -0,0 +1,144 @@
+"""Incremental maintenance of solution_modules_effective (materialised effective BOM).
+
+The table holds what v_solution_modules_effective returns, minus the duplicates the
+view's LEFT JOIN on solution_parts produces for MAINs with several children: a
+solution_modules row survives unless its solution is deleted, or is a Hauptprozess
+with children.
+
+Write handlers call refresh_effective_bom(db, ids) in their own transaction with the
+solution ids whose effective BOM may have changed (the same ids they enqueue as
+"bom" for the graph sync). Only those ids are recomputed: rows that disappeared are
+deleted, new rows inserted, changed quantities updated; unchanged rows are left alone.
+
+Usage:
+  python -m api.effective_bom rebuild                 # create the table if needed, recompute everything
+  python -m api.effective_bom verify [--repair]       # compare with the view definition
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal, engine
+from .models import SolutionModuleEffective
+
+
+LOGGER = logging.getLogger("effective_bom")
+
+# Same rule as v_solution_modules_effective, with EXISTS instead of the row-multiplying
+# LEFT JOIN. {scope} restricts to the touched solution ids (or nothing, for a rebuild).
+_REFRESH_SQL = """
+WITH desired AS (
+    SELECT sm.solution_id, sm.module_id, sm.role, COALESCE(sm.qty, 1) AS qty
+    FROM solution_modules sm
+    JOIN solutions s ON s.id = sm.solution_id
+    WHERE sm.deleted_at IS NULL
+      AND s.deleted_at IS NULL
+      AND NOT (s.type = 'Hauptprozess'
+               AND EXISTS (SELECT 1 FROM solution_parts sp
+                           WHERE sp.parent_solution_id = s.id AND sp.deleted_at IS NULL))
+      {scope_sm}
+),
+removed AS (
+    DELETE FROM solution_modules_effective e
+    WHERE NOT EXISTS (
+        SELECT 1 FROM desired d
+        WHERE d.solution_id = e.solution_id AND d.module_id = e.module_id AND d.role = e.role
+    )
+    {scope_e}
+    RETURNING 1
+),
+merged AS (
+    INSERT INTO solution_modules_effective (solution_id, module_id, role, qty)
+    SELECT solution_id, module_id, role, qty FROM desired
+    ON CONFLICT (solution_id, module_id, role) DO UPDATE SET qty = EXCLUDED.qty
+    WHERE solution_modules_effective.qty IS DISTINCT FROM EXCLUDED.qty
+    RETURNING 1
+)
+SELECT (SELECT count(*) FROM removed) AS removed, (SELECT count(*) FROM merged) AS merged
+"""
+
+_SCOPED_REFRESH = text(_REFRESH_SQL.format(
+    scope_sm="AND sm.solution_id = ANY(:ids)", scope_e="AND e.solution_id = ANY(:ids)"
+))
+_FULL_REFRESH = text(_REFRESH_SQL.format(scope_sm="", scope_e=""))
+
+# Rows in one side only; a changed qty shows up once as missing and once as extra.
+_DIFF_SQL = text("""
+WITH v AS (SELECT DISTINCT solution_id, module_id, role, qty FROM v_solution_modules_effective),
+     t AS (SELECT solution_id, module_id, role, qty FROM solution_modules_effective)
+SELECT 'missing' AS problem, d.* FROM (SELECT * FROM v EXCEPT SELECT * FROM t) d
+UNION ALL
+SELECT 'extra' AS problem, d.* FROM (SELECT * FROM t EXCEPT SELECT * FROM v) d
+""")
+
+
+async def refresh_effective_bom(db: AsyncSession, solution_ids: Iterable[int]) -> None:
+    """Recompute the effective BOM rows of `solution_ids` (commit is up to the caller)."""
+    ids = sorted(set(solution_ids))
+    if ids:
+        await db.execute(_SCOPED_REFRESH, {"ids": ids})
+
+
+async def rebuild(db: AsyncSession) -> dict:
+    removed, merged = (await db.execute(_FULL_REFRESH)).one()
+    return {"removed": removed, "inserted_or_updated": merged}
+
+
+async def verify(db: AsyncSession, sample: int = 20) -> dict:
+    """Compare the table with the view definition; returns counts and sample rows."""
+    rows = (await db.execute(_DIFF_SQL)).mappings().all()
+    missing = [dict(r) for r in rows if r["problem"] == "missing"]
+    extra = [dict(r) for r in rows if r["problem"] == "extra"]
+    return {
+        "missing": len(missing),
+        "extra": len(extra),
+        "affected_solutions": sorted({r["solution_id"] for r in rows}),
+        "sample": (missing + extra)[:sample],
+    }
+
+
+async def _main(command: str, repair: bool, sample: int) -> int:
+    try:
+        if command == "rebuild":
+            async with engine.begin() as conn:
+                await conn.run_sync(SolutionModuleEffective.__table__.create, checkfirst=True)
+            async with SessionLocal() as db:
+                LOGGER.info("Rebuilt solution_modules_effective: %s", await rebuild(db))
+                await db.commit()
+            return 0
+
+        async with SessionLocal() as db:
+            report = await verify(db, sample)
+            affected: List[int] = report.pop("affected_solutions")
+            LOGGER.info("missing=%d extra=%d affected_solutions=%d", report["missing"], report["extra"], len(affected))
+            for row in report["sample"]:
+                LOGGER.info("  %s", row)
+            if not affected:
+                return 0
+            if not repair:
+                return 1
+            await refresh_effective_bom(db, affected)
+            await db.commit()
+            LOGGER.info("Repaired %d solutions", len(affected))
+            return 0
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain and verify the materialised effective BOM table")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--repair", action="store_true", help="verify: recompute the solutions that differ")
+    parser.add_argument("--sample", type=int, default=20, help="verify: differing rows to print")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    raise SystemExit(asyncio.run(_main(args.command, args.repair, args.sample)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""In-memory solution/module adjacency index for BOM explosion and where-used.
+
+Adjacency is kept per node in compact array('q') pairs (targets, quantities)
+plus reverse maps, loaded once at startup and patched by the write handlers after
+each commit. Explosion applies the same MAIN-with-children rule as
+v_solution_modules_effective: a Hauptprozess with children contributes no direct
+modules, only those of its children multiplied by the HAS_PART quantity. BOM rows
+of soft-deleted modules are left out, as in the trees and the rollup.
+
+Each API worker holds its own copy; writes served by another worker reach it via
+the periodic full reload (GRAPH_INDEX_REFRESH_INTERVAL), which builds off to the
+side and replays writes that arrived meanwhile (api.reloadable).
+"""
+
+import logging
+import threading
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from .db import SessionLocal
+from .models import Module, Solution, SolutionModule, SolutionPart
+from .reloadable import ReloadableIndex
+
+
+LOGGER = logging.getLogger("graph_index")
+
+_EMPTY_PARTS: Tuple[array, array] = (array("q"), array("q"))
+_EMPTY_BOM: Tuple[array, array, Tuple[Optional[str], ...]] = (array("q"), array("q"), ())
+
+
+class _Graph:
+    """One generation of the adjacency index."""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._is_main: Dict[int, bool] = {}  # live solutions only
+        self._parts: Dict[int, Tuple[array, array]] = {}  # parent -> (children, qty)
+        self._parents: Dict[int, Set[int]] = defaultdict(set)  # child -> parents
+        self._bom: Dict[int, Tuple[array, array, Tuple[Optional[str], ...]]] = {}  # sid -> (modules, qty, roles)
+        self._users: Dict[int, Set[int]] = defaultdict(set)  # module -> solutions with a BOM row
+
+    # -- incremental updates -------------------------------------------------------
+
+    def put_solution(self, sid: int, type_: str) -> None:
+        with self._lock:
+            self._is_main[sid] = type_ == "Hauptprozess"
+
+    def drop_solution(self, sid: int, hard: bool = False) -> None:
+        """Soft delete hides the solution; hard delete also drops its edges (FK cascade)."""
+        with self._lock:
+            self._is_main.pop(sid, None)
+            if not hard:
+                return
+            for child in self._parts.pop(sid, _EMPTY_PARTS)[0]:
+                self._parents[child].discard(sid)
+            for parent in self._parents.pop(sid, set()):
+                self._set_parts(parent, {c: q for c, q in zip(*self._parts.get(parent, _EMPTY_PARTS)) if c != sid})
+            for mid in set(self._bom.pop(sid, _EMPTY_BOM)[0]):
+                self._users[mid].discard(sid)
+
+    def drop_module(self, mid: int) -> None:
+        with self._lock:
+            for sid in list(self._users.pop(mid, set())):
+                self._set_bom(sid, {(m, r): q for m, q, r in self._bom_rows(sid) if m != mid})
+
+    def put_parts(self, rows: Iterable[Tuple[int, int, int]]) -> None:
+        by_parent: Dict[int, Dict[int, int]] = defaultdict(dict)
+        for p, c, q in rows:
+            by_parent[p][c] = q
+        with self._lock:
+            for parent, children in by_parent.items():
+                current = dict(zip(*self._parts.get(parent, _EMPTY_PARTS)))
+                current.update(children)
+                self._set_parts(parent, current)
+
+    def drop_part(self, parent: int, child: int) -> None:
+        with self._lock:
+            current = dict(zip(*self._parts.get(parent, _EMPTY_PARTS)))
+            current.pop(child, None)
+            self._set_parts(parent, current)
+            self._parents[child].discard(parent)
+
+    def put_bom(self, rows: Iterable[Tuple[int, int, int, Optional[str]]]) -> None:
+        by_solution: Dict[int, Dict[Tuple[int, Optional[str]], int]] = defaultdict(dict)
+        for s, m, q, r in rows:
+            by_solution[s][(m, r)] = q
+        with self._lock:
+            for sid, links in by_solution.items():
+                current = {(m, r): q for m, q, r in self._bom_rows(sid)}
+                current.update(links)
+                self._set_bom(sid, current)
+
+    def drop_bom(self, sid: int, mid: int, role: Optional[str] = None) -> None:
+        """Remove one BOM link; role=None removes every role of the module (as DELETE does)."""
+        with self._lock:
+            current = {
+                (m, r): q for m, q, r in self._bom_rows(sid) if not (m == mid and (role is None or r == role))
+            }
+            self._set_bom(sid, current)
+
+    def _set_parts(self, parent: int, children: Dict[int, int]) -> None:
+        self._parts[parent] = (array("q", children.keys()), array("q", children.values()))
+        for c in children:
+            self._parents[c].add(parent)
+
+    def _bom_rows(self, sid: int):
+        mids, qtys, roles = self._bom.get(sid, _EMPTY_BOM)
+        return zip(mids, qtys, roles)
+
+    def _set_bom(self, sid: int, links: Dict[Tuple[int, Optional[str]], int]) -> None:
+        old = set(self._bom.get(sid, _EMPTY_BOM)[0])
+        self._bom[sid] = (
+            array("q", (m for m, _ in links)),
+            array("q", links.values()),
+            tuple(r for _, r in links),
+        )
+        new = {m for m, _ in links}
+        for m in old - new:
+            self._users[m].discard(sid)
+        for m in new:
+            self._users[m].add(sid)
+
+    # -- queries -------------------------------------------------------------------
+
+    def _contributes_direct(self, sid: int) -> bool:
+        # Mirrors v_solution_modules_effective: MAIN with children has no direct modules.
+        return not (self._is_main.get(sid) and len(self._parts.get(sid, _EMPTY_PARTS)[0]) > 0)
+
+    def explode(self, sid: int) -> Optional[List[dict]]:
+        """All modules needed by `sid` through its hierarchy, quantities multiplied along HAS_PART."""
+        with self._lock:
+            if sid not in self._is_main:
+                return None
+            totals: Dict[int, int] = defaultdict(int)
+            stack: List[Tuple[int, int, Tuple[int, ...]]] = [(sid, 1, ())]
+            while stack:
+                node, mult, path = stack.pop()
+                if node in path or node not in self._is_main:
+                    continue  # cycle guard / deleted child
+                if self._contributes_direct(node):
+                    for m, q, _ in self._bom_rows(node):
+                        totals[m] += mult * q
+                children, qtys = self._parts.get(node, _EMPTY_PARTS)
+                for c, q in zip(children, qtys):
+                    stack.append((c, mult * q, path + (node,)))
+        return [{"module_id": m, "qty": q} for m, q in sorted(totals.items())]
+
+    def where_used(self, mid: int) -> dict:
+        """Solutions using `mid` in their effective BOM, and every ancestor they roll up into."""
+        with self._lock:
+            direct = sorted(s for s in self._users.get(mid, ()) if s in self._is_main and self._contributes_direct(s))
+            affected: Set[int] = set()
+            stack = list(direct)
+            while stack:
+                node = stack.pop()
+                if node in affected:
+                    continue
+                affected.add(node)
+                stack.extend(p for p in self._parents.get(node, ()) if p in self._is_main)
+        return {"module_id": mid, "direct": direct, "affected": sorted(affected)}
+
+
+
+class GraphIndex(ReloadableIndex[_Graph]):
+    def __init__(self) -> None:
+        super().__init__(_Graph)
+
+    # -- loading -----------------------------------------------------------------
+
+    async def load(self) -> None:
+        """Rebuild from Postgres; queries keep using the old generation meanwhile."""
+        fresh = await self._reload(_fill)
+        LOGGER.info(
+            "Graph index loaded: solutions=%d parts=%d bom=%d",
+            len(fresh._is_main), sum(len(c) for c, _ in fresh._parts.values()), sum(len(m) for m, _, _ in fresh._bom.values()),
+        )
+
+    # -- incremental updates -------------------------------------------------------
+
+    def put_solution(self, sid: int, type_: str) -> None:
+        self._apply("put_solution", sid, type_)
+
+    def drop_solution(self, sid: int, hard: bool = False) -> None:
+        self._apply("drop_solution", sid, hard)
+
+    def drop_module(self, mid: int) -> None:
+        self._apply("drop_module", mid)
+
+    def put_parts(self, rows: Iterable[Tuple[int, int, int]]) -> None:
+        # materialized: a generator could not be replayed after a reload
+        self._apply("put_parts", list(rows))
+
+    def drop_part(self, parent: int, child: int) -> None:
+        self._apply("drop_part", parent, child)
+
+    def put_bom(self, rows: Iterable[Tuple[int, int, int, Optional[str]]]) -> None:
+        self._apply("put_bom", list(rows))
+
+    def drop_bom(self, sid: int, mid: int, role: Optional[str] = None) -> None:
+        self._apply("drop_bom", sid, mid, role)
+
+    # -- queries -------------------------------------------------------------------
+
+    def explode(self, sid: int) -> Optional[List[dict]]:
+        return self._current.explode(sid)
+
+    def where_used(self, mid: int) -> dict:
+        return self._current.where_used(mid)
+
+
+async def _fill(fresh: _Graph) -> None:
+    async with SessionLocal() as db:
+        solutions = (await db.execute(
+            select(Solution.id, Solution.type).where(Solution.deleted_at.is_(None))
+        )).all()
+        parts = (await db.execute(
+            select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id, SolutionPart.qty)
+            .where(SolutionPart.deleted_at.is_(None))
+        )).all()
+        bom = (await db.execute(
+            select(SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.qty, SolutionModule.role)
+            .join(Module, Module.id == SolutionModule.module_id)
+            .where(SolutionModule.deleted_at.is_(None), Module.deleted_at.is_(None))
+        )).all()
+    for sid, type_ in solutions:
+        fresh.put_solution(sid, type_)
+    fresh.put_parts(parts)
+    fresh.put_bom(bom)
+
+
+graph_index = GraphIndex()
+
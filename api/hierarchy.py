@@ -0,0 +1,313 @@
+"""Hierarchy rules for solution_parts / solution_modules batches, checked in O(V+E).
+
+  type        HAS_PART goes from a Hauptprozess to a Teilprozess
+  cycle       no HAS_PART cycles (Tarjan's strongly connected components over the
+              stored links plus the batch; self-links included)
+  unknown_*   links reference live solutions / modules; a full check (the CLI)
+              also reports every Teilprozess without a parent ("orphan")
+  role        a solution_modules row has a non-empty role (part of its key)
+  not_effective  a Hauptprozess with Teilprozesse gets its modules through them, so
+              a direct solution_modules row on it is not in the effective BOM
+              (warning: the source data has such rows on purpose)
+
+The links are put into adjacency lists once and every rule is one pass over them,
+so a 100k-link batch is checked in a fraction of a second. POST /bulk/{table} runs
+validate_batch() before the merge: errors are reported per line like parse errors
+(422, or the rows are left out with skip_invalid=true), warnings come back with the
+result; the PUT /solutions/{id}/parts and /modules handlers run it on their payload
+(line = 1-based position in the JSON array). Validation runs in the transaction
+that writes the batch. A solution_parts batch is checked against the whole stored
+graph (a cycle can run through any link) and first takes a transaction-level
+advisory lock, so concurrent parts writes cannot together close a cycle neither of
+them saw; a solution_modules batch only reads its own solutions and modules, FOR
+SHARE, so they cannot be deleted before the write commits.
+
+The CLI runs the same checks over the CSV exports, without a database, and prints
+one NDJSON line per finding; the exit status is 1 if there are errors.
+
+Usage:
+  python -m api.hierarchy                    # solutions.csv, modules.csv, solution_parts.csv, solution_modules_edges.csv in .
+  python -m api.hierarchy --dir export --errors-only
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import BigInteger, any_, literal, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Module, Solution, SolutionPart
+
+
+LOGGER = logging.getLogger("hierarchy")
+
+MAIN_TYPE = "Hauptprozess"
+PARTIAL_TYPE = "Teilprozess"
+_CYCLE_SAMPLE = 5
+# pg_advisory_xact_lock key serialising validated solution_parts writes
+_PARTS_LOCK_KEY = 0x68696572  # "hier"
+
+# (line, (parent, child, qty)) and (line, (solution, module, role, qty)), as built by POST /bulk
+PartLine = Tuple[int, Tuple[int, int, int]]
+BomLine = Tuple[int, Tuple[int, int, Optional[str], int]]
+
+
+@dataclass
+class Hierarchy:
+    types: Dict[int, str] = field(default_factory=dict)  # live solution id -> Prozessart
+    modules: Optional[Set[int]] = None  # live module ids; None: not checked
+    links: List[Tuple[int, int]] = field(default_factory=list)  # stored (parent, child) links
+
+
+@dataclass
+class Report:
+    errors: List[dict] = field(default_factory=list)
+    warnings: List[dict] = field(default_factory=list)
+
+    def error(self, line: int, rule: str, message: str) -> None:
+        self.errors.append({"line": line, "rule": rule, "error": message})
+
+    def warning(self, line: int, rule: str, message: str) -> None:
+        self.warnings.append({"line": line, "rule": rule, "warning": message})
+
+    def bad_lines(self) -> Set[int]:
+        return {e["line"] for e in self.errors}
+
+
+def _cycle_components(adjacency: Dict[int, List[int]]) -> Dict[int, List[int]]:
+    """node -> members of its strongly connected component, for components of 2+ nodes.
+
+    Tarjan's algorithm with an explicit stack (deep hierarchies would hit the
+    recursion limit); every node and link is visited once.
+    """
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    stack: List[int] = []
+    on_stack: Set[int] = set()
+    out: Dict[int, List[int]] = {}
+    for root in adjacency:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(adjacency[root]))]
+        while work:
+            node, successors = work[-1]
+            for nxt in successors:
+                if nxt not in index:
+                    index[nxt] = low[nxt] = len(index)
+                    stack.append(nxt)
+                    on_stack.add(nxt)
+                    work.append((nxt, iter(adjacency.get(nxt, ()))))
+                    break
+                if nxt in on_stack:
+                    low[node] = min(low[node], index[nxt])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    members = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == node:
+                            break
+                    if len(members) > 1:
+                        members.sort()
+                        for member in members:
+                            out[member] = members
+    return out
+
+
+def validate(h: Hierarchy, parts: Sequence[PartLine] = (), bom: Sequence[BomLine] = (),
+             orphans: bool = False) -> Report:
+    """Check the batch rows against `h` plus the batch itself; findings are per batch line."""
+    report = Report()
+    types = h.types
+    for line, (p, c, _) in parts:
+        for end, sid, want in (("parent", p, MAIN_TYPE), ("child", c, PARTIAL_TYPE)):
+            have = types.get(sid)
+            if have is None:
+                report.error(line, "unknown_solution", f"{end} {sid} is not a live solution")
+            elif have != want:
+                report.error(line, "type", f"{end} {sid} is a {have}; HAS_PART goes from {MAIN_TYPE} to {PARTIAL_TYPE}")
+
+    if parts:
+        adjacency: Dict[int, List[int]] = {}
+        for p, c in h.links:
+            adjacency.setdefault(p, []).append(c)
+        for _, (p, c, _) in parts:
+            adjacency.setdefault(p, []).append(c)
+        components = _cycle_components(adjacency)
+        for line, (p, c, _) in parts:
+            if p == c:
+                report.error(line, "cycle", f"solution {p} is linked to itself")
+            elif p in components and components[p] is components.get(c):
+                members = components[p]
+                sample = ", ".join(str(m) for m in members[:_CYCLE_SAMPLE]) + (", ..." if len(members) > _CYCLE_SAMPLE else "")
+                report.error(line, "cycle", f"link {p} -> {c} closes a cycle through {len(members)} solutions ({sample})")
+
+    if bom:
+        with_children = {p for p, _ in h.links}
+        with_children.update(p for _, (p, _, _) in parts)
+        for line, (s, m, r, _) in bom:
+            if not (r or "").strip():
+                report.error(line, "role", f"link {s} -> module {m} has no role; role is part of the key")
+            have = types.get(s)
+            if have is None:
+                report.error(line, "unknown_solution", f"solution {s} is not a live solution")
+            if h.modules is not None and m not in h.modules:
+                report.error(line, "unknown_module", f"module {m} is not a live module")
+            if have == MAIN_TYPE and s in with_children:
+                report.warning(line, "not_effective",
+                               f"{MAIN_TYPE} {s} has Teilprozesse; its direct module {m} is not in the effective BOM")
+
+    if orphans:
+        has_parent = {c for _, c in h.links}
+        has_parent.update(c for _, (_, c, _) in parts)
+        for sid in sorted(types):
+            if types[sid] == PARTIAL_TYPE and sid not in has_parent:
+                report.warning(0, "orphan", f"{PARTIAL_TYPE} {sid} has no parent")
+    return report
+
+
+def _ids(values: List[int]):
+    return any_(literal(values, ARRAY(BigInteger)))
+
+
+async def load(db: AsyncSession, parts: Sequence[PartLine] = (), bom: Sequence[BomLine] = ()) -> Hierarchy:
+    """What validate() needs from Postgres for this batch (live rows only)."""
+    child = Solution.__table__.alias("child")
+    live_links = (
+        select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id)
+        .join(Solution, Solution.id == SolutionPart.parent_solution_id)
+        .join(child, child.c.id == SolutionPart.child_solution_id)
+        .where(SolutionPart.deleted_at.is_(None), Solution.deleted_at.is_(None), child.c.deleted_at.is_(None))
+    )
+    types_q = select(Solution.id, Solution.type).where(Solution.deleted_at.is_(None))
+    if not parts:
+        # BOM rows only: their solutions' types and whether they have children
+        ids = sorted({s for _, (s, *_) in bom})
+        types_q = types_q.where(Solution.id == _ids(ids)).with_for_update(read=True)
+        live_links = live_links.where(SolutionPart.parent_solution_id == _ids(ids))
+    h = Hierarchy(
+        types=dict((await db.execute(types_q)).tuples().all()),
+        links=list((await db.execute(live_links)).tuples().all()),
+    )
+    if bom:
+        mids = sorted({m for _, (_, m, *_) in bom})
+        h.modules = set((await db.execute(
+            select(Module.id).where(Module.id == _ids(mids), Module.deleted_at.is_(None)).with_for_update(read=True)
+        )).scalars())
+    return h
+
+
+async def validate_batch(db: AsyncSession, table: str, rows: Sequence[tuple]) -> Report:
+    """validate() for a batch of (line, values) rows, in the caller's write transaction."""
+    parts, bom = (rows, ()) if table == "solution_parts" else ((), rows)
+    started = time.perf_counter()
+    if parts:
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PARTS_LOCK_KEY})
+    h = await load(db, parts, bom)
+    report = await asyncio.to_thread(validate, h, parts, bom)
+    LOGGER.info(
+        "Validated %s batch: rows=%d stored_links=%d errors=%d warnings=%d in %.3fs",
+        table, len(rows), len(h.links), len(report.errors), len(report.warnings), time.perf_counter() - started,
+    )
+    return report
+
+
+def _read(path: Path) -> Iterator[Tuple[int, Dict[str, str]]]:
+    # line_num is the physical line a record ends on (quoted fields may span lines)
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, {k: (v or "").strip() for k, v in row.items() if k is not None}
+
+
+def _int(raw: str) -> Optional[int]:
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+def load_csv(root: Path) -> Tuple[Hierarchy, List[PartLine], List[BomLine], List[dict]]:
+    """(hierarchy, parts, bom, errors) from the CSV exports in `root`; all links are batch rows."""
+    errors: List[dict] = []
+    h = Hierarchy(modules=set())
+    for line, row in _read(root / "solutions.csv"):
+        if not row.get("Prozessnummer"):
+            continue
+        sid, kind = _int(row["Prozessnummer"]), row.get("Prozessart", "")
+        if sid is None or kind not in (MAIN_TYPE, PARTIAL_TYPE):
+            errors.append({"file": "solutions.csv", "line": line, "rule": "type",
+                           "error": f"bad Prozessnummer/Prozessart: {row['Prozessnummer']!r}, {kind!r}"})
+            continue
+        h.types[sid] = kind
+    for line, row in _read(root / "modules.csv"):
+        mid = _int(row.get("Lfd. Nummer", ""))
+        if mid is not None:
+            h.modules.add(mid)
+
+    def link_rows(name: str, columns: Tuple[str, str]) -> Iterator[Tuple[int, int, int, Dict[str, str]]]:
+        for line, row in _read(root / name):
+            a, b = _int(row.get(columns[0], "")), _int(row.get(columns[1], ""))
+            if a is None or b is None:
+                errors.append({"file": name, "line": line, "rule": "parse", "error": f"{columns[0]}/{columns[1]} must be integers"})
+                continue
+            yield line, a, b, row
+
+    parts = [
+        (line, (p, c, _int(row.get("qty", "")) or 1))
+        for line, p, c, row in link_rows("solution_parts.csv", ("parent_solution_id", "child_solution_id"))
+    ]
+    bom = [
+        (line, (s, m, row.get("role") or None, _int(row.get("qty", "")) or 1))
+        for line, s, m, row in link_rows("solution_modules_edges.csv", ("solution_id", "module_id"))
+    ]
+    return h, parts, bom, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check the hierarchy rules over the CSV exports")
+    parser.add_argument("--dir", type=Path, default=Path("."), help="Directory with the CSV exports (default: .)")
+    parser.add_argument("--errors-only", action="store_true", help="Do not print warnings")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    started = time.perf_counter()
+    h, parts, bom, errors = load_csv(args.dir)
+    part_report = validate(h, parts, orphans=True)
+    # the BOM check sees the CSV's parts as stored links (for not_effective)
+    bom_report = validate(Hierarchy(h.types, h.modules, [(p, c) for _, (p, c, _) in parts]), bom=bom)
+    findings = list(errors)
+    for name, report in (("solution_parts.csv", part_report), ("solution_modules_edges.csv", bom_report)):
+        for entry in report.errors + ([] if args.errors_only else report.warnings):
+            findings.append({"file": "solutions.csv" if entry["rule"] == "orphan" else name, **entry})
+    for entry in findings:
+        sys.stdout.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    n_errors = len(errors) + len(part_report.errors) + len(bom_report.errors)
+    LOGGER.info(
+        "Checked solutions=%d parts=%d bom=%d: errors=%d warnings=%d in %.3fs",
+        len(h.types), len(parts), len(bom), n_errors, len(part_report.warnings) + len(bom_report.warnings),
+        time.perf_counter() - started,
+    )
+    raise SystemExit(1 if n_errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,100 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from sqlalchemy import select, insert, update, delete
+from sqlalchemy import select, insert, update, delete, func
 from sqlalchemy.exc import IntegrityError
+from .cache import EntityCache, conditional_response
+from .changes import changes_response, check_privileges
+from .archive import run_archiver
+from .bulk import (
+    BULK_TABLES, changed_bom_rows, changed_part_rows, copy_merge, parse_link_rows, upsert_bom_rows, upsert_part_rows,
+)
 from .db import SessionLocal
-from .models import Solution, Module, SolutionPart, SolutionModule
-from .sync_neo4j import upsert_solutions, upsert_modules, upsert_has_part, sync_effective_bom
-
-
-app = FastAPI(title="DEHN Solutions API", version="0.1.0")
+from .effective_bom import refresh_effective_bom
+from .graph_index import graph_index
+from .hierarchy import validate_batch
+from .metrics import MetricsMiddleware, render as render_metrics
+from .models import SOLUTION_CONTENT, Solution, Module, SolutionPart, SolutionModule, content_hash_of
+from .outbox import enqueue, outbox_stats, run_worker
+from .pagination import decode_cursor, encode_cursor, ndjson_response
+from .property_index import parse_predicate, property_index
+from .reloadable import run_refresher
+from . import rollup
+from .search_index import search_index
+from .settings import load_settings
+from .similarity_index import similarity_index
+from .sync_neo4j import init_driver, close_driver
+from .trees import bump_tree_versions, tree_cache
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("api")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Neo4j driver per worker process; closed on shutdown so
+    # uvicorn reloads/restarts don't leak Bolt sockets.
+    init_driver()
+    try:
+        await asyncio.to_thread(
+            property_index.load,
+            Path(settings.staging_dir),
+            Path(settings.property_index_dir) if settings.property_index_dir else None,
+        )
+    except (OSError, KeyError, ValueError):
+        LOGGER.exception("Property index not loaded; /components/search will return 503")
+    try:
+        await check_privileges()
+    except Exception:
+        LOGGER.exception("Could not check the database role's privileges for GET /changes")
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(run_refresher(graph_index, stop, settings.graph_index_refresh_interval)),
+        asyncio.create_task(run_refresher(search_index, stop, settings.search_index_refresh_interval)),
+        asyncio.create_task(run_refresher(similarity_index, stop, settings.similarity_index_refresh_interval)),
+    ]
+    if settings.graph_sync_in_process:
+        tasks.append(asyncio.create_task(run_worker(stop)))
+    if settings.archive_interval > 0:
+        tasks.append(asyncio.create_task(run_archiver(stop, settings.archive_interval)))
+    try:
+        yield
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+        await close_driver()
+
+
+app = FastAPI(title="DEHN Solutions API", version="0.1.0", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+# Single-entity read caches; link (parts/BOM) writes don't change these payloads.
+solution_cache = EntityCache("solutions", settings.entity_cache_maxsize, settings.entity_cache_ttl)
+module_cache = EntityCache("modules", settings.entity_cache_maxsize, settings.entity_cache_ttl)
+
+SOLUTION_FIELDS = [
+    "id",
+    "name",
+    "type",
+    "merkmalsklasse_1",
+    "merkmalsklasse_2",
+    "merkmalsklasse_3",
+    "randbedingung_1",
+    "randbedingung_2",
+]
 
 
 class SolutionIn(BaseModel):
     id: int
     name: str
-    type: str = Field(regex="^(Hauptprozess|Teilprozess)$")
+    type: str = Field(pattern="^(Hauptprozess|Teilprozess)$")
     merkmalsklasse_1: Optional[str] = None
     merkmalsklasse_2: Optional[str] = None
     merkmalsklasse_3: Optional[str] = None
@@ -41,193 +121,532 @@ class ModuleIn(BaseModel):
 class PartLinkIn(BaseModel):
     parent_solution_id: int
     child_solution_id: int
-    qty: Optional[int] = 1
+    qty: Optional[int] = Field(1, gt=0)
 
 
 class BomLinkIn(BaseModel):
     solution_id: int
     module_id: int
-    qty: Optional[int] = 1
-    role: Optional[str] = None
+    qty: Optional[int] = Field(1, gt=0)
+    role: str = Field(..., min_length=1)  # part of the primary key, NOT NULL
 
 
 @app.post("/solutions", status_code=201)
-def create_solution(payload: SolutionIn):
-    with SessionLocal() as db:
+async def create_solution(payload: SolutionIn):
+    async with SessionLocal() as db:
         try:
-            db.execute(
+            await db.execute(
                 insert(Solution).values(**payload.model_dump())
             )
-            db.commit()
+            await bump_tree_versions(db, [payload.id])
+            await enqueue(db, "solution", [payload.id])
+            await db.commit()
         except IntegrityError as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=400, detail=str(e.orig))
-    # sync to Neo4j
-    upsert_solutions([(payload.id, payload.name, payload.type)])
+    solution_cache.invalidate(payload.id)
+    graph_index.put_solution(payload.id, payload.type)
+    search_index.put_solution(payload.id, payload.name)
     return {"ok": True}
 
 
-@app.get("/solutions/{sid}")
-def get_solution(sid: int):
-    with SessionLocal() as db:
-        row = db.execute(select(Solution).where(Solution.id == sid)).scalar_one_or_none()
+async def _load_solution(sid: int):
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(Solution).where(Solution.id == sid, Solution.deleted_at.is_(None))
+        )).scalar_one_or_none()
         if not row:
-            raise HTTPException(status_code=404, detail="Solution not found")
-        return {
-            k: getattr(row, k)
-            for k in [
-                "id",
-                "name",
-                "type",
-                "merkmalsklasse_1",
-                "merkmalsklasse_2",
-                "merkmalsklasse_3",
-                "randbedingung_1",
-                "randbedingung_2",
-            ]
-        }
+            return None
+        return {k: getattr(row, k) for k in SOLUTION_FIELDS}, row.updated_at
+
+
+@app.get("/solutions/{sid}")
+async def get_solution(sid: int, request: Request):
+    entry = await solution_cache.get_or_load(sid, lambda: _load_solution(sid))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    body, updated_at = entry
+    return conditional_response(request, f"solution-{sid}", body, updated_at)
 
 
 @app.get("/solutions")
-def list_solutions(limit: int = 100, offset: int = 0):
-    with SessionLocal() as db:
-        rows = db.execute(select(Solution).offset(offset).limit(limit)).scalars().all()
-        return [{"id": r.id, "name": r.name, "type": r.type} for r in rows]
+async def list_solutions(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    type: Optional[str] = None,
+    stream: bool = False,
+):
+    """Keyset-paginated list of live solutions ordered by id; stream=true dumps all matches as NDJSON."""
+    filters = [Solution.deleted_at.is_(None)]
+    if type is not None:
+        filters.append(Solution.type == type)
+    if stream:
+        return ndjson_response(select(*Solution.__table__.c).where(*filters).order_by(Solution.id))
+    after = decode_cursor(cursor)
+    if after is not None:
+        filters.append(Solution.id > after)
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(Solution.id, Solution.name, Solution.type).where(*filters).order_by(Solution.id).limit(limit)
+        )).all()
+    items = [{"id": r.id, "name": r.name, "type": r.type} for r in rows]
+    return {"items": items, "next": encode_cursor(rows[-1].id) if len(rows) == limit else None}
 
 
 @app.patch("/solutions/{sid}")
-def update_solution(sid: int, payload: SolutionIn):
-    with SessionLocal() as db:
-        res = db.execute(update(Solution).where(Solution.id == sid).values(**payload.model_dump()))
+async def update_solution(sid: int, payload: SolutionIn):
+    """Replace a solution; an identical payload (same id, same content_hash) writes and syncs nothing."""
+    values = payload.model_dump()
+    async with SessionLocal() as db:
+        stmt = update(Solution).where(Solution.id == sid, Solution.deleted_at.is_(None)).values(**values)
+        if payload.id == sid:
+            stmt = stmt.where(Solution.content_hash.is_distinct_from(content_hash_of(SOLUTION_CONTENT, values)))
+        res = await db.execute(stmt)
         if res.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Solution not found")
-        db.commit()
-    upsert_solutions([(payload.id, payload.name, payload.type)])
-    return {"ok": True}
+            if (await db.execute(select(Solution.id).where(Solution.id == sid, Solution.deleted_at.is_(None)))).first() is None:
+                raise HTTPException(status_code=404, detail="Solution not found")
+            return {"ok": True, "changed": False}
+        await bump_tree_versions(db, {sid, payload.id})
+        await enqueue(db, "solution", {sid, payload.id})
+        # a type change flips the MAIN-with-children rule for its effective BOM
+        await refresh_effective_bom(db, {payload.id})
+        await enqueue(db, "bom", {sid, payload.id})
+        await db.commit()
+    solution_cache.invalidate(sid, payload.id)
+    if payload.id != sid:
+        # id change cascades through the link tables; rebuild rather than patch
+        await graph_index.load()
+        search_index.drop("solution", sid)
+    else:
+        graph_index.put_solution(sid, payload.type)
+    search_index.put_solution(payload.id, payload.name)
+    await similarity_index.refresh({sid, payload.id})
+    return {"ok": True, "changed": True}
 
 
 @app.post("/modules", status_code=201)
-def create_module(payload: ModuleIn):
-    with SessionLocal() as db:
+async def create_module(payload: ModuleIn):
+    async with SessionLocal() as db:
         try:
-            db.execute(insert(Module).values(**payload.model_dump()))
-            db.commit()
+            await db.execute(insert(Module).values(**payload.model_dump()))
+            await enqueue(db, "module", [payload.id])
+            await db.commit()
         except IntegrityError as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(status_code=400, detail=str(e.orig))
-    upsert_modules([(payload.id, payload.name, payload.typ or "", payload.hersteller or "")])
+    module_cache.invalidate(payload.id)
+    search_index.put_module(payload.id, payload.name, payload.typ, payload.hersteller, payload.bauteilkategorie)
     return {"ok": True}
 
 
-@app.get("/modules/{mid}")
-def get_module(mid: int):
-    with SessionLocal() as db:
-        row = db.execute(select(Module).where(Module.id == mid)).scalar_one_or_none()
+async def _load_module(mid: int):
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(Module).where(Module.id == mid, Module.deleted_at.is_(None))
+        )).scalar_one_or_none()
         if not row:
-            raise HTTPException(status_code=404, detail="Module not found")
-        return {"id": row.id, "name": row.name, "typ": row.typ, "hersteller": row.hersteller}
+            return None
+        return {"id": row.id, "name": row.name, "typ": row.typ, "hersteller": row.hersteller}, row.updated_at
+
+
+@app.get("/modules/{mid}")
+async def get_module(mid: int, request: Request):
+    entry = await module_cache.get_or_load(mid, lambda: _load_module(mid))
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Module not found")
+    body, updated_at = entry
+    return conditional_response(request, f"module-{mid}", body, updated_at)
 
 
 @app.get("/modules")
-def list_modules(limit: int = 100, offset: int = 0):
-    with SessionLocal() as db:
-        rows = db.execute(select(Module).offset(offset).limit(limit)).scalars().all()
-        return [{"id": r.id, "name": r.name, "typ": r.typ} for r in rows]
+async def list_modules(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    bauteilkategorie: Optional[str] = None,
+    hersteller: Optional[str] = None,
+    stream: bool = False,
+):
+    """Keyset-paginated list of live modules ordered by id; stream=true dumps all matches as NDJSON."""
+    filters = [Module.deleted_at.is_(None)]
+    if bauteilkategorie is not None:
+        filters.append(Module.bauteilkategorie == bauteilkategorie)
+    if hersteller is not None:
+        filters.append(Module.hersteller == hersteller)
+    if stream:
+        return ndjson_response(select(*Module.__table__.c).where(*filters).order_by(Module.id))
+    after = decode_cursor(cursor)
+    if after is not None:
+        filters.append(Module.id > after)
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(Module.id, Module.name, Module.typ).where(*filters).order_by(Module.id).limit(limit)
+        )).all()
+    items = [{"id": r.id, "name": r.name, "typ": r.typ} for r in rows]
+    return {"items": items, "next": encode_cursor(rows[-1].id) if len(rows) == limit else None}
+
+
+async def _validate_or_422(db, table: str, rows: list) -> None:
+    report = await validate_batch(db, table, rows)
+    if report.errors:
+        raise HTTPException(status_code=422, detail={"errors": report.errors, "warnings": report.warnings})
 
 
 @app.put("/solutions/{sid}/parts")
-def upsert_parts(sid: int, links: List[PartLinkIn]):
+async def upsert_parts(sid: int, links: List[PartLinkIn]):
+    """Upsert HAS_PART links; only rows that differ from the stored ones are written and synced.
+
+    The payload is checked against the hierarchy rules first (api/hierarchy.py); any
+    violation is a 422 with per-row errors and nothing is written.
+    """
     rows = [(l.parent_solution_id, l.child_solution_id, l.qty or 1) for l in links]
-    with SessionLocal() as db:
-        for p, c, q in rows:
-            db.execute(
-                insert(SolutionPart)
-                .values(parent_solution_id=p, child_solution_id=c, qty=q)
-                .on_conflict_do_update(index_elements=[SolutionPart.parent_solution_id, SolutionPart.child_solution_id], set_={"qty": q})
-            )
-        db.commit()
-    upsert_has_part(rows)
-    return {"ok": True}
+    async with SessionLocal() as db:
+        await _validate_or_422(db, "solution_parts", list(enumerate(rows, start=1)))
+        rows = await changed_part_rows(db, rows)
+        if not rows:
+            return {"ok": True, "changed": False, "rows_changed": 0}
+        await upsert_part_rows(db, rows)
+        # a MAIN gaining children also changes its effective BOM
+        parents = {p for p, _, _ in rows}
+        await refresh_effective_bom(db, parents)
+        await bump_tree_versions(db, parents)
+        await enqueue(db, "parts", parents)
+        await enqueue(db, "bom", parents)
+        await db.commit()
+    graph_index.put_parts(rows)
+    await similarity_index.refresh(parents)
+    return {"ok": True, "changed": True, "rows_changed": len(rows)}
 
 
 @app.put("/solutions/{sid}/modules")
-def upsert_bom(sid: int, links: List[BomLinkIn]):
-    rows = [(l.solution_id, l.module_id, l.qty or 1, l.role or None) for l in links]
-    with SessionLocal() as db:
-        for s, m, q, r in rows:
-            db.execute(
-                insert(SolutionModule)
-                .values(solution_id=s, module_id=m, qty=q, role=r)
-                .on_conflict_do_update(index_elements=[SolutionModule.solution_id, SolutionModule.module_id, SolutionModule.role], set_={"qty": q, "role": r})
-            )
-        db.commit()
-        # compute effective BOM rows for these solution_ids using the SQL view
-        sids = list({s for s, *_ in rows})
-        eff = []
-        for s in sids:
-            result = db.execute(
-                select(
-                    SolutionModule.solution_id,
-                    SolutionModule.module_id,
-                    SolutionModule.qty,
-                    SolutionModule.role,
-                ).select_from(SolutionModule)
-                .where(SolutionModule.solution_id == s)
-            ).all()
-            eff.extend(result)
-    for s, m, q, r in eff:
-        sync_effective_bom(s, [(s, m, q, r)])
-    return {"ok": True}
+async def upsert_bom(sid: int, links: List[BomLinkIn]):
+    """Upsert BOM links; only rows that differ from the stored ones are written and synced.
+
+    Rows referencing unknown or deleted solutions/modules are a 422 (api/hierarchy.py).
+    """
+    rows = [(l.solution_id, l.module_id, l.qty or 1, l.role) for l in links]
+    async with SessionLocal() as db:
+        await _validate_or_422(db, "solution_modules", [(i, (s, m, r, q)) for i, (s, m, q, r) in enumerate(rows, start=1)])
+        rows = await changed_bom_rows(db, rows)
+        if not rows:
+            return {"ok": True, "changed": False, "rows_changed": 0}
+        await upsert_bom_rows(db, rows)
+        touched = {s for s, *_ in rows}
+        await refresh_effective_bom(db, touched)
+        await bump_tree_versions(db, touched)
+        await enqueue(db, "bom", touched)
+        await db.commit()
+    graph_index.put_bom(rows)
+    await similarity_index.refresh(touched)
+    return {"ok": True, "changed": True, "rows_changed": len(rows)}
+
+
+@app.post("/bulk/{table}")
+async def bulk_import(table: str, request: Request, skip_invalid: bool = False):
+    """Bulk upsert solution_parts / solution_modules rows from NDJSON or CSV.
+
+    Content-Type text/csv is read as CSV with a header row; anything else as NDJSON.
+    Invalid rows (parse errors and hierarchy rule violations, see api/hierarchy.py)
+    are reported per line; by default nothing is written if any row is invalid, with
+    skip_invalid=true the valid rows are still merged.
+    """
+    if table not in BULK_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown bulk table: {table}")
+    model = PartLinkIn if table == "solution_parts" else BomLinkIn
+    body = await request.body()
+    parsed, errors = parse_link_rows(body, request.headers.get("content-type", ""), model)
+    if errors and not skip_invalid:
+        raise HTTPException(status_code=422, detail={"errors": errors, "valid_rows": len(parsed)})
+    if table == "solution_parts":
+        rows = [(line, (l.parent_solution_id, l.child_solution_id, l.qty or 1)) for line, l in parsed]
+    else:
+        rows = [(line, (l.solution_id, l.module_id, l.role, l.qty or 1)) for line, l in parsed]
+    async with SessionLocal() as db:
+        # validated in the merge transaction, so the checked state is the one written against
+        report = await validate_batch(db, table, rows)
+        if report.errors:
+            bad = report.bad_lines()
+            if not skip_invalid:
+                raise HTTPException(status_code=422, detail={
+                    "errors": errors + report.errors, "warnings": report.warnings, "valid_rows": len(rows) - len(bad),
+                })
+            errors += report.errors
+            rows = [r for r in rows if r[0] not in bad]
+        ref_errors, touched = await _bulk_merge(db, table, rows)
+    if ref_errors:
+        raise HTTPException(status_code=422, detail={"errors": errors + ref_errors, "valid_rows": len(rows) - len(ref_errors)})
+    return {
+        "ok": True, "rows": len(rows), "changed": bool(touched), "solutions_changed": len(touched),
+        "errors": errors, "warnings": report.warnings,
+    }
+
+
+async def _bulk_merge(db, table: str, rows: list) -> tuple:
+    """Merge in `db`'s transaction and commit; only solutions whose rows actually changed are refreshed and synced."""
+    ref_errors, touched = await copy_merge(db, table, rows)
+    if ref_errors:
+        await db.rollback()
+        return ref_errors, set()
+    if not touched:
+        await db.commit()
+        return [], touched
+    await refresh_effective_bom(db, touched)
+    await bump_tree_versions(db, touched)
+    if table == "solution_parts":
+        await enqueue(db, "parts", touched)
+    await enqueue(db, "bom", touched)
+    await db.commit()
+    if table == "solution_parts":
+        graph_index.put_parts(values for _, values in rows if values[0] in touched)
+    else:
+        graph_index.put_bom((s, m, q, r) for _, (s, m, r, q) in rows if s in touched)
+    await similarity_index.refresh(touched)
+    return [], touched
 
 
 @app.delete("/solutions/{sid}")
-def delete_solution(sid: int, hard: bool = False):
-    with SessionLocal() as db:
+async def delete_solution(sid: int, hard: bool = False):
+    parents = set()
+    async with SessionLocal() as db:
+        await bump_tree_versions(db, [sid])
         if hard:
-            db.execute(delete(Solution).where(Solution.id == sid))
+            # the cascade drops the parents' links; a MAIN losing its last child gets its direct modules back
+            parents = set((await db.execute(
+                select(SolutionPart.parent_solution_id).where(SolutionPart.child_solution_id == sid)
+            )).scalars()) - {sid}
+            await db.execute(delete(Solution).where(Solution.id == sid))
+            await refresh_effective_bom(db, parents)
+            await enqueue(db, "bom", parents)
         else:
-            db.execute(update(Solution).where(Solution.id == sid).values(deleted_at=func.now()))
-        db.commit()
+            await db.execute(
+                update(Solution).where(Solution.id == sid, Solution.deleted_at.is_(None)).values(deleted_at=func.now())
+            )
+            await refresh_effective_bom(db, [sid])
+        await enqueue(db, "solution", [sid])
+        await db.commit()
+    solution_cache.invalidate(sid)
+    graph_index.drop_solution(sid, hard=hard)
+    search_index.drop("solution", sid)
+    await similarity_index.refresh({sid, *parents})
     return {"ok": True}
 
 
 @app.delete("/modules/{mid}")
-def delete_module(mid: int, hard: bool = False):
-    with SessionLocal() as db:
+async def delete_module(mid: int, hard: bool = False):
+    async with SessionLocal() as db:
+        await bump_tree_versions(db, module_ids=[mid])
+        # solutions whose BOM lists the module, while those rows still exist
+        users = set((await db.execute(
+            select(SolutionModule.solution_id).where(SolutionModule.module_id == mid)
+        )).scalars())
         if hard:
-            db.execute(delete(Module).where(Module.id == mid))
+            await db.execute(delete(Module).where(Module.id == mid))
         else:
-            db.execute(update(Module).where(Module.id == mid).values(deleted_at=func.now()))
-        db.commit()
+            await db.execute(
+                update(Module).where(Module.id == mid, Module.deleted_at.is_(None)).values(deleted_at=func.now())
+            )
+        await refresh_effective_bom(db, users)
+        await enqueue(db, "module", [mid])
+        await enqueue(db, "bom", users)
+        await db.commit()
+    module_cache.invalidate(mid)
+    search_index.drop("module", mid)
+    # a soft-deleted module leaves the effective BOM of explode/where-used too, like trees and rollup
+    graph_index.drop_module(mid)
+    await similarity_index.refresh(users)
     return {"ok": True}
 
 
 @app.delete("/solutions/{sid}/parts/{child_id}")
-def delete_part(sid: int, child_id: int):
-    with SessionLocal() as db:
-        db.execute(
-            delete(SolutionPart)
+async def delete_part(sid: int, child_id: int):
+    async with SessionLocal() as db:
+        # soft delete, so the removal shows up in GET /changes
+        await db.execute(
+            update(SolutionPart)
             .where(SolutionPart.parent_solution_id == sid)
             .where(SolutionPart.child_solution_id == child_id)
+            .where(SolutionPart.deleted_at.is_(None))
+            .values(deleted_at=func.now())
         )
-        db.commit()
-    # Graph detach for HAS_PART could be added here with a follow-up sync
+        await refresh_effective_bom(db, [sid])
+        await bump_tree_versions(db, [sid])
+        await enqueue(db, "parts", [sid])
+        await enqueue(db, "bom", [sid])
+        await db.commit()
+    graph_index.drop_part(sid, child_id)
+    await similarity_index.refresh([sid])
     return {"ok": True}
 
 
 @app.delete("/solutions/{sid}/modules/{mid}")
-def delete_bom(sid: int, mid: int, role: Optional[str] = None):
-    with SessionLocal() as db:
+async def delete_bom(sid: int, mid: int, role: Optional[str] = None):
+    async with SessionLocal() as db:
         stmt = (
-            delete(SolutionModule)
+            update(SolutionModule)
             .where(SolutionModule.solution_id == sid)
             .where(SolutionModule.module_id == mid)
+            .where(SolutionModule.deleted_at.is_(None))
+            .values(deleted_at=func.now())
         )
         if role is not None:
             stmt = stmt.where(SolutionModule.role == role)
-        db.execute(stmt)
-        db.commit()
-    # A subsequent effective sync will remove the edge in Neo4j
+        await db.execute(stmt)
+        await refresh_effective_bom(db, [sid])
+        await bump_tree_versions(db, [sid])
+        await enqueue(db, "bom", [sid])
+        await db.commit()
+    graph_index.drop_bom(sid, mid, role)
+    await similarity_index.refresh([sid])
     return {"ok": True}
 
 
+@app.get("/changes")
+async def list_changes(since: Optional[str] = None, cursor: Optional[str] = None):
+    """NDJSON change feed (upserts and soft-delete tombstones) since a watermark; see api.changes."""
+    return await changes_response(since, cursor)
+
+
+@app.get("/solutions/{sid}/bom/exploded")
+async def get_exploded_bom(sid: int):
+    """All modules a solution needs through its Teilprozesse, quantities multiplied (in-memory)."""
+    if not graph_index.loaded:
+        raise HTTPException(status_code=503, detail="Graph index not loaded yet")
+    modules = graph_index.explode(sid)
+    if modules is None:
+        raise HTTPException(status_code=404, detail="Solution not found")
+    return {"solution_id": sid, "modules": modules}
+
+
+@app.get("/solutions/{sid}/similar")
+async def get_similar_solutions(
+    sid: int,
+    k: int = Query(10, ge=1, le=100),
+    type: Optional[str] = Query(None, pattern="^(Hauptprozess|Teilprozess)$"),
+):
+    """Top-k solutions whose effective BOM (module, role) set is Jaccard-closest (MinHash/LSH)."""
+    if not similarity_index.loaded:
+        raise HTTPException(status_code=503, detail="Similarity index not loaded yet")
+    items = similarity_index.similar(sid, k, type)
+    if items is None:
+        raise HTTPException(status_code=404, detail="Solution has no effective BOM")
+    return {"solution_id": sid, "items": items}
+
+
+@app.get("/modules/{mid}/where-used")
+async def get_where_used(mid: int):
+    """Solutions whose effective BOM uses the module, plus every solution they roll up into."""
+    if not graph_index.loaded:
+        raise HTTPException(status_code=503, detail="Graph index not loaded yet")
+    return graph_index.where_used(mid)
+
+
+def _tree_response(request: Request, payload, etag: str) -> Response:
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and (etag in (t.strip() for t in if_none_match.split(",")) or if_none_match.strip() == "*"):
+        return Response(status_code=304, headers=headers)
+    body, encoding = payload.body(request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/trees")
+async def get_trees(request: Request):
+    """Every Hauptprozess tree (Teilprozesse and effective-BOM modules), prebuilt and pre-compressed."""
+    payload = await tree_cache.dataset()
+    return _tree_response(request, payload, f'"trees-{payload.version}"')
+
+
+@app.get("/trees/{sid}")
+async def get_tree(sid: int, request: Request):
+    payload = await tree_cache.tree(sid)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Hauptprozess not found")
+    return _tree_response(request, payload, f'"tree-{sid}-{payload.version}"')
+
+
+@app.get("/reports/rollup")
+async def rollup_report(
+    by: List[str] = Query(default=[]),
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+):
+    """Total module quantities per Hauptprozess through the hierarchy (sparse products); see api.rollup."""
+    unknown = sorted(set(by) - set(rollup.GROUP_COLUMNS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group column(s): {', '.join(unknown)}")
+    if format == "parquet" and rollup.pyarrow is None:
+        raise HTTPException(status_code=501, detail="Parquet output needs pyarrow on the server")
+    data = await rollup.load()
+    try:
+        header, rows = await asyncio.to_thread(rollup.rollup, data, by)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    name = "rollup" + "".join(f"_{c}" for c in by)
+    if format == "parquet":
+        body = await asyncio.to_thread(rollup.parquet_bytes, header, rows)
+        return Response(body, media_type="application/vnd.apache.parquet",
+                        headers={"Content-Disposition": f'attachment; filename="{name}.parquet"'})
+    return StreamingResponse(rollup.csv_chunks(header, rows), media_type="text/csv",
+                             headers={"Content-Disposition": f'attachment; filename="{name}.csv"'})
+
+
+@app.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    kind: Optional[str] = Query(None, pattern="^(solution|module)$"),
+    limit: int = Query(20, ge=1, le=200),
+    min_score: float = Query(0.3, ge=0.0, le=1.0),
+):
+    """Fuzzy name search over solutions and modules (trigram index, umlaut/diacritic folding)."""
+    if not search_index.loaded:
+        raise HTTPException(status_code=503, detail="Search index not loaded yet")
+    return {"q": q, "items": search_index.search(q, kind, limit, min_score)}
+
+
+@app.get("/components/search")
+async def search_components(
+    where: List[str] = Query(default=[]),
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Parametric search, e.g. ?category=robot&where=Load capacity [kg]>=6&where=Range>=0.9 m.
+
+    Predicates are ANDed; units are normalised (mm/m, g/kg, ...) before comparing.
+    """
+    if not property_index.loaded:
+        raise HTTPException(status_code=503, detail="Property index not loaded")
+    try:
+        predicates = [parse_predicate(w) for w in where]
+        codes = property_index.search(predicates, category)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=e.args[0])
+    return {"total": len(codes), "items": property_index.components(codes[:limit].tolist())}
+
+
+@app.get("/components/properties")
+async def list_component_properties():
+    """Numeric properties available to /components/search, with base unit and value range."""
+    if not property_index.loaded:
+        raise HTTPException(status_code=503, detail="Property index not loaded")
+    return property_index.properties()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"solutions": solution_cache.stats(), "modules": module_cache.stats(), "trees": tree_cache.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: request, SQL, pool and Neo4j timings for this worker."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/sync/status")
+async def sync_status():
+    """How far the graph is behind Postgres (outbox depth and lag)."""
+    return await outbox_stats()
+
+
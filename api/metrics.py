@@ -0,0 +1,313 @@
+"""Request, SQL and Neo4j timing metrics in Prometheus text format, plus slow logs.
+
+- MetricsMiddleware (ASGI) times every request per route template and status, and
+  opens a RequestTiming that SQL observations add to.
+- instrument_engine() hooks SQLAlchemy cursor events on the engine: statement count
+  and duration per operation, per request totals, and the slow-query log.
+- TimedAsyncQueuePool measures connection checkout (waiting for a free pool slot,
+  or opening a connection) per checkout.
+- timed_neo4j wraps the api.sync_neo4j functions: round-trip duration and outcome
+  per function. Handlers never call Neo4j (writes go through api.outbox), so this
+  is background time: the outbox also records each drain and each kind's sync
+  batch (GRAPH_SYNC_DRAIN, GRAPH_SYNC_BATCH).
+
+Requests slower than SLOW_REQUEST_MS are logged with their breakdown (SQL, pool
+wait, rest = serialisation and Python) and their slowest statements;
+statements slower than SLOW_QUERY_MS are logged with their text. 0 disables a log.
+
+The registry is per process; with several uvicorn workers each one exposes its own
+/metrics. No prometheus_client dependency: only the exposition format is needed.
+"""
+
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .settings import load_settings
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("metrics")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+_INF_BOUND = 'le="+Inf"'
+_SLOWEST_KEPT = 3
+_STATEMENT_LOG_CHARS = 2000
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type_name}\n"
+        return head + "".join(line + "\n" for line in self.samples())
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self._values: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        bounds = ['le="%g"' % b for b in self.buckets]
+        out = []
+        for key, entry in items:
+            cumulative = 0
+            for le, n in zip(bounds, entry):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            out.append(f"{self.name}_bucket{_labels(self.labelnames, key, _INF_BOUND)} {entry[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {entry[-2]}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {entry[-1]}")
+        return out
+
+
+class GaugeCallback(_Metric):
+    """Gauge read at scrape time; `read` returns {label values: value}."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 read: Callable[[], Dict[Tuple[str, ...], float]]) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._read = read
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in sorted(self._read().items())]
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+HTTP_DURATION = Histogram(
+    "http_request_duration_seconds", "Request latency until the last body chunk is sent.", ("method", "route", "status")
+)
+HTTP_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request.", ("method", "route"), COUNT_BUCKETS
+)
+HTTP_SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent in SQL statements per request.", ("method", "route")
+)
+HTTP_POOL_WAIT_SECONDS = Histogram(
+    "http_request_db_pool_wait_seconds", "Time spent checking out pool connections per request.", ("method", "route")
+)
+SQL_DURATION = Histogram(
+    "db_statement_duration_seconds", "SQL statement duration by leading keyword.", ("operation", "outcome")
+)
+POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool (waiting for a slot or connecting)."
+)
+NEO4J_DURATION = Histogram(
+    "neo4j_call_duration_seconds", "Duration of api.sync_neo4j calls (all their round trips).", ("function", "outcome")
+)
+GRAPH_SYNC_DRAIN = Histogram(
+    "graph_sync_drain_seconds", "Duration of one outbox drain that claimed intents (claim, sync, commit).", ("outcome",)
+)
+GRAPH_SYNC_BATCH = Histogram(
+    "graph_sync_batch_seconds", "Neo4j sync time of one kind's intents within an outbox drain.", ("kind", "outcome")
+)
+GRAPH_SYNC_BATCH_SIZE = Histogram(
+    "graph_sync_batch_intents", "Intents claimed per outbox drain.", (), COUNT_BUCKETS
+)
+
+
+@dataclass
+class RequestTiming:
+    method: str
+    path: str
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    slowest: List[Tuple[float, str]] = field(default_factory=list)  # (seconds, statement), descending
+
+    def add_statement(self, seconds: float, statement: str) -> None:
+        self.sql_count += 1
+        self.sql_seconds += seconds
+        if len(self.slowest) < _SLOWEST_KEPT or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda s: -s[0])
+            del self.slowest[_SLOWEST_KEPT:]
+
+
+_current: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip(" \n\t(").split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in _SQL_OPERATIONS else "OTHER"
+
+
+def _observe_statement(statement: str, seconds: float, outcome: str) -> None:
+    SQL_DURATION.observe(seconds, operation=_operation(statement), outcome=outcome)
+    timing = _current.get()
+    if timing is not None:
+        timing.add_statement(seconds, statement)
+    if settings.slow_query_ms > 0 and seconds * 1000 >= settings.slow_query_ms:
+        where = f"{timing.method} {timing.path}" if timing is not None else "background"
+        LOGGER.warning("Slow query %.1fms (%s, %s): %s", seconds * 1000, where, outcome, statement[:_STATEMENT_LOG_CHARS])
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Attach statement timing to the engine (events live on the sync core engine)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _observe_statement(statement, time.perf_counter() - conn.info["metrics_started"].pop(), "ok")
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(ctx):
+        stack = ctx.connection.info.get("metrics_started") if ctx.connection is not None else None
+        if stack and ctx.statement is not None:
+            _observe_statement(ctx.statement, time.perf_counter() - stack.pop(), "error")
+
+    def _pool_state() -> Dict[Tuple[str, ...], float]:
+        pool = sync_engine.pool
+        if not isinstance(pool, AsyncAdaptedQueuePool):
+            return {}
+        return {("checked_out",): pool.checkedout(), ("idle",): pool.checkedin(), ("overflow",): max(pool.overflow(), 0)}
+
+    GaugeCallback("db_pool_connections", "Connections in the SQLAlchemy pool by state.", ("state",), _pool_state)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records how long each checkout took."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            seconds = time.perf_counter() - started
+            POOL_WAIT.observe(seconds)
+            timing = _current.get()
+            if timing is not None:
+                timing.pool_wait_seconds += seconds
+
+
+def timed_neo4j(fn):
+    """Record duration and outcome of a Neo4j sync function."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            NEO4J_DURATION.observe(time.perf_counter() - started, function=name, outcome=outcome)
+
+    return wrapper
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histograms and the slow-request log."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timing = RequestTiming(scope["method"], scope["path"])
+        token = _current.set(timing)
+        status = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            _current.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            method = scope["method"]
+            HTTP_DURATION.observe(seconds, method=method, route=route, status=str(status))
+            HTTP_SQL_STATEMENTS.observe(timing.sql_count, method=method, route=route)
+            HTTP_SQL_SECONDS.observe(timing.sql_seconds, method=method, route=route)
+            HTTP_POOL_WAIT_SECONDS.observe(timing.pool_wait_seconds, method=method, route=route)
+            if settings.slow_request_ms > 0 and seconds * 1000 >= settings.slow_request_ms:
+                _log_slow_request(timing, route, status, seconds)
+
+
+def _log_slow_request(timing: RequestTiming, route: str, status: int, seconds: float) -> None:
+    rest = seconds - timing.sql_seconds - timing.pool_wait_seconds
+    slowest = "".join(
+        f"\n  {s * 1000:.1f}ms {statement[:_STATEMENT_LOG_CHARS]}" for s, statement in timing.slowest
+    )
+    LOGGER.warning(
+        "Slow request %s %s (route %s) -> %d in %.1fms: sql=%d stmts/%.1fms pool_wait=%.1fms other=%.1fms%s",
+        timing.method, timing.path, route, status, seconds * 1000,
+        timing.sql_count, timing.sql_seconds * 1000, timing.pool_wait_seconds * 1000, max(rest, 0.0) * 1000, slowest,
+    )
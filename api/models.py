@@ -1,8 +1,41 @@
-from sqlalchemy import BigInteger, Column, Integer, Text, TIMESTAMP, CheckConstraint, ForeignKey, Index
+from typing import Mapping, Sequence
+
+from sqlalchemy import BigInteger, Column, Computed, Integer, Table, Text, TIMESTAMP, CheckConstraint, ForeignKey, Index, column, table, text
 from sqlalchemy.sql import func
 from .db import Base
 
 
+SOLUTION_CONTENT = (
+    "name", "type", "merkmalsklasse_1", "merkmalsklasse_2", "merkmalsklasse_3", "randbedingung_1", "randbedingung_2",
+    "verknuepfungen_prozessebene", "verknuepfungen_baukastenebene", "hinweise", "ablageort_konstruktiv",
+    "ablageort_steuerungstechnisch", "ablageort_prueftechnisch", "ablageort_robotertechnisch",
+)
+MODULE_CONTENT = (
+    "name", "version", "bauteilkategorie", "hersteller", "typ", "eigenschaft_1", "wert_1", "eigenschaft_2", "wert_2",
+    "eigenschaft_3", "wert_3", "ablageort_konstruktiv", "ablageort_steuerungstechnisch", "ablageort_prueftechnisch",
+    "ablageort_robotertechnisch", "sonstiges", "spalte1",
+)
+
+
+def _content_hash_sql(operands: Sequence[str]) -> str:
+    # quote_nullable keeps NULL, '' and embedded commas apart; all of it is IMMUTABLE,
+    # as a generated column requires
+    return "md5(" + " || ',' || ".join(f"quote_nullable({o})" for o in operands) + ")"
+
+
+# Live-row reads filter on deleted_at IS NULL; partial indexes with the same predicate
+# cover only the live catalog, tombstone indexes only the rows api.archive moves out.
+LIVE = text("deleted_at IS NULL")
+TOMBSTONE = text("deleted_at IS NOT NULL")
+
+
+def content_hash_of(columns: Sequence[str], values: Mapping[str, object]):
+    """SQL expression hashing `values` exactly like the content_hash column over `columns`."""
+    return text(_content_hash_sql([f"CAST(:fp_{c} AS text)" for c in columns])).bindparams(
+        **{f"fp_{c}": values.get(c) for c in columns}
+    )
+
+
 class Solution(Base):
     __tablename__ = "solutions"
 
@@ -23,12 +56,18 @@ class Solution(Base):
     ablageort_steuerungstechnisch = Column(Text)
     ablageort_prueftechnisch = Column(Text)
     ablageort_robotertechnisch = Column(Text)
+    # fingerprint of the columns above; writes compare against it to skip no-ops
+    content_hash = Column(Text, Computed(_content_hash_sql(SOLUTION_CONTENT), persisted=True))
 
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    # clock_timestamp(), not now(): the change feed's watermark relies on it (api/changes.py)
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
     deleted_at = Column(TIMESTAMP(timezone=True))
 
     __table_args__ = (
-        Index("idx_solutions_type", "type"),
+        Index("idx_solutions_live_id", "id", postgresql_where=LIVE),
+        Index("idx_solutions_live_type", "type", "id", postgresql_where=LIVE),
+        Index("idx_solutions_updated_at", "updated_at", "id"),
+        Index("idx_solutions_tombstones", "deleted_at", postgresql_where=TOMBSTONE),
         CheckConstraint("type IN ('Hauptprozess','Teilprozess')", name="solutions_type_check"),
     )
 
@@ -54,10 +93,20 @@ class Module(Base):
     ablageort_robotertechnisch = Column(Text)
     sonstiges = Column(Text)
     spalte1 = Column(Text)
+    content_hash = Column(Text, Computed(_content_hash_sql(MODULE_CONTENT), persisted=True))
 
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
     deleted_at = Column(TIMESTAMP(timezone=True))
 
+    __table_args__ = (
+        # (filter, id) so filtered keyset pages are index range scans
+        Index("idx_modules_live_id", "id", postgresql_where=LIVE),
+        Index("idx_modules_live_bauteilkategorie", "bauteilkategorie", "id", postgresql_where=LIVE),
+        Index("idx_modules_live_hersteller", "hersteller", "id", postgresql_where=LIVE),
+        Index("idx_modules_updated_at", "updated_at", "id"),
+        Index("idx_modules_tombstones", "deleted_at", postgresql_where=TOMBSTONE),
+    )
+
 
 class SolutionPart(Base):
     __tablename__ = "solution_parts"
@@ -65,9 +114,16 @@ class SolutionPart(Base):
     parent_solution_id = Column(BigInteger, ForeignKey("solutions.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
     child_solution_id = Column(BigInteger, ForeignKey("solutions.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
     qty = Column(Integer, nullable=False, server_default="1")
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
     deleted_at = Column(TIMESTAMP(timezone=True))
 
+    __table_args__ = (
+        # all rows, not only live ones: ON DELETE CASCADE looks links up by child
+        Index("idx_solution_parts_child", "child_solution_id"),
+        Index("idx_solution_parts_updated_at", "updated_at", "parent_solution_id", "child_solution_id"),
+        Index("idx_solution_parts_tombstones", "deleted_at", postgresql_where=TOMBSTONE),
+    )
+
 
 class SolutionModule(Base):
     __tablename__ = "solution_modules"
@@ -76,12 +132,97 @@ class SolutionModule(Base):
     module_id = Column(BigInteger, ForeignKey("modules.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
     role = Column(Text, primary_key=True)
     qty = Column(Integer, nullable=False, server_default="1")
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.clock_timestamp(), onupdate=func.clock_timestamp())
     deleted_at = Column(TIMESTAMP(timezone=True))
 
     __table_args__ = (
         Index("idx_solution_modules_module", "module_id"),
+        Index("idx_solution_modules_updated_at", "updated_at", "solution_id", "module_id", "role"),
+        Index("idx_solution_modules_tombstones", "deleted_at", postgresql_where=TOMBSTONE),
         CheckConstraint("qty > 0", name="solution_modules_qty_pos"),
     )
 
 
+def _archive_table(model) -> Table:
+    """<table>_archive: the table's columns as plain nullable columns, plus archived_at.
+
+    No keys: a link can be deleted, recreated and archived again.
+    """
+    source = model.__table__
+    return Table(
+        f"{source.name}_archive",
+        Base.metadata,
+        *(Column(c.name, c.type) for c in source.c),
+        Column("archived_at", TIMESTAMP(timezone=True), nullable=False, server_default=func.now()),
+        Index(f"idx_{source.name}_archive_key", *(c.name for c in source.primary_key)),
+        Index(f"idx_{source.name}_archive_archived_at", "archived_at"),
+    )
+
+
+# Tombstones past the retention window, moved out by api.archive
+ARCHIVE_TABLES = {model.__tablename__: _archive_table(model) for model in (Solution, Module, SolutionPart, SolutionModule)}
+
+
+class SolutionModuleEffective(Base):
+    """Materialised v_solution_modules_effective, one row per surviving solution_modules row.
+
+    Kept current by api.effective_bom.refresh_effective_bom() in the write handlers'
+    own transactions; id changes and hard deletes follow through the foreign keys.
+    """
+
+    __tablename__ = "solution_modules_effective"
+
+    solution_id = Column(BigInteger, ForeignKey("solutions.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    module_id = Column(BigInteger, ForeignKey("modules.id", onupdate="CASCADE", ondelete="CASCADE"), primary_key=True)
+    role = Column(Text, primary_key=True)
+    qty = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # the primary key already serves lookups by solution_id
+        Index("idx_solution_modules_effective_module", "module_id"),
+    )
+
+
+class SolutionTreeVersion(Base):
+    """Change counter per solution for the prebuilt tree payloads (api.trees).
+
+    No foreign key: counters outlive hard deletes, so the dataset version (their
+    sum) still moves when a tree disappears.
+    """
+
+    __tablename__ = "solution_tree_versions"
+
+    solution_id = Column(BigInteger, primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default="0")
+
+
+class GraphSyncOutbox(Base):
+    """Pending Postgres -> Neo4j sync intents, written in the same transaction as the change."""
+
+    __tablename__ = "graph_sync_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(Text, nullable=False)  # 'solution' | 'module' | 'parts' | 'bom'
+    entity_id = Column(BigInteger, nullable=False)
+    attempts = Column(Integer, nullable=False, server_default="0")
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    next_attempt_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_graph_sync_outbox_due", "next_attempt_at", "id"),
+        CheckConstraint("kind IN ('solution','module','parts','bom')", name="graph_sync_outbox_kind_check"),
+    )
+
+
+# Read-only SQL VIEW (see README): effective BOM after the MAIN-with-children rule.
+# Declared as a lightweight table() so it is never part of Base.metadata. Readers use
+# SolutionModuleEffective; the view stays as the reference definition for
+# `python -m api.effective_bom verify`.
+v_solution_modules_effective = table(
+    "v_solution_modules_effective",
+    column("solution_id", BigInteger),
+    column("module_id", BigInteger),
+    column("qty", Integer),
+    column("role", Text),
+)
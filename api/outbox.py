@@ -0,0 +1,246 @@
+"""Transactional outbox for the Postgres -> Neo4j graph sync.
+
+Write handlers call enqueue() inside their own SQLAlchemy transaction, so a sync
+intent exists if and only if the write committed. drain_once() claims due
+intents (FOR UPDATE SKIP LOCKED, safe with several workers), coalesces repeated
+touches of the same id, re-reads the current state from Postgres and pushes it
+with one UNWIND per kind. Failures are retried with exponential backoff.
+
+The API runs the worker as an in-process asyncio task (GRAPH_SYNC_IN_PROCESS=1);
+it can also run standalone:
+
+  python -m api.outbox [--once] [--batch-size 500]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+from .metrics import GRAPH_SYNC_BATCH, GRAPH_SYNC_BATCH_SIZE, GRAPH_SYNC_DRAIN
+from .models import GraphSyncOutbox, Module, Solution, SolutionModuleEffective, SolutionPart
+from .settings import load_settings
+from .sync_neo4j import (
+    close_driver,
+    delete_modules,
+    delete_solutions,
+    sync_effective_boms,
+    sync_has_part,
+    upsert_modules,
+    upsert_solutions,
+)
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("graph_outbox")
+
+# Nodes must exist before edges are merged onto them; kinds within a phase are
+# independent and synced concurrently.
+PHASES = (("solution", "module"), ("parts", "bom"))
+
+_worker_stats: Dict[str, object] = {"last_success_at": None, "synced": 0, "failed": 0}
+
+
+async def enqueue(db: AsyncSession, kind: str, ids: Iterable[int]) -> None:
+    """Record sync intents in the caller's transaction (commit is up to the caller)."""
+    rows = [{"kind": kind, "entity_id": i} for i in sorted(set(ids))]
+    if rows:
+        await db.execute(insert(GraphSyncOutbox), rows)
+
+
+# Syncers read current state in their own short session (the claiming session keeps
+# only the outbox row locks), so syncers of one phase can run concurrently.
+
+async def _sync_solutions(ids: List[int]) -> None:
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(Solution.id, Solution.name, Solution.type, Solution.deleted_at).where(Solution.id.in_(ids))
+        )).all()
+    live = [(r.id, r.name, r.type) for r in rows if r.deleted_at is None]
+    live_ids = {r[0] for r in live}
+    await upsert_solutions(live)
+    await delete_solutions([i for i in ids if i not in live_ids])
+
+
+async def _sync_modules(ids: List[int]) -> None:
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(Module.id, Module.name, Module.typ, Module.hersteller, Module.deleted_at).where(Module.id.in_(ids))
+        )).all()
+    live = [(r.id, r.name, r.typ or "", r.hersteller or "") for r in rows if r.deleted_at is None]
+    live_ids = {r[0] for r in live}
+    await upsert_modules(live)
+    await delete_modules([i for i in ids if i not in live_ids])
+
+
+async def _sync_parts(ids: List[int]) -> None:
+    async with SessionLocal() as db:
+        edges = (await db.execute(
+            select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id, SolutionPart.qty)
+            .where(SolutionPart.parent_solution_id.in_(ids))
+            .where(SolutionPart.deleted_at.is_(None))
+        )).all()
+    await sync_has_part(ids, [tuple(e) for e in edges])
+
+
+async def _sync_bom(ids: List[int]) -> None:
+    eff = SolutionModuleEffective
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(eff.solution_id, eff.module_id, eff.qty, eff.role)
+            .join(Module, Module.id == eff.module_id)
+            .where(eff.solution_id.in_(ids), Module.deleted_at.is_(None))
+        )).all()
+    await sync_effective_boms(ids, [tuple(r) for r in rows])
+
+
+_SYNCERS: Dict[str, Callable[[List[int]], Awaitable[None]]] = {
+    "solution": _sync_solutions,
+    "module": _sync_modules,
+    "parts": _sync_parts,
+    "bom": _sync_bom,
+}
+
+
+async def _timed_sync(kind: str, entity_ids: List[int]) -> None:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        await _SYNCERS[kind](entity_ids)
+        outcome = "ok"
+    finally:
+        GRAPH_SYNC_BATCH.observe(time.perf_counter() - started, kind=kind, outcome=outcome)
+
+
+async def _reschedule(db: AsyncSession, outbox_ids: List[int], attempts: int, error: str) -> None:
+    delay = min(settings.graph_sync_max_backoff, float(2 ** attempts))
+    await db.execute(
+        update(GraphSyncOutbox)
+        .where(GraphSyncOutbox.id.in_(outbox_ids))
+        .values(
+            attempts=GraphSyncOutbox.attempts + 1,
+            last_error=error[:2000],
+            next_attempt_at=func.now() + timedelta(seconds=delay),
+        )
+    )
+
+
+async def drain_once(batch_size: Optional[int] = None) -> int:
+    """Claim and sync one batch of due intents; returns the number of intents claimed."""
+    batch_size = batch_size or settings.graph_sync_batch_size
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        claimed = (await db.execute(
+            select(GraphSyncOutbox.id, GraphSyncOutbox.kind, GraphSyncOutbox.entity_id, GraphSyncOutbox.attempts)
+            .where(GraphSyncOutbox.next_attempt_at <= func.now())
+            .order_by(GraphSyncOutbox.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not claimed:
+            return 0
+        GRAPH_SYNC_BATCH_SIZE.observe(len(claimed))
+
+        by_kind: Dict[str, list] = defaultdict(list)
+        for row in claimed:
+            by_kind[row.kind].append(row)
+
+        failure: Optional[str] = None
+        for phase in PHASES:
+            kinds = [k for k in phase if by_kind.get(k)]
+            if not kinds:
+                continue
+            if failure is not None:
+                # Edges depend on nodes; defer later phases until the earlier one succeeds.
+                for kind in kinds:
+                    rows = by_kind[kind]
+                    await _reschedule(db, [r.id for r in rows], max(r.attempts for r in rows) + 1, f"deferred: {failure}")
+                continue
+            results = await asyncio.gather(
+                *(_timed_sync(k, sorted({r.entity_id for r in by_kind[k]})) for k in kinds),
+                return_exceptions=True,
+            )
+            for kind, result in zip(kinds, results):
+                rows = by_kind[kind]
+                outbox_ids = [r.id for r in rows]
+                if isinstance(result, BaseException):
+                    LOGGER.error("Graph sync failed for kind=%s (%d intents)", kind, len(rows), exc_info=result)
+                    failure = f"{kind}: {result}"
+                    await _reschedule(db, outbox_ids, max(r.attempts for r in rows) + 1, failure)
+                    _worker_stats["failed"] = int(_worker_stats["failed"]) + len(rows)
+                else:
+                    await db.execute(delete(GraphSyncOutbox).where(GraphSyncOutbox.id.in_(outbox_ids)))
+                    _worker_stats["synced"] = int(_worker_stats["synced"]) + len(rows)
+        await db.commit()
+
+    GRAPH_SYNC_DRAIN.observe(time.perf_counter() - started, outcome="ok" if failure is None else "error")
+    if failure is None:
+        _worker_stats["last_success_at"] = datetime.now(timezone.utc).isoformat()
+    return len(claimed)
+
+
+async def outbox_stats() -> dict:
+    """Queue depth and lag of the graph behind Postgres."""
+    async with SessionLocal() as db:
+        depth, oldest, retrying, lag = (await db.execute(
+            select(
+                func.count(GraphSyncOutbox.id),
+                func.min(GraphSyncOutbox.created_at),
+                func.count(GraphSyncOutbox.id).filter(GraphSyncOutbox.attempts > 0),
+                func.extract("epoch", func.now() - func.min(GraphSyncOutbox.created_at)),
+            )
+        )).one()
+    return {
+        "queue_depth": depth,
+        "retrying": retrying,
+        "oldest_pending_at": oldest.isoformat() if oldest else None,
+        "lag_seconds": float(lag) if lag is not None else 0.0,
+        **_worker_stats,
+    }
+
+
+async def run_worker(stop: asyncio.Event, batch_size: Optional[int] = None, once: bool = False) -> None:
+    """Drain the outbox until `stop` is set (or until empty with once=True)."""
+    batch_size = batch_size or settings.graph_sync_batch_size
+    while not stop.is_set():
+        try:
+            claimed = await drain_once(batch_size)
+        except Exception:
+            LOGGER.exception("Graph sync worker iteration failed")
+            claimed = 0
+        if claimed < batch_size:
+            if once:
+                return
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.graph_sync_poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _main(batch_size: int, once: bool) -> None:
+    try:
+        await run_worker(asyncio.Event(), batch_size, once)
+        LOGGER.info("Outbox status: %s", await outbox_stats())
+    finally:
+        await close_driver()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Drain the Postgres -> Neo4j graph sync outbox")
+    parser.add_argument("--once", action="store_true", help="Drain until empty and exit")
+    parser.add_argument("--batch-size", type=int, default=settings.graph_sync_batch_size)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    asyncio.run(_main(args.batch_size, args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Keyset pagination and NDJSON streaming helpers for list endpoints.
+
+Cursors are opaque to clients (urlsafe base64 of a small JSON object holding the
+last id seen), so the keyset column can change without breaking them.
+"""
+
+import base64
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+
+from .db import SessionLocal
+
+
+STREAM_CHUNK_ROWS = 1000
+
+
+def encode_state(state: dict) -> str:
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_state(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(state, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return state
+
+
+def encode_cursor(last_id: int) -> str:
+    return encode_state({"after": last_id})
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        return int(decode_state(cursor)["after"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _ndjson_rows(stmt: Select) -> AsyncIterator[bytes]:
+    # Server-side cursor: rows are fetched in chunks, never the full result set.
+    async with SessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=STREAM_CHUNK_ROWS))
+        async for partition in result.mappings().partitions():
+            yield "".join(json.dumps(dict(row), default=str, ensure_ascii=False) + "\n" for row in partition).encode("utf-8")
+
+
+def ndjson_response(stmt: Select) -> StreamingResponse:
+    return StreamingResponse(_ndjson_rows(stmt), media_type="application/x-ndjson")
@@ -0,0 +1,159 @@
+"""EXPLAIN every Cypher statement the graph sync sends and flag label/node scans.
+
+Each api.sync_neo4j function is called with small sample arguments through a
+driver wrapper that prefixes every statement with EXPLAIN, so the real statements
+and parameters are planned by the server but nothing is executed or written. The
+reconcile export queries are planned the same way.
+
+Sync statements are hot paths (run per outbox batch) and must be driven by the
+uniqueness constraints / indexes from neo4j/constraints_v2.cypher: a plan that
+contains AllNodesScan or NodeByLabelScan fails. Reconcile exports read the whole
+dataset by design and only fail on AllNodesScan.
+
+Exits 1 if any plan violates its rule, so it can gate a release against a Neo4j
+with the constraints applied (NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD).
+
+Usage:
+  python -m api.plan_check [--verbose]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Awaitable, Callable, Iterator, List, Set, Tuple
+
+from . import sync_neo4j
+from .reconcile import ENTITIES
+from .settings import load_settings
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("plan_check")
+
+HOT_PATH_FORBIDDEN = frozenset({"AllNodesScan", "NodeByLabelScan"})
+EXPORT_FORBIDDEN = frozenset({"AllNodesScan"})
+
+# (name, call) pairs covering every write path in api.sync_neo4j
+SYNC_CALLS: List[Tuple[str, Callable[[], Awaitable[None]]]] = [
+    ("upsert_solutions", lambda: sync_neo4j.upsert_solutions([(1, "main", "Hauptprozess"), (2, "partial", "Teilprozess")])),
+    ("upsert_modules", lambda: sync_neo4j.upsert_modules([(3, "module", "typ", "hersteller")])),
+    ("delete_solutions", lambda: sync_neo4j.delete_solutions([1])),
+    ("delete_modules", lambda: sync_neo4j.delete_modules([3])),
+    ("upsert_has_part", lambda: sync_neo4j.upsert_has_part([(1, 2, 1)])),
+    ("sync_has_part", lambda: sync_neo4j.sync_has_part([1], [(1, 2, 1)])),
+    ("sync_effective_boms", lambda: sync_neo4j.sync_effective_boms([2], [(2, 3, 1, "role")])),
+]
+
+
+class _NoRecords:
+    async def consume(self) -> None:
+        return None
+
+    async def data(self) -> list:
+        return []
+
+
+class _ExplainTransaction:
+    def __init__(self, tx, plans: list, name: str) -> None:
+        self._tx = tx
+        self._plans = plans
+        self._name = name
+
+    async def run(self, cypher: str, **params) -> _NoRecords:
+        summary = await (await self._tx.run("EXPLAIN " + cypher, **params)).consume()
+        self._plans.append((self._name, cypher, summary.plan))
+        return _NoRecords()
+
+
+class _ExplainSession:
+    def __init__(self, session, plans: list, name: str) -> None:
+        self._session = session
+        self._plans = plans
+        self._name = name
+
+    async def __aenter__(self) -> "_ExplainSession":
+        await self._session.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._session.__aexit__(*exc)
+
+    async def _execute(self, execute, work, *args, **kwargs):
+        async def explained(tx, *a, **kw):
+            return await work(_ExplainTransaction(tx, self._plans, self._name), *a, **kw)
+
+        return await execute(explained, *args, **kwargs)
+
+    async def execute_write(self, work, *args, **kwargs):
+        return await self._execute(self._session.execute_write, work, *args, **kwargs)
+
+    async def execute_read(self, work, *args, **kwargs):
+        return await self._execute(self._session.execute_read, work, *args, **kwargs)
+
+
+class _ExplainDriver:
+    def __init__(self, driver) -> None:
+        self._driver = driver
+        self.plans: List[Tuple[str, str, dict]] = []  # (name, cypher, plan)
+        self.name = ""
+
+    def session(self, **config) -> _ExplainSession:
+        return _ExplainSession(self._driver.session(**config), self.plans, self.name)
+
+    async def close(self) -> None:
+        await self._driver.close()
+
+
+def operators(plan: dict) -> Iterator[str]:
+    """Operator names of a plan tree ("NodeUniqueIndexSeek@neo4j" -> "NodeUniqueIndexSeek")."""
+    yield plan["operatorType"].split("@", 1)[0]
+    for child in plan.get("children", ()):
+        yield from operators(child)
+
+
+async def collect_plans() -> List[Tuple[str, str, dict, Set[str]]]:
+    real = sync_neo4j.init_driver()
+    explain = _ExplainDriver(real)
+    sync_neo4j._driver = explain
+    try:
+        out = []
+        for name, call in SYNC_CALLS:
+            explain.name = name
+            start = len(explain.plans)
+            await call()
+            out.extend((n, c, p, HOT_PATH_FORBIDDEN) for n, c, p in explain.plans[start:])
+        for name, spec in ENTITIES.items():
+            explain.name = f"reconcile.{name}"
+            start = len(explain.plans)
+            await sync_neo4j.read_rows(spec.cypher, dataset=settings.dataset)
+            out.extend((n, c, p, EXPORT_FORBIDDEN) for n, c, p in explain.plans[start:])
+        return out
+    finally:
+        await sync_neo4j.close_driver()
+
+
+async def check(verbose: bool) -> int:
+    failures = 0
+    for name, cypher, plan, forbidden in await collect_plans():
+        ops = list(operators(plan))
+        bad = sorted(set(ops) & forbidden)
+        if bad:
+            failures += 1
+            LOGGER.error("%s: %s in plan\n%s\n  operators: %s", name, ", ".join(bad), cypher.strip(), " <- ".join(ops))
+        elif verbose:
+            LOGGER.info("%s: ok (%s)", name, " <- ".join(ops))
+    LOGGER.info("Plan check finished: %d violating statement(s)", failures)
+    return 1 if failures else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EXPLAIN the graph sync Cypher and fail on label/node scans")
+    parser.add_argument("--verbose", action="store_true", help="Also print the operators of passing plans")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    raise SystemExit(asyncio.run(check(args.verbose)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Columnar numeric index over staging/component_properties.csv for parametric search.
+
+Each numeric property (unit brackets stripped from its name, unit normalised to a
+base unit, so "Range [mm]" and "Range [m]" share one column) is stored as a slice of
+two flat arrays: values (float64, sorted ascending) and component codes (int32).
+A range predicate is two binary searches on its slice; several predicates are
+answered by intersecting the resulting sorted code sets, smallest first.
+
+The arrays can be saved once and memory-mapped by every API worker:
+
+  python -m api.property_index [--staging staging] --out staging/property_index
+
+and PROPERTY_INDEX_DIR=staging/property_index. Without it, the index is built from
+the staging CSVs at startup.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+LOGGER = logging.getLogger("property_index")
+
+# unit -> (base unit, factor to base)
+UNITS: Dict[str, Tuple[str, float]] = {
+    "µm": ("m", 1e-6), "um": ("m", 1e-6), "mm": ("m", 1e-3), "cm": ("m", 1e-2), "dm": ("m", 1e-1),
+    "m": ("m", 1.0), "km": ("m", 1e3),
+    "mg": ("kg", 1e-6), "g": ("kg", 1e-3), "kg": ("kg", 1.0), "t": ("kg", 1e3),
+    "ms": ("s", 1e-3), "s": ("s", 1.0), "min": ("s", 60.0), "h": ("s", 3600.0),
+    "N": ("N", 1.0), "kN": ("N", 1e3), "Nm": ("Nm", 1.0),
+    "mV": ("V", 1e-3), "V": ("V", 1.0), "kV": ("V", 1e3),
+    "mA": ("A", 1e-3), "A": ("A", 1.0), "kA": ("A", 1e3),
+    "mW": ("W", 1e-3), "W": ("W", 1.0), "kW": ("W", 1e3),
+    "Hz": ("Hz", 1.0), "kHz": ("Hz", 1e3), "MHz": ("Hz", 1e6),
+    "Pa": ("Pa", 1.0), "kPa": ("Pa", 1e3), "MPa": ("Pa", 1e6), "mbar": ("Pa", 1e2), "bar": ("Pa", 1e5),
+    "ml": ("l", 1e-3), "l": ("l", 1.0),
+    "mm/s": ("m/s", 1e-3), "m/s": ("m/s", 1.0),
+}
+
+_UNIT_REGEX = re.compile(r"\[(.*?)\]")
+_PREDICATE_REGEX = re.compile(
+    r"^\s*(?P<name>.+?)\s*(?P<op>>=|<=|==|=|>|<)\s*"
+    r"(?P<value>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*(?P<unit>\S.*)?$"
+)
+_EPS = 1e-9  # relative slack so 900 mm == 0.9 m survives float scaling
+
+
+def normalise(value: float, unit: str) -> Tuple[float, str]:
+    """Convert to the base unit of its dimension; unknown units pass through unchanged."""
+    unit = unit.strip()
+    base = UNITS.get(unit) or UNITS.get(unit.lower())
+    if base is None:
+        return value, unit
+    return value * base[1], base[0]
+
+
+def property_key(name: str) -> str:
+    """'Load capacity [kg]' -> 'load capacity'."""
+    return " ".join(_UNIT_REGEX.sub(" ", name).split()).casefold()
+
+
+@dataclass(frozen=True)
+class RangePredicate:
+    key: str
+    unit: Optional[str]  # base unit, None when the query gave none
+    lo: float
+    hi: float
+    lo_inclusive: bool = True
+    hi_inclusive: bool = True
+
+
+def parse_predicate(expr: str) -> RangePredicate:
+    """Parse 'Load capacity [kg]>=6', 'Range>=0.9 m' or 'Length [m]=2'.
+
+    The unit comes from the value suffix, else from the brackets in the name.
+    """
+    match = _PREDICATE_REGEX.match(expr)
+    if not match:
+        raise ValueError(f"Invalid predicate: {expr!r} (expected '<property> <op> <number>[unit]')")
+    name, op, raw_value, unit = match.group("name", "op", "value", "unit")
+    if not unit:
+        bracket = _UNIT_REGEX.search(name)
+        unit = bracket.group(1) if bracket else ""
+    value, base = normalise(float(raw_value), unit)
+    base_unit = base or None
+    key = property_key(name)
+    if op in ("=", "=="):
+        return RangePredicate(key, base_unit, value, value)
+    if op in (">=", ">"):
+        return RangePredicate(key, base_unit, value, np.inf, lo_inclusive=op == ">=")
+    return RangePredicate(key, base_unit, -np.inf, value, hi_inclusive=op == "<=")
+
+
+class PropertyIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.loaded = False
+        self._values = np.empty(0, dtype=np.float64)
+        self._codes = np.empty(0, dtype=np.int32)
+        self._category_codes = np.empty(0, dtype=np.int32)
+        self._meta: dict = {"properties": [], "categories": {}, "components": []}
+        self._columns: Dict[str, List[dict]] = {}
+
+    # -- building / loading --------------------------------------------------------
+
+    @staticmethod
+    def build_arrays(staging_dir: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Read the staging CSVs into (values, codes, category_codes, meta)."""
+        with (staging_dir / "components.csv").open(newline="", encoding="utf-8") as f:
+            components = [[r["id"], r["type"], r["component_names"]] for r in csv.DictReader(f)]
+        code_of = {c[0]: i for i, c in enumerate(components)}
+
+        columns: Dict[Tuple[str, str], Tuple[List[float], List[int], str]] = {}
+        with (staging_dir / "component_properties.csv").open(newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                if not r["numeric_value"] or r["component_id"] not in code_of:
+                    continue
+                value, base = normalise(float(r["numeric_value"]), r["unit"])
+                key = property_key(r["property_name"])
+                column = columns.setdefault((key, base), ([], [], r["property_name"]))
+                column[0].append(value)
+                column[1].append(code_of[r["component_id"]])
+
+        categories: Dict[str, List[int]] = defaultdict(list)
+        with (staging_dir / "component_category.csv").open(newline="", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                if r["component_id"] in code_of:
+                    categories[r["category_name"].casefold()].append(code_of[r["component_id"]])
+
+        values_parts, codes_parts, properties = [], [], []
+        offset = 0
+        for (key, unit), (values, codes, name) in sorted(columns.items()):
+            v = np.asarray(values, dtype=np.float64)
+            order = np.argsort(v, kind="stable")
+            values_parts.append(v[order])
+            codes_parts.append(np.asarray(codes, dtype=np.int32)[order])
+            properties.append({"key": key, "unit": unit, "name": name, "offset": offset, "length": len(v)})
+            offset += len(v)
+
+        category_parts, category_meta = [], {}
+        offset = 0
+        for name, codes in sorted(categories.items()):
+            c = np.unique(np.asarray(codes, dtype=np.int32))
+            category_parts.append(c)
+            category_meta[name] = [offset, len(c)]
+            offset += len(c)
+
+        def concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(parts).astype(dtype) if parts else np.empty(0, dtype=dtype)
+
+        meta = {"properties": properties, "categories": category_meta, "components": components}
+        return (
+            concat(values_parts, np.float64),
+            concat(codes_parts, np.int32),
+            concat(category_parts, np.int32),
+            meta,
+        )
+
+    @staticmethod
+    def save(out_dir: Path, values: np.ndarray, codes: np.ndarray, category_codes: np.ndarray, meta: dict) -> None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        np.save(out_dir / "values.npy", values)
+        np.save(out_dir / "codes.npy", codes)
+        np.save(out_dir / "category_codes.npy", category_codes)
+        (out_dir / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, staging_dir: Path, index_dir: Optional[Path] = None) -> None:
+        """Memory-map a saved index from `index_dir`, or build one from `staging_dir`."""
+        if index_dir is not None:
+            values = np.load(index_dir / "values.npy", mmap_mode="r")
+            codes = np.load(index_dir / "codes.npy", mmap_mode="r")
+            category_codes = np.load(index_dir / "category_codes.npy", mmap_mode="r")
+            meta = json.loads((index_dir / "meta.json").read_text(encoding="utf-8"))
+        else:
+            values, codes, category_codes, meta = self.build_arrays(staging_dir)
+        columns: Dict[str, List[dict]] = defaultdict(list)
+        for prop in meta["properties"]:
+            columns[prop["key"]].append(prop)
+        with self._lock:
+            self._values, self._codes, self._category_codes = values, codes, category_codes
+            self._meta, self._columns = meta, dict(columns)
+            self.loaded = True
+        LOGGER.info(
+            "Property index loaded: components=%d numeric_properties=%d values=%d (%s)",
+            len(meta["components"]), len(meta["properties"]), len(values), index_dir or staging_dir,
+        )
+
+    # -- queries -------------------------------------------------------------------
+
+    def _column(self, predicate: RangePredicate) -> dict:
+        candidates = self._columns.get(predicate.key, [])
+        if predicate.unit is not None:
+            candidates = [c for c in candidates if c["unit"] == predicate.unit]
+        if len(candidates) != 1:
+            units = sorted(c["unit"] for c in self._columns.get(predicate.key, []))
+            if not units:
+                raise KeyError(f"Unknown numeric property: {predicate.key!r}")
+            raise KeyError(f"Property {predicate.key!r} has units {units}; give one of them")
+        return candidates[0]
+
+    def _matching_codes(self, predicate: RangePredicate) -> np.ndarray:
+        column = self._column(predicate)
+        start, length = column["offset"], column["length"]
+        values = self._values[start : start + length]
+        lo, hi = predicate.lo, predicate.hi
+        if predicate.lo_inclusive:
+            lo_i = np.searchsorted(values, lo - abs(lo) * _EPS, side="left")
+        else:
+            lo_i = np.searchsorted(values, lo + abs(lo) * _EPS, side="right")
+        if predicate.hi_inclusive:
+            hi_i = np.searchsorted(values, hi + abs(hi) * _EPS, side="right")
+        else:
+            hi_i = np.searchsorted(values, hi - abs(hi) * _EPS, side="left")
+        return np.unique(self._codes[start + lo_i : start + hi_i])
+
+    def search(self, predicates: Sequence[RangePredicate], category: Optional[str] = None) -> np.ndarray:
+        """Sorted component codes matching every predicate (and the category, if given)."""
+        with self._lock:
+            sets = [self._matching_codes(p) for p in predicates]
+            if category is not None:
+                offset, length = self._meta["categories"].get(category.casefold(), (0, 0))
+                sets.append(np.asarray(self._category_codes[offset : offset + length]))
+        if not sets:
+            return np.arange(len(self._meta["components"]), dtype=np.int32)
+        sets.sort(key=len)
+        result = sets[0]
+        for other in sets[1:]:
+            if len(result) == 0:
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        return result
+
+    def components(self, codes: Sequence[int]) -> List[dict]:
+        rows = self._meta["components"]
+        return [{"id": rows[c][0], "type": rows[c][1], "component_names": rows[c][2]} for c in codes]
+
+    def properties(self) -> List[dict]:
+        out = []
+        with self._lock:
+            for prop in self._meta["properties"]:
+                values = self._values[prop["offset"] : prop["offset"] + prop["length"]]
+                out.append({
+                    "name": prop["name"],
+                    "key": prop["key"],
+                    "unit": prop["unit"],
+                    "count": prop["length"],
+                    "min": float(values[0]) if len(values) else None,
+                    "max": float(values[-1]) if len(values) else None,
+                })
+        return out
+
+
+property_index = PropertyIndex()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the memory-mappable component property index")
+    parser.add_argument("--staging", type=Path, default=Path("staging"))
+    parser.add_argument("--out", type=Path, default=Path("staging/property_index"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    values, codes, category_codes, meta = PropertyIndex.build_arrays(args.staging)
+    PropertyIndex.save(args.out, values, codes, category_codes, meta)
+    LOGGER.info("Wrote %d values for %d numeric properties to %s", len(values), len(meta["properties"]), args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Checksum-based Postgres -> Neo4j reconciler (incremental full refresh).
+
+For each entity both sides are reduced to per-row content hashes
+(md5 over '|'-joined fields) grouped into buckets by leading id modulo N.
+Postgres computes row hashes and bucket digests in SQL; the graph side streams
+compact (key, fields) tuples and is hashed here with the same canonical form.
+Only buckets whose digests differ are fetched row by row, and only the rows that
+differ are pushed through the regular sync functions. On an unchanged catalog a
+run reads digests and writes nothing.
+
+Usage:
+  python -m api.reconcile [--entity all|solutions|modules|parts|bom] [--buckets 256] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+from .settings import load_settings
+from .sync_neo4j import (
+    close_driver,
+    delete_modules,
+    delete_solutions,
+    read_rows,
+    sync_effective_boms,
+    sync_has_part,
+    upsert_modules,
+    upsert_solutions,
+)
+
+
+settings = load_settings()
+
+LOGGER = logging.getLogger("reconcile")
+
+
+@dataclass(frozen=True)
+class EntitySpec:
+    name: str
+    key_len: int  # leading fields forming the key; the first one drives the bucket
+    fields: Tuple[str, ...]  # hashed fields, in hash order, keys first
+    pg_source: str  # SELECT producing exactly `fields`
+    cypher: str  # graph query returning exactly `fields` (ids as strings)
+    push: Callable[[List[tuple], Set[tuple]], Awaitable[None]]  # (pg rows of affected keys, keys to drop)
+
+
+def row_hash(values: Sequence[object]) -> str:
+    """Canonical row hash; must match _pg_hash_expr()."""
+    return hashlib.md5("|".join("" if v is None else str(v) for v in values).encode("utf-8")).hexdigest()
+
+
+def _pg_hash_expr(fields: Sequence[str]) -> str:
+    return "md5(concat_ws('|', " + ", ".join(f"coalesce({f}::text, '')" for f in fields) + "))"
+
+
+async def _push_solutions(rows: List[tuple], dropped: Set[tuple]) -> None:
+    await upsert_solutions(rows)
+    await delete_solutions([k[0] for k in dropped])
+
+
+async def _push_modules(rows: List[tuple], dropped: Set[tuple]) -> None:
+    await upsert_modules(rows)
+    await delete_modules([k[0] for k in dropped])
+
+
+async def _push_parts(rows: List[tuple], dropped: Set[tuple]) -> None:
+    # HAS_PART is synced per parent, so hand over the complete child set of each parent.
+    parents = {r[0] for r in rows} | {k[0] for k in dropped}
+    await sync_has_part(sorted(parents), rows)
+
+
+async def _push_bom(rows: List[tuple], dropped: Set[tuple]) -> None:
+    sids = {r[0] for r in rows} | {k[0] for k in dropped}
+    await sync_effective_boms(sorted(sids), rows)
+
+
+ENTITIES: Dict[str, EntitySpec] = {
+    "solutions": EntitySpec(
+        name="solutions",
+        key_len=1,
+        fields=("id", "name", "type"),
+        pg_source="SELECT id, name, type FROM solutions WHERE deleted_at IS NULL",
+        cypher="""
+        MATCH (s:MainSolutionV2 {dataset: $dataset}) RETURN s.id AS id, s.name AS name, s.type AS type
+        UNION ALL
+        MATCH (s:PartialSolutionV2 {dataset: $dataset}) RETURN s.id AS id, s.name AS name, s.type AS type
+        """,
+        push=_push_solutions,
+    ),
+    "modules": EntitySpec(
+        name="modules",
+        key_len=1,
+        fields=("id", "name", "typ", "hersteller"),
+        pg_source=(
+            "SELECT id, name, coalesce(typ, '') AS typ, coalesce(hersteller, '') AS hersteller "
+            "FROM modules WHERE deleted_at IS NULL"
+        ),
+        cypher="""
+        MATCH (m:ModuleV2 {dataset: $dataset})
+        RETURN m.id AS id, m.name AS name, m.typ AS typ, m.hersteller AS hersteller
+        """,
+        push=_push_modules,
+    ),
+    "parts": EntitySpec(
+        name="parts",
+        key_len=2,
+        fields=("parent_solution_id", "child_solution_id", "qty"),
+        pg_source="SELECT parent_solution_id, child_solution_id, qty FROM solution_parts WHERE deleted_at IS NULL",
+        cypher="""
+        MATCH (p:MainSolutionV2)-[h:HAS_PART {dataset: $dataset}]->(c:PartialSolutionV2)
+        RETURN p.id AS parent_solution_id, c.id AS child_solution_id, h.qty AS qty
+        """,
+        push=_push_parts,
+    ),
+    "bom": EntitySpec(
+        name="bom",
+        key_len=2,
+        fields=("solution_id", "module_id", "qty", "role"),
+        # One edge per (solution, module); the greatest role survives, as in sync_effective_boms.
+        # Soft-deleted modules have no ModuleV2 node (their edges cannot exist), so skip them.
+        pg_source=(
+            "SELECT DISTINCT ON (e.solution_id, e.module_id) e.solution_id, e.module_id, e.qty, e.role "
+            "FROM solution_modules_effective e "
+            "JOIN modules m ON m.id = e.module_id AND m.deleted_at IS NULL "
+            "ORDER BY e.solution_id, e.module_id, coalesce(e.role, '') COLLATE \"C\" DESC"
+        ),
+        cypher="""
+        MATCH (s)-[u:USES_MODULE {dataset: $dataset}]->(m:ModuleV2)
+        WHERE s:MainSolutionV2 OR s:PartialSolutionV2
+        RETURN s.id AS solution_id, m.id AS module_id, u.qty AS qty, u.role AS role
+        """,
+        push=_push_bom,
+    ),
+}
+
+
+async def _pg_bucket_digests(db: AsyncSession, spec: EntitySpec, buckets: int) -> Dict[int, str]:
+    keys = spec.fields[: spec.key_len]
+    order = ", ".join(keys)
+    sql = (
+        f"SELECT b, md5(string_agg(h, '' ORDER BY {order})) FROM ("
+        f"  SELECT ({keys[0]} % :n) AS b, {order}, {_pg_hash_expr(spec.fields)} AS h FROM ({spec.pg_source}) src"
+        f") x GROUP BY b"
+    )
+    return {int(b): d for b, d in (await db.execute(text(sql), {"n": buckets})).all()}
+
+
+async def _pg_rows(db: AsyncSession, spec: EntitySpec, buckets: int, wanted: List[int]) -> Dict[tuple, Tuple[tuple, str]]:
+    keys = spec.fields[: spec.key_len]
+    cols = ", ".join(spec.fields)
+    sql = (
+        f"SELECT {cols}, {_pg_hash_expr(spec.fields)} AS h FROM ({spec.pg_source}) src "
+        f"WHERE ({keys[0]} % :n) = ANY(:wanted)"
+    )
+    out: Dict[tuple, Tuple[tuple, str]] = {}
+    for r in (await db.execute(text(sql), {"n": buckets, "wanted": wanted})).all():
+        values = tuple(r[: len(spec.fields)])
+        out[values[: spec.key_len]] = (values, r[-1])
+    return out
+
+
+async def _graph_hashes(spec: EntitySpec) -> Dict[tuple, str]:
+    out: Dict[tuple, str] = {}
+    for rec in await read_rows(spec.cypher, dataset=settings.dataset):
+        values = [rec[f] for f in spec.fields]
+        try:
+            # ids are stored as strings in the graph, BIGINT in Postgres
+            key = tuple(int(v) for v in values[: spec.key_len])
+        except (TypeError, ValueError):
+            LOGGER.warning("Skipping %s graph row with non-numeric key: %s", spec.name, values[: spec.key_len])
+            continue
+        out[key] = row_hash(list(key) + values[spec.key_len:])
+    return out
+
+
+def _bucket_digests(hashes: Dict[tuple, str], buckets: int) -> Dict[int, str]:
+    grouped: Dict[int, List[Tuple[tuple, str]]] = defaultdict(list)
+    for key, h in hashes.items():
+        grouped[key[0] % buckets].append((key, h))
+    return {
+        b: hashlib.md5("".join(h for _, h in sorted(items)).encode("utf-8")).hexdigest()
+        for b, items in grouped.items()
+    }
+
+
+async def reconcile_entity(spec: EntitySpec, buckets: int, dry_run: bool = False) -> dict:
+    async with SessionLocal() as db:
+        # graph and Postgres sides are read concurrently
+        graph, pg_digests = await asyncio.gather(_graph_hashes(spec), _pg_bucket_digests(db, spec, buckets))
+        graph_digests = _bucket_digests(graph, buckets)
+        differing = sorted(
+            b for b in set(pg_digests) | set(graph_digests) if pg_digests.get(b) != graph_digests.get(b)
+        )
+        pg = await _pg_rows(db, spec, buckets, differing) if differing else {}
+
+    differing_set = set(differing)
+    changed = [values for key, (values, h) in pg.items() if graph.get(key) != h]
+    dropped = {key for key in graph if key[0] % buckets in differing_set and key not in pg}
+    if spec.key_len > 1:
+        # edges are pushed per owner: include every live edge of each affected owner
+        owners = {r[0] for r in changed} | {k[0] for k in dropped}
+        push_rows = [values for key, (values, _) in pg.items() if key[0] in owners]
+    else:
+        push_rows = changed
+
+    if not dry_run and (push_rows or dropped):
+        await spec.push(push_rows, dropped)
+
+    return {
+        "entity": spec.name,
+        "buckets": buckets,
+        "differing_buckets": len(differing),
+        "upserts": len(changed),
+        "deletes": len(dropped),
+        "dry_run": dry_run,
+    }
+
+
+async def _main(names: List[str], buckets: int, dry_run: bool) -> None:
+    try:
+        for name in names:
+            LOGGER.info("%s", await reconcile_entity(ENTITIES[name], buckets, dry_run))
+    finally:
+        await close_driver()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile Neo4j against Postgres using bucketed content hashes")
+    parser.add_argument("--entity", choices=["all", *ENTITIES], default="all")
+    parser.add_argument("--buckets", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true", help="Report differences without writing to Neo4j")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+
+    # Nodes before edges, so pushed edges find their endpoints.
+    names = list(ENTITIES) if args.entity == "all" else [args.entity]
+    asyncio.run(_main(names, args.buckets, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Generation swap with write replay, shared by the in-process indexes.
+
+An index keeps its data in a generation object. A full reload builds a fresh
+generation off to the side while queries keep using the current one; writes that
+arrive meanwhile go to the current generation and are recorded, then replayed onto
+the fresh one before it is swapped in, so nothing patched during a reload is lost.
+Reloads of one index are serialized, so two overlapping reloads cannot drop each
+other's recorded writes.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, List, Optional, TypeVar
+
+
+LOGGER = logging.getLogger("reloadable")
+
+G = TypeVar("G")
+
+
+class ReloadableIndex(Generic[G]):
+    def __init__(self, factory: Callable[[], G]) -> None:
+        self._factory = factory
+        self._current: G = factory()
+        self._pending: Optional[List[tuple]] = None  # writes seen during a reload
+        self._reload_lock = asyncio.Lock()
+        self.loaded = False
+
+    async def _reload(self, fill: Callable[[G], Awaitable[None]]) -> G:
+        """Build a fresh generation with `fill`, replay writes seen meanwhile, swap it in."""
+        async with self._reload_lock:
+            fresh = self._factory()
+            self._pending = []
+            try:
+                await fill(fresh)
+                for op, args in self._pending:
+                    getattr(fresh, op)(*args)
+                self._current = fresh
+                self.loaded = True
+            finally:
+                self._pending = None
+        return fresh
+
+    def _apply(self, op: str, *args) -> None:
+        """Run a write on the current generation; recorded for replay while a reload runs."""
+        getattr(self._current, op)(*args)
+        if self._pending is not None:
+            self._pending.append((op, args))
+
+
+async def run_refresher(index: ReloadableIndex, stop: asyncio.Event, interval: float) -> None:
+    """Load `index`, then reload it every `interval` seconds until `stop` is set.
+
+    With interval <= 0 the index is loaded once (retrying every 5 s until that works).
+    """
+    while not stop.is_set():
+        try:
+            await index.load()
+        except Exception:
+            LOGGER.exception("%s load failed", type(index).__name__)
+        if interval <= 0 and index.loaded:
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval if interval > 0 else 5.0)
+        except asyncio.TimeoutError:
+            pass
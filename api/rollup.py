@@ -0,0 +1,283 @@
+"""Module quantity rollup for every Hauptprozess at once, with sparse matrix products.
+
+  B[s, m]  effective BOM quantity (solution_modules_effective, live modules only)
+  P[p, c]  HAS_PART quantity (live solution_parts between live solutions)
+  X0       one row per live Hauptprozess selecting itself
+
+  total = X0·B + X0·P·B + X0·P²·B + ...   (until X0·Pᵏ is empty)
+
+so a module's total is the product of the HAS_PART quantities along every path,
+times its BOM quantity, summed over paths; the same numbers as
+GET /solutions/{id}/bom/exploded, for all MAINs in a handful of products. Grouping
+by bauteilkategorie and/or hersteller multiplies with a module -> group one-hot
+matrix (a column relabel plus sum). scipy.sparse does the products when installed;
+otherwise a vectorised NumPy COO join does the same.
+
+Memory is not bounded by a chunk size: the id and quantity columns are read in
+chunks of _LOAD_CHUNK_ROWS but kept whole as int64 arrays (24 bytes per link), and
+each product holds its result plus, on the NumPy path, every joined pair before
+_coalesce sums duplicates (argsort + reduceat, no per-cell Python loop). Peak use
+is roughly the loaded links plus the largest intermediate product.
+
+Output is CSV (streamed) or Parquet (needs pyarrow).
+
+Usage:
+  python -m api.rollup --out rollup.csv                                   # per (Hauptprozess, module)
+  python -m api.rollup --by bauteilkategorie --by hersteller --format parquet --out rollup.parquet
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .db import SessionLocal, engine
+from .models import Module, Solution, SolutionModuleEffective, SolutionPart
+
+try:
+    import scipy.sparse as sparse
+except ImportError:
+    sparse = None
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+LOGGER = logging.getLogger("rollup")
+
+GROUP_COLUMNS = ("bauteilkategorie", "hersteller")
+FORMATS = ("csv", "parquet")
+_LOAD_CHUNK_ROWS = 50_000
+_CSV_CHUNK_ROWS = 10_000
+
+Coo = Tuple[np.ndarray, np.ndarray, np.ndarray]  # (rows, cols, values), int64
+
+
+@dataclass
+class RollupData:
+    mains: np.ndarray  # live Hauptprozess ids, sorted
+    main_names: List[str]
+    parts: Tuple[np.ndarray, np.ndarray, np.ndarray]  # parent ids, child ids, qty
+    bom: Tuple[np.ndarray, np.ndarray, np.ndarray]  # solution ids, module ids, qty
+    modules: np.ndarray  # live module ids, sorted
+    module_fields: Dict[str, List[str]]  # name, bauteilkategorie, hersteller per module
+
+
+async def _columns(db, stmt, n: int, ints: int = 0) -> list:
+    """Read `n` columns in chunks; the first `ints` become int64 arrays, the rest lists.
+
+    Integer columns are converted per chunk, so at most one chunk of them is held as
+    Python ints.
+    """
+    chunks: List[List[np.ndarray]] = [[] for _ in range(ints)]
+    others: List[list] = [[] for _ in range(n - ints)]
+    result = await db.stream(stmt.execution_options(yield_per=_LOAD_CHUNK_ROWS))
+    async for rows in result.partitions():
+        values = list(zip(*rows))
+        for col, v in zip(chunks, values[:ints]):
+            col.append(np.asarray(v, dtype=np.int64))
+        for col, v in zip(others, values[ints:]):
+            col.extend(v)
+    arrays = [np.concatenate(c) if c else np.empty(0, dtype=np.int64) for c in chunks]
+    return arrays + others
+
+
+async def load() -> RollupData:
+    child = Solution.__table__.alias("child")
+    parent = Solution.__table__.alias("parent")
+    eff = SolutionModuleEffective
+    async with SessionLocal() as db:
+        main_ids, main_names = await _columns(db, (
+            select(Solution.id, Solution.name)
+            .where(Solution.type == "Hauptprozess", Solution.deleted_at.is_(None))
+            .order_by(Solution.id)
+        ), 2, ints=1)
+        parts = await _columns(db, (
+            select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id, SolutionPart.qty)
+            .join(parent, parent.c.id == SolutionPart.parent_solution_id)
+            .join(child, child.c.id == SolutionPart.child_solution_id)
+            .where(SolutionPart.deleted_at.is_(None), parent.c.deleted_at.is_(None), child.c.deleted_at.is_(None))
+        ), 3, ints=3)
+        bom = await _columns(db, (
+            select(eff.solution_id, eff.module_id, eff.qty)
+            .join(Module, Module.id == eff.module_id)
+            .where(Module.deleted_at.is_(None))
+        ), 3, ints=3)
+        module_ids, names, kategorien, hersteller = await _columns(db, (
+            select(Module.id, Module.name, Module.bauteilkategorie, Module.hersteller)
+            .where(Module.deleted_at.is_(None))
+            .order_by(Module.id)
+        ), 4, ints=1)
+    return RollupData(
+        mains=main_ids,
+        main_names=main_names,
+        parts=tuple(parts),
+        bom=tuple(bom),
+        modules=module_ids,
+        module_fields={"name": names, "bauteilkategorie": kategorien, "hersteller": hersteller},
+    )
+
+
+def _coalesce(rows: np.ndarray, cols: np.ndarray, vals: np.ndarray, ncols: int) -> Coo:
+    """Sum duplicate (row, col) entries; result sorted by (row, col)."""
+    if len(rows) == 0:
+        return rows, cols, vals
+    key = rows * ncols + cols
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    summed = np.add.reduceat(vals[order], starts)
+    key = key[starts]
+    return key // ncols, key % ncols, summed
+
+
+def _matmul(left: Coo, right: Coo, shape: Tuple[int, int, int]) -> Coo:
+    """left (n x k) · right (k x m), both COO; result coalesced COO."""
+    n, k, m = shape
+    if sparse is not None:
+        a = sparse.csr_matrix((left[2], (left[0], left[1])), shape=(n, k), dtype=np.int64)
+        b = sparse.csr_matrix((right[2], (right[0], right[1])), shape=(k, m), dtype=np.int64)
+        c = (a @ b).tocoo()
+        return _coalesce(c.row.astype(np.int64), c.col.astype(np.int64), c.data.astype(np.int64), m)
+    # join left.col == right.row: every left entry pairs with the right entries of its column's row
+    order = np.argsort(right[0], kind="stable")
+    r_rows, r_cols, r_vals = right[0][order], right[1][order], right[2][order]
+    starts = np.searchsorted(r_rows, left[1], side="left")
+    counts = np.searchsorted(r_rows, left[1], side="right") - starts
+    total = int(counts.sum())
+    if total == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    li = np.repeat(np.arange(len(counts)), counts)
+    ri = np.repeat(starts, counts) + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+    return _coalesce(left[0][li], r_cols[ri], left[2][li] * r_vals[ri], m)
+
+
+def compute(data: RollupData) -> Coo:
+    """(main index, module index, total qty) for every Hauptprozess with modules."""
+    solutions = np.unique(np.concatenate([data.mains, data.parts[0], data.parts[1], data.bom[0]]))
+    n, nm, ns = len(data.mains), len(data.modules), len(solutions)
+    to_sol = lambda ids: np.searchsorted(solutions, ids)
+
+    known = np.isin(data.bom[1], data.modules)
+    bom = _coalesce(to_sol(data.bom[0][known]), np.searchsorted(data.modules, data.bom[1][known]), data.bom[2][known], nm)
+    parts = _coalesce(to_sol(data.parts[0]), to_sol(data.parts[1]), data.parts[2], ns)
+
+    frontier: Coo = (np.arange(n, dtype=np.int64), to_sol(data.mains), np.ones(n, dtype=np.int64))
+    acc: List[Coo] = []
+    for _ in range(ns + 1):
+        if len(frontier[0]) == 0:
+            break
+        acc.append(_matmul(frontier, bom, (n, ns, nm)))
+        frontier = _matmul(frontier, parts, (n, ns, ns))
+    else:
+        raise ValueError("solution_parts contains a cycle reachable from a Hauptprozess")
+    if not acc:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    rows, cols, vals = (np.concatenate(c) for c in zip(*acc))
+    return _coalesce(rows, cols, vals, nm)
+
+
+def group(data: RollupData, totals: Coo, by: Sequence[str]) -> Tuple[List[tuple], Coo]:
+    """Sum module columns into groups of `by` values; returns (group labels, COO over groups)."""
+    labels = list(zip(*(data.module_fields[c] for c in by)))
+    distinct = sorted(set(labels), key=lambda t: tuple("" if v is None else v for v in t))
+    index = {label: i for i, label in enumerate(distinct)}
+    module_group = np.fromiter((index[label] for label in labels), dtype=np.int64, count=len(labels))
+    rows, cols, vals = totals
+    return distinct, _coalesce(rows, module_group[cols], vals, max(len(distinct), 1))
+
+
+def rollup(data: RollupData, by: Sequence[str] = ()) -> Tuple[List[str], Iterator[tuple]]:
+    """(header, rows) ordered by Hauptprozess id, then module id / group."""
+    started = time.perf_counter()
+    totals = compute(data)
+    main_ids = data.mains.tolist()
+    if by:
+        labels, (rows, cols, vals) = group(data, totals, by)
+        header = ["hauptprozess_id", "hauptprozess_name", *by, "qty"]
+        out = ((main_ids[r], data.main_names[r], *labels[c], v) for r, c, v in zip(rows.tolist(), cols.tolist(), vals.tolist()))
+    else:
+        rows, cols, vals = totals
+        module_ids = data.modules.tolist()
+        f = data.module_fields
+        header = ["hauptprozess_id", "hauptprozess_name", "module_id", "module_name", "bauteilkategorie", "hersteller", "qty"]
+        out = (
+            (main_ids[r], data.main_names[r], module_ids[c], f["name"][c], f["bauteilkategorie"][c], f["hersteller"][c], v)
+            for r, c, v in zip(rows.tolist(), cols.tolist(), vals.tolist())
+        )
+    LOGGER.info(
+        "Rollup: mains=%d parts=%d bom=%d -> rows=%d in %.2fs (%s)",
+        len(data.mains), len(data.parts[0]), len(data.bom[0]), len(rows),
+        time.perf_counter() - started, "scipy" if sparse is not None else "numpy",
+    )
+    return header, out
+
+
+def csv_chunks(header: List[str], rows: Iterator[tuple]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % _CSV_CHUNK_ROWS == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+def parquet_bytes(header: List[str], rows: Iterator[tuple]) -> bytes:
+    if pyarrow is None:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow)")
+    columns = list(zip(*rows)) or [()] * len(header)
+    table = pyarrow.table({name: list(values) for name, values in zip(header, columns)})
+    sink = pyarrow.BufferOutputStream()
+    pyarrow.parquet.write_table(table, sink, compression="zstd")
+    return sink.getvalue().to_pybytes()
+
+
+async def _main(by: List[str], fmt: str, out: str) -> int:
+    try:
+        data = await load()
+    finally:
+        await engine.dispose()
+    header, rows = await asyncio.to_thread(rollup, data, by)
+    if fmt == "parquet":
+        with open(out, "wb") as f:
+            f.write(await asyncio.to_thread(parquet_bytes, header, rows))
+    else:
+        with (open(out, "wb") if out != "-" else sys.stdout.buffer) as f:
+            for chunk in csv_chunks(header, rows):
+                f.write(chunk)
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Total module quantities per Hauptprozess through the hierarchy")
+    parser.add_argument("--by", action="append", choices=GROUP_COLUMNS, default=[],
+                        help="Group modules by this column (repeatable); default: one row per module")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--out", default="-", help="Output file (CSV: '-' for stdout)")
+    args = parser.parse_args()
+    if args.format == "parquet" and args.out == "-":
+        parser.error("--format parquet needs --out")
+    if args.format == "parquet" and pyarrow is None:
+        parser.error("--format parquet needs pyarrow")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    raise SystemExit(asyncio.run(_main(args.by, args.format, args.out)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""In-process trigram index for fuzzy name search over solutions and modules.
+
+Indexed text: Solution.name; Module.name, typ, hersteller, bauteilkategorie. Text is
+folded twice (German transliteration ä->ae, ß->ss, and plain diacritic stripping
+ä->a), and the trigrams of both variants are indexed, so "Prüfung", "Pruefung" and
+"Prufung" all find each other. Trigrams are built per word with pg_trgm-style
+padding, so short prefixes like "Pr" still match.
+
+Postings are append-only array('i') lists of document codes per trigram. A query
+concatenates the postings of its trigrams and counts shared trigrams per document
+with one np.bincount. Ranking uses query coverage (shared / query trigrams) first,
+then pg_trgm-style similarity, so short, close names rank above long ones.
+
+Updates from the write handlers tombstone the old document code and append a new
+one. The periodic full reload (SEARCH_INDEX_REFRESH_INTERVAL) drops tombstones and
+picks up writes served by other workers; it builds off to the side in a thread and
+replays writes that arrived meanwhile before swapping.
+"""
+
+import asyncio
+import logging
+import re
+import unicodedata
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from .db import SessionLocal
+from .models import Module, Solution
+from .reloadable import ReloadableIndex
+
+
+LOGGER = logging.getLogger("search_index")
+
+KINDS = ("solution", "module")
+_LOAD_CHUNK_ROWS = 10_000
+
+_GERMAN = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_WORD = re.compile(r"\w+")
+
+
+def fold_variants(text: str) -> Set[str]:
+    """Lower-cased, accent-free spellings of `text` (one or two variants)."""
+    lowered = text.casefold()
+    out = set()
+    for variant in (lowered.translate(_GERMAN), lowered):
+        decomposed = unicodedata.normalize("NFKD", variant)
+        out.add("".join(ch for ch in decomposed if not unicodedata.combining(ch)))
+    return out
+
+
+def trigrams(text: str) -> Set[str]:
+    grams: Set[str] = set()
+    for word in _WORD.findall(text):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def text_trigrams(fields: Iterable[Optional[str]]) -> Set[str]:
+    grams: Set[str] = set()
+    for value in fields:
+        if value:
+            for variant in fold_variants(value):
+                grams |= trigrams(variant)
+    return grams
+
+
+class _Postings:
+    """One immutable-id generation of the index (codes are never reused)."""
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, array] = {}
+        self.lengths = array("i")  # trigram count per code
+        self.kinds = bytearray()  # index into KINDS per code
+        self.alive = bytearray()  # 1 = live, 0 = tombstoned
+        self.docs: List[Tuple[str, int, str]] = []  # (kind, id, name) per code
+        self.code_of: Dict[Tuple[str, int], int] = {}
+
+    def put(self, kind: str, entity_id: int, name: str, fields: Sequence[Optional[str]]) -> None:
+        self.drop(kind, entity_id)
+        grams = text_trigrams(fields)
+        code = len(self.docs)
+        self.docs.append((kind, entity_id, name))
+        self.lengths.append(len(grams))
+        self.kinds.append(KINDS.index(kind))
+        self.alive.append(1)
+        self.code_of[(kind, entity_id)] = code
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array("i")
+            posting.append(code)
+
+    def drop(self, kind: str, entity_id: int) -> None:
+        code = self.code_of.pop((kind, entity_id), None)
+        if code is not None:
+            self.alive[code] = 0
+
+    def __len__(self) -> int:
+        return len(self.code_of)
+
+    def _shared_counts(self, grams: Set[str]) -> Optional[np.ndarray]:
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        if not lists:
+            return None
+        codes = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in lists])
+        return np.bincount(codes, minlength=len(self.docs))
+
+    def search(self, q: str, kind: Optional[str], limit: int, min_score: float) -> List[dict]:
+        if not self.docs:
+            return []
+        # Score each spelling of the query; per document keep the best-covering one.
+        shared: Optional[np.ndarray] = None
+        coverage = q_len = None
+        for variant in fold_variants(q):
+            grams = trigrams(variant)
+            counts = self._shared_counts(grams)
+            if counts is None:
+                continue
+            cov = counts / np.float32(len(grams))
+            if shared is None:
+                shared, coverage, q_len = counts, cov, np.full(len(counts), len(grams), dtype=np.int32)
+            else:
+                better = cov > coverage
+                shared = np.where(better, counts, shared)
+                q_len = np.where(better, len(grams), q_len)
+                coverage = np.maximum(coverage, cov)
+        if shared is None:
+            return []
+
+        mask = (coverage >= min_score) & (np.frombuffer(self.alive, dtype=np.uint8) == 1)
+        if kind is not None:
+            mask &= np.frombuffer(self.kinds, dtype=np.uint8) == KINDS.index(kind)
+        codes = np.flatnonzero(mask)
+        hits = shared[codes]
+        similarity = hits / (q_len[codes] + np.frombuffer(self.lengths, dtype=np.int32)[codes] - hits)
+        coverage = coverage[codes]
+
+        if len(codes) > limit:
+            # cheap preselection on the combined key before the exact sort
+            top = np.argpartition(-(coverage + similarity * 1e-3), limit - 1)[:limit]
+            codes, coverage, similarity = codes[top], coverage[top], similarity[top]
+        out = []
+        for i in np.lexsort((codes, -similarity, -coverage)).tolist():
+            doc_kind, entity_id, name = self.docs[codes[i]]
+            out.append({
+                "kind": doc_kind,
+                "id": entity_id,
+                "name": name,
+                "score": round(float(coverage[i]), 4),
+                "similarity": round(float(similarity[i]), 4),
+            })
+        return out
+
+
+class SearchIndex(ReloadableIndex[_Postings]):
+    def __init__(self) -> None:
+        super().__init__(_Postings)
+
+    # -- loading -----------------------------------------------------------------
+
+    async def load(self) -> None:
+        """Rebuild from Postgres; queries keep using the old generation meanwhile."""
+        fresh = await self._reload(_fill)
+        LOGGER.info("Search index loaded: documents=%d trigrams=%d", len(fresh), len(fresh.postings))
+
+    # -- incremental updates -------------------------------------------------------
+
+    def put_solution(self, sid: int, name: str) -> None:
+        self._apply("put", "solution", sid, name, (name,))
+
+    def put_module(self, mid: int, name: str, typ: Optional[str], hersteller: Optional[str], bauteilkategorie: Optional[str]) -> None:
+        self._apply("put", "module", mid, name, (name, typ, hersteller, bauteilkategorie))
+
+    def drop(self, kind: str, entity_id: int) -> None:
+        self._apply("drop", kind, entity_id)
+
+    # -- queries -------------------------------------------------------------------
+
+    def search(self, q: str, kind: Optional[str] = None, limit: int = 20, min_score: float = 0.3) -> List[dict]:
+        return self._current.search(q, kind, limit, min_score)
+
+
+async def _fill(fresh: _Postings) -> None:
+    async with SessionLocal() as db:
+        result = await db.stream(
+            select(Solution.id, Solution.name)
+            .where(Solution.deleted_at.is_(None))
+            .execution_options(yield_per=_LOAD_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            await asyncio.to_thread(_add_all, fresh, [("solution", i, n, (n,)) for i, n in rows])
+        result = await db.stream(
+            select(Module.id, Module.name, Module.typ, Module.hersteller, Module.bauteilkategorie)
+            .where(Module.deleted_at.is_(None))
+            .execution_options(yield_per=_LOAD_CHUNK_ROWS)
+        )
+        async for rows in result.partitions():
+            await asyncio.to_thread(_add_all, fresh, [("module", r[0], r[1], tuple(r[1:])) for r in rows])
+
+
+def _add_all(postings: _Postings, docs: List[tuple]) -> None:
+    for kind, entity_id, name, fields in docs:
+        postings.put(kind, entity_id, name, fields)
+
+
+search_index = SearchIndex()
+
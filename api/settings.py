@@ -9,6 +9,26 @@ class Settings:
     neo4j_user: str
     neo4j_password: str
     dataset: str = "equipment_solution_v2"
+    neo4j_max_pool_size: int = 50
+    neo4j_acquisition_timeout: float = 30.0
+    neo4j_liveness_check_timeout: float = 60.0
+    neo4j_max_retry_time: float = 15.0
+    graph_sync_in_process: bool = True
+    graph_sync_batch_size: int = 500
+    graph_sync_poll_interval: float = 1.0
+    graph_sync_max_backoff: float = 300.0
+    graph_index_refresh_interval: float = 300.0
+    search_index_refresh_interval: float = 300.0
+    similarity_index_refresh_interval: float = 300.0
+    entity_cache_maxsize: int = 10000
+    entity_cache_ttl: float = 300.0
+    staging_dir: str = "staging"
+    property_index_dir: str = ""
+    slow_request_ms: float = 1000.0
+    slow_query_ms: float = 250.0
+    archive_retention_days: float = 30.0
+    archive_batch_size: int = 1000
+    archive_interval: float = 3600.0
 
 
 def load_settings() -> Settings:
@@ -20,6 +40,24 @@ def load_settings() -> Settings:
         neo4j_uri=os.environ.get("NEO4J_URI", "bolt://35.232.36.161:7687"),
         neo4j_user=os.environ.get("NEO4J_USER", "neo4j"),
         neo4j_password=os.environ.get("NEO4J_PASSWORD", "StartNeo4J*"),
+        neo4j_max_pool_size=int(os.environ.get("NEO4J_MAX_POOL_SIZE", "50")),
+        neo4j_acquisition_timeout=float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", "30")),
+        neo4j_liveness_check_timeout=float(os.environ.get("NEO4J_LIVENESS_CHECK_TIMEOUT", "60")),
+        neo4j_max_retry_time=float(os.environ.get("NEO4J_MAX_RETRY_TIME", "15")),
+        graph_sync_in_process=os.environ.get("GRAPH_SYNC_IN_PROCESS", "1") not in ("0", "false", "False"),
+        graph_sync_batch_size=int(os.environ.get("GRAPH_SYNC_BATCH_SIZE", "500")),
+        graph_sync_poll_interval=float(os.environ.get("GRAPH_SYNC_POLL_INTERVAL", "1")),
+        graph_sync_max_backoff=float(os.environ.get("GRAPH_SYNC_MAX_BACKOFF", "300")),
+        graph_index_refresh_interval=float(os.environ.get("GRAPH_INDEX_REFRESH_INTERVAL", "300")),
+        search_index_refresh_interval=float(os.environ.get("SEARCH_INDEX_REFRESH_INTERVAL", "300")),
+        similarity_index_refresh_interval=float(os.environ.get("SIMILARITY_INDEX_REFRESH_INTERVAL", "300")),
+        entity_cache_maxsize=int(os.environ.get("ENTITY_CACHE_MAXSIZE", "10000")),
+        entity_cache_ttl=float(os.environ.get("ENTITY_CACHE_TTL", "300")),
+        staging_dir=os.environ.get("STAGING_DIR", "staging"),
+        property_index_dir=os.environ.get("PROPERTY_INDEX_DIR", ""),
+        slow_request_ms=float(os.environ.get("SLOW_REQUEST_MS", "1000")),
+        slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "250")),
+        archive_retention_days=float(os.environ.get("ARCHIVE_RETENTION_DAYS", "30")),
+        archive_batch_size=int(os.environ.get("ARCHIVE_BATCH_SIZE", "1000")),
+        archive_interval=float(os.environ.get("ARCHIVE_INTERVAL", "3600")),
     )
-
-
@@ -0,0 +1,187 @@
+"""In-process MinHash/LSH index over effective BOMs for reuse recommendations.
+
+Every solution with an effective BOM (solution_modules_effective, i.e. the rows of
+v_solution_modules_effective, live modules only) is a set of (module_id, role)
+elements. Its MinHash signature has NUM_PERM values, min over the elements of
+(a*x + b) mod 2^61-1 per permutation, so the share of equal positions in two
+signatures estimates their Jaccard similarity. The signature is cut into BANDS bands of ROWS values; solutions
+sharing any band land in the same bucket and become candidates. Candidates are
+ranked by exact Jaccard on the stored sets, so a query looks at a handful of
+solutions instead of the whole catalog. With 32 bands of 4 rows, pairs at
+Jaccard 0.5 are found with ~87% probability, at 0.7 with >99.9%.
+
+Write handlers that change an effective BOM call refresh(ids) after commit, which
+re-reads those solutions' rows. The periodic full reload
+(SIMILARITY_INDEX_REFRESH_INTERVAL) picks up writes served by other workers; it
+builds off to the side and replays refreshes that arrived meanwhile
+(api.reloadable).
+"""
+
+import asyncio
+import logging
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import BigInteger, any_, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from .db import SessionLocal
+from .models import Module, Solution, SolutionModuleEffective
+from .reloadable import ReloadableIndex
+
+
+LOGGER = logging.getLogger("similarity_index")
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+_PRIME = np.uint64((1 << 61) - 1)
+_LOAD_CHUNK_ROWS = 10_000
+
+# Fixed seed: every worker (and every reload) hashes identically.
+_rng = np.random.default_rng(20_250_810)
+_A = _rng.integers(1, 1 << 32, size=(NUM_PERM, 1), dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, size=(NUM_PERM, 1), dtype=np.uint64)
+
+Element = Tuple[int, Optional[str]]  # (module_id, role)
+
+
+def _element_hash(element: Element) -> int:
+    mid, role = element
+    return zlib.crc32(f"{mid}\x1f{role or ''}".encode("utf-8"))
+
+
+def signature(elements: Iterable[Element]) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint64 values) of a non-empty element set."""
+    x = np.fromiter((_element_hash(e) for e in elements), dtype=np.uint64)
+    # a, x < 2^32, so a*x + b stays below 2^64
+    return ((_A * x + _B) % _PRIME).min(axis=1)
+
+
+class _Generation:
+    def __init__(self) -> None:
+        self.sets: Dict[int, FrozenSet[Element]] = {}
+        self.types: Dict[int, str] = {}
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[int]]] = [defaultdict(set) for _ in range(BANDS)]
+
+    def put(self, sid: int, type_: str, elements: FrozenSet[Element]) -> None:
+        self.drop(sid)
+        if not elements:
+            return
+        sig = signature(elements)
+        self.sets[sid] = elements
+        self.types[sid] = type_
+        self.signatures[sid] = sig
+        for band, buckets in enumerate(self.buckets):
+            buckets[sig[band * ROWS:(band + 1) * ROWS].tobytes()].add(sid)
+
+    def drop(self, sid: int) -> None:
+        sig = self.signatures.pop(sid, None)
+        if sig is None:
+            return
+        del self.sets[sid]
+        del self.types[sid]
+        for band, buckets in enumerate(self.buckets):
+            key = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+            members = buckets[key]
+            members.discard(sid)
+            if not members:
+                del buckets[key]
+
+    def similar(self, sid: int, k: int, type_: Optional[str]) -> Optional[List[dict]]:
+        sig = self.signatures.get(sid)
+        if sig is None:
+            return None
+        candidates: Set[int] = set()
+        for band, buckets in enumerate(self.buckets):
+            candidates |= buckets.get(sig[band * ROWS:(band + 1) * ROWS].tobytes(), set())
+        candidates.discard(sid)
+        mine = self.sets[sid]
+        scored = []
+        for other in candidates:
+            if type_ is not None and self.types[other] != type_:
+                continue
+            theirs = self.sets[other]
+            shared = len(mine & theirs)
+            scored.append((shared / (len(mine) + len(theirs) - shared), other, shared))
+        scored.sort(key=lambda t: (-t[0], t[1]))
+        return [
+            {"id": other, "type": self.types[other], "jaccard": round(j, 4), "shared": shared, "modules": len(self.sets[other])}
+            for j, other, shared in scored[:k]
+        ]
+
+
+class SimilarityIndex(ReloadableIndex[_Generation]):
+    def __init__(self) -> None:
+        super().__init__(_Generation)
+
+    async def load(self) -> None:
+        """Rebuild from Postgres; queries keep using the old generation meanwhile."""
+        fresh = await self._reload(_fill)
+        LOGGER.info("Similarity index loaded: solutions=%d", len(fresh.sets))
+
+    async def refresh(self, solution_ids: Iterable[int]) -> None:
+        """Re-read the effective BOM of `solution_ids` (call after the write committed)."""
+        ids = sorted(set(solution_ids))
+        if not ids:
+            return
+        eff = SolutionModuleEffective
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(eff.solution_id, Solution.type, eff.module_id, eff.role)
+                .join(Solution, Solution.id == eff.solution_id)
+                .join(Module, Module.id == eff.module_id)
+                .where(eff.solution_id == any_(literal(ids, ARRAY(BigInteger))), Module.deleted_at.is_(None))
+            )).all()
+        by_sid = _group(rows)
+        for sid in ids:
+            if sid in by_sid:
+                self._apply("put", sid, *by_sid[sid])
+            else:
+                self._apply("drop", sid)
+
+    def similar(self, sid: int, k: int = 10, type_: Optional[str] = None) -> Optional[List[dict]]:
+        """Top-k solutions by Jaccard over (module, role) sets; None if `sid` has no effective BOM."""
+        return self._current.similar(sid, k, type_)
+
+
+async def _fill(fresh: _Generation) -> None:
+    eff = SolutionModuleEffective
+    async with SessionLocal() as db:
+        result = await db.stream(
+            select(eff.solution_id, Solution.type, eff.module_id, eff.role)
+            .join(Solution, Solution.id == eff.solution_id)
+            .join(Module, Module.id == eff.module_id)
+            .where(Module.deleted_at.is_(None))
+            .order_by(eff.solution_id)
+            .execution_options(yield_per=_LOAD_CHUNK_ROWS)
+        )
+        carry: List[tuple] = []
+        async for rows in result.partitions():
+            rows = carry + list(rows)
+            # keep the last solution's rows: they may continue in the next chunk
+            last = rows[-1][0]
+            carry = [r for r in rows if r[0] == last]
+            await asyncio.to_thread(_put_all, fresh, [r for r in rows if r[0] != last])
+        await asyncio.to_thread(_put_all, fresh, carry)
+
+
+def _group(rows: Iterable[tuple]) -> Dict[int, Tuple[str, FrozenSet[Element]]]:
+    types: Dict[int, str] = {}
+    elements: Dict[int, Set[Element]] = defaultdict(set)
+    for sid, type_, mid, role in rows:
+        types[sid] = type_
+        elements[sid].add((mid, role))
+    return {sid: (types[sid], frozenset(elements[sid])) for sid in types}
+
+
+def _put_all(generation: _Generation, rows: List[tuple]) -> None:
+    for sid, (type_, elements) in _group(rows).items():
+        generation.put(sid, type_, elements)
+
+
+similarity_index = SimilarityIndex()
+
@@ -1,39 +1,111 @@
-from typing import Iterable, List, Tuple
-from neo4j import GraphDatabase
+from typing import Iterable, List, Optional, Tuple
+from neo4j import AsyncDriver, AsyncGraphDatabase, AsyncManagedTransaction
+from .metrics import timed_neo4j
 from .settings import load_settings
 
 
 settings = load_settings()
 
+_driver: Optional[AsyncDriver] = None
 
-def _neo4j_driver():
-    return GraphDatabase.driver(settings.neo4j_uri, auth=(settings.neo4j_user, settings.neo4j_password))
 
+def init_driver() -> AsyncDriver:
+    """Create the process-wide pooled async driver (idempotent).
 
-def upsert_solutions(nodes: List[Tuple[int, str, str]]):
-    """Upsert SolutionV2 nodes with sublabels and drop generic label.
+    Called from the FastAPI lifespan; scripts get it lazily via _neo4j_driver().
+    The driver is bound to the event loop it is first used on.
+    """
+    global _driver
+    if _driver is None:
+        _driver = AsyncGraphDatabase.driver(
+            settings.neo4j_uri,
+            auth=(settings.neo4j_user, settings.neo4j_password),
+            max_connection_pool_size=settings.neo4j_max_pool_size,
+            connection_acquisition_timeout=settings.neo4j_acquisition_timeout,
+            liveness_check_timeout=settings.neo4j_liveness_check_timeout,
+            max_transaction_retry_time=settings.neo4j_max_retry_time,
+        )
+    return _driver
+
+
+async def close_driver() -> None:
+    """Close the shared driver and release its pooled sockets."""
+    global _driver
+    if _driver is not None:
+        await _driver.close()
+        _driver = None
+
+
+def _neo4j_driver() -> AsyncDriver:
+    return init_driver()
+
+
+async def _run_statements(tx: AsyncManagedTransaction, statements: List[Tuple[str, dict]]) -> None:
+    for cypher, params in statements:
+        result = await tx.run(cypher, **params)
+        await result.consume()
+
+
+async def _collect(tx: AsyncManagedTransaction, cypher: str, params: dict) -> List[dict]:
+    result = await tx.run(cypher, **params)
+    return await result.data()
+
+
+@timed_neo4j
+async def read_rows(cypher: str, **params) -> List[dict]:
+    """Run a read query in a managed (retrying) read transaction and return all records."""
+    async with _neo4j_driver().session() as sess:
+        return await sess.execute_read(_collect, cypher, params)
+
+
+async def _write(*statements: Tuple[str, dict]) -> None:
+    """Run statements in one managed write transaction.
+
+    execute_write retries the whole unit of work on transient errors
+    (deadlocks, leader switches) for up to neo4j_max_retry_time seconds.
+    """
+    async with _neo4j_driver().session() as sess:
+        await sess.execute_write(_run_statements, list(statements))
+
+
+@timed_neo4j
+async def upsert_solutions(nodes: List[Tuple[int, str, str]]):
+    """Upsert solutions as MainSolutionV2 (Hauptprozess) or PartialSolutionV2 nodes.
+
+    MERGE goes through the sublabel's uniqueness constraint; a node whose type
+    changed is relabelled first, so it keeps its relationships.
 
     nodes: list of (id, name, type)
     """
     if not nodes:
         return
-    cypher = f"""
-    UNWIND $rows AS r
-    MERGE (s:SolutionV2 {{id: toString(r.id)}})
-      SET s.name = r.name,
-          s.type = r.type,
-          s.dataset = $dataset
-    WITH s
-    CALL {{ WITH s WHERE s.type='Hauptprozess' SET s:MainSolutionV2 RETURN 1 }}
-    CALL {{ WITH s WHERE s.type<>'Hauptprozess' SET s:PartialSolutionV2 RETURN 1 }}
-    REMOVE s:SolutionV2
-    """
-    with _neo4j_driver() as drv:
-        with drv.session() as sess:
-            sess.run(cypher, rows=[{"id": i, "name": n, "type": t} for i, n, t in nodes], dataset=settings.dataset)
+    rows: dict = {"MainSolutionV2": [], "PartialSolutionV2": []}
+    for i, n, t in nodes:
+        rows["MainSolutionV2" if t == "Hauptprozess" else "PartialSolutionV2"].append({"id": str(i), "name": n, "type": t})
+    statements = []
+    for label, other in (("MainSolutionV2", "PartialSolutionV2"), ("PartialSolutionV2", "MainSolutionV2")):
+        if not rows[label]:
+            continue
+        relabel_cypher = f"""
+        UNWIND $ids AS id
+        MATCH (s:{other} {{id: id}})
+        REMOVE s:{other}
+        SET s:{label}
+        """
+        merge_cypher = f"""
+        UNWIND $rows AS r
+        MERGE (s:{label} {{id: r.id}})
+          SET s.name = r.name,
+              s.type = r.type,
+              s.dataset = $dataset
+        """
+        statements.append((relabel_cypher, {"ids": [r["id"] for r in rows[label]]}))
+        statements.append((merge_cypher, {"rows": rows[label], "dataset": settings.dataset}))
+    await _write(*statements)
 
 
-def upsert_modules(nodes: List[Tuple[int, str, str, str]]):
+@timed_neo4j
+async def upsert_modules(nodes: List[Tuple[int, str, str, str]]):
     """Upsert ModuleV2 nodes.
 
     nodes: list of (id, name, typ, hersteller)
@@ -48,12 +120,40 @@ def upsert_modules(nodes: List[Tuple[int, str, str, str]]):
           m.hersteller = r.hersteller,
           m.dataset = $dataset
     """
-    with _neo4j_driver() as drv:
-        with drv.session() as sess:
-            sess.run(cypher, rows=[{"id": i, "name": n, "typ": ty, "hersteller": h} for i, n, ty, h in nodes], dataset=settings.dataset)
+    await _write((cypher, {"rows": [{"id": i, "name": n, "typ": ty, "hersteller": h} for i, n, ty, h in nodes], "dataset": settings.dataset}))
+
+
+@timed_neo4j
+async def delete_solutions(ids: Iterable[int]):
+    """Detach-delete solution nodes (either sublabel) that no longer exist in Postgres."""
+    data = [str(i) for i in ids]
+    if not data:
+        return
+    cypher = """
+    UNWIND $ids AS id
+    OPTIONAL MATCH (m:MainSolutionV2 {id: id})
+    OPTIONAL MATCH (p:PartialSolutionV2 {id: id})
+    DETACH DELETE m, p
+    """
+    await _write((cypher, {"ids": data}))
 
 
-def upsert_has_part(edges: Iterable[Tuple[int, int, int]]):
+@timed_neo4j
+async def delete_modules(ids: Iterable[int]):
+    """Detach-delete ModuleV2 nodes that no longer exist in Postgres."""
+    data = [str(i) for i in ids]
+    if not data:
+        return
+    cypher = """
+    UNWIND $ids AS id
+    MATCH (m:ModuleV2 {id: id})
+    DETACH DELETE m
+    """
+    await _write((cypher, {"ids": data}))
+
+
+@timed_neo4j
+async def upsert_has_part(edges: Iterable[Tuple[int, int, int]]):
     """Upsert HAS_PART relationships: (parent_id, child_id, qty)."""
     rows = list(edges)
     if not rows:
@@ -67,48 +167,110 @@ def upsert_has_part(edges: Iterable[Tuple[int, int, int]]):
           h.dataset = $dataset
     """
     data = [{"parent": p, "child": c, "qty": q} for p, c, q in rows]
-    with _neo4j_driver() as drv:
-        with drv.session() as sess:
-            sess.run(cypher, rows=data, dataset=settings.dataset)
+    await _write((cypher, {"rows": data, "dataset": settings.dataset}))
 
 
-def sync_effective_bom(solution_id: int, bom_rows: Iterable[Tuple[int, int, int, str]]):
-    """Synchronize USES_MODULE edges for one solution_id to match effective BOM.
+@timed_neo4j
+async def sync_has_part(parent_ids: Iterable[int], edges: Iterable[Tuple[int, int, int]]):
+    """Make the HAS_PART edges of each parent match exactly `edges`.
 
-    bom_rows: iterable of (solution_id, module_id, qty, role)
+    Children not listed for a parent are detached; listed ones are merged.
+    edges: iterable of (parent_id, child_id, qty)
     """
-    data = [
-        {"sid": str(sid), "mid": str(mid), "qty": qty, "role": role}
-        for sid, mid, qty, role in bom_rows
-    ]
-    cypher = f"""
-    // Delete stale edges for this solution_id (dataset-scoped)
-    MATCH (s {{id: toString($sid)}})-[u:USES_MODULE {{dataset: $dataset}}]->(:ModuleV2)
-    WITH s,u
-    OPTIONAL MATCH (s)-[u2:USES_MODULE]->(:ModuleV2)
-    WHERE (u2) AND NOT EXISTS {{
-      WITH s
-      UNWIND $rows AS r
-      RETURN 1 WHERE toString(r.sid)=s.id AND type(u2)='USES_MODULE' AND endNode(u2).id = toString(r.mid) AND coalesce(u2.role,'') = coalesce(r.role,'')
+    parents = [str(p) for p in parent_ids]
+    if not parents:
+        return
+    rows = list(edges)
+    keep: dict = {p: [] for p in parents}
+    for p, c, _ in rows:
+        keep.setdefault(str(p), []).append(str(c))
+    delete_cypher = """
+    UNWIND $parents AS pid
+    MATCH (p:MainSolutionV2 {id: pid})-[h:HAS_PART]->(c:PartialSolutionV2)
+    WHERE NOT c.id IN $keep[pid]
+    DELETE h
+    """
+    upsert_cypher = """
+    UNWIND $rows AS r
+    MATCH (p:MainSolutionV2 {id: toString(r.parent)})
+    MATCH (c:PartialSolutionV2 {id: toString(r.child)})
+    MERGE (p)-[h:HAS_PART]->(c)
+      SET h.qty = r.qty,
+          h.dataset = $dataset
+    """
+    data = [{"parent": p, "child": c, "qty": q} for p, c, q in rows]
+    await _write(
+        (delete_cypher, {"parents": parents, "keep": keep}),
+        (upsert_cypher, {"rows": data, "dataset": settings.dataset}),
+    )
+
+
+# Resolve a solution id to its node under either sublabel, using the per-label
+# uniqueness constraints instead of an unlabelled (all-nodes) match.
+_MATCH_SOLUTION = """
+    CALL {{
+      WITH {var}
+      MATCH (s:MainSolutionV2 {{id: {var}}}) RETURN s
+      UNION
+      WITH {var}
+      MATCH (s:PartialSolutionV2 {{id: {var}}}) RETURN s
     }}
-    DELETE u2;
+"""
+
+
+@timed_neo4j
+async def sync_effective_boms(solution_ids: Iterable[int], bom_rows: Iterable[Tuple[int, int, int, str]]):
+    """Make USES_MODULE edges of all given solutions match their effective BOM.
+
+    One transaction for any number of solutions: stale edges (module no longer in
+    the solution's effective BOM) are deleted and required edges merged via UNWIND.
+    Solutions listed without rows lose all their USES_MODULE edges.
 
-    // Upsert required edges
+    bom_rows: iterable of (solution_id, module_id, qty, role), read from
+    solution_modules_effective for exactly `solution_ids`.
+    """
+    sids = [str(s) for s in solution_ids]
+    if not sids:
+        return
+    # One edge per (solution, module) as in the importer; sorting makes the surviving
+    # row deterministic (greatest role wins), which the reconciler relies on.
+    data = sorted(
+        (
+            {"sid": str(sid), "mid": str(mid), "qty": qty, "role": role}
+            for sid, mid, qty, role in bom_rows
+        ),
+        key=lambda r: (r["sid"], r["mid"], r["role"] or ""),
+    )
+    keep: dict = {s: [] for s in sids}
+    for r in data:
+        keep.setdefault(r["sid"], []).append(r["mid"])
+    delete_cypher = """
+    UNWIND $sids AS sid
+    """ + _MATCH_SOLUTION.format(var="sid") + """
+    MATCH (s)-[u:USES_MODULE]->(m:ModuleV2)
+    WHERE NOT m.id IN $keep[sid]
+    DELETE u
+    """
+    upsert_cypher = """
     UNWIND $rows AS r
-    MATCH (s {{id: toString(r.sid)}})
-    MATCH (m:ModuleV2 {{id: toString(r.mid)}})
+    WITH r, r.sid AS sid
+    """ + _MATCH_SOLUTION.format(var="sid") + """
+    MATCH (m:ModuleV2 {id: r.mid})
     MERGE (s)-[u:USES_MODULE]->(m)
       SET u.qty = r.qty,
           u.role = r.role,
           u.dataset = $dataset
     """
-    with _neo4j_driver() as drv:
-        with drv.session() as sess:
-            sess.run(
-                cypher,
-                sid=str(solution_id),
-                rows=data,
-                dataset=settings.dataset,
-            )
+    await _write(
+        (delete_cypher, {"sids": sids, "keep": keep}),
+        (upsert_cypher, {"rows": data, "dataset": settings.dataset}),
+    )
 
 
+async def sync_effective_bom(solution_id: int, bom_rows: Iterable[Tuple[int, int, int, str]]):
+    """Synchronize USES_MODULE edges for one solution_id to match effective BOM.
+
+    bom_rows: iterable of (solution_id, module_id, qty, role) covering the
+    solution's complete effective BOM.
+    """
+    await sync_effective_boms([solution_id], bom_rows)
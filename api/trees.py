@@ -0,0 +1,258 @@
+"""Prebuilt, pre-compressed solution trees for the graph/browser view.
+
+A tree is one Hauptprozess with its Teilprozesse (HAS_PART, qty) and the modules of
+the effective BOM (solution_modules_effective) wherever they attach, i.e. what the
+README's exploration query returns, answered from Postgres:
+
+  {"id", "name", "version", "modules": [...], "parts": [{"id", "name", "qty", "modules": [...]}]}
+
+solution_tree_versions holds a counter per solution. Every write handler calls
+bump_tree_versions() in its own transaction with the solutions (or modules) it
+touches; the counters of those solutions, of solutions using the modules and of
+their HAS_PART parents go up by one. A tree's version is its Hauptprozess's
+counter and the dataset version is the sum of all counters, so both move on every
+relevant commit whatever order transactions commit in.
+
+TreeCache keeps the JSON of every tree it has built plus the compressed bodies
+served. A request reads the current version (a primary-key lookup, or one sum for
+the whole dataset) in a short session before any data, and re-renders only the
+trees whose counter moved, in a session opened under the render lock (waiting
+requests hold no pooled connection); the dataset payload is the concatenation of the per-tree JSON. orjson and
+zstandard are used when installed (stdlib json and gzip otherwise). The cache is
+per worker process; the counters live in Postgres, so all workers agree.
+"""
+
+import asyncio
+import gzip
+import json
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, any_, func, literal, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .db import SessionLocal
+from .models import Module, Solution, SolutionModuleEffective, SolutionPart, SolutionTreeVersion
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# Solutions touched directly or through a module's BOM rows, plus their HAS_PART
+# parents (the Hauptprozess whose tree shows them). Rows are locked in id order.
+_BUMP = text("""
+WITH touched AS (
+    SELECT unnest(CAST(:ids AS bigint[])) AS id
+    UNION
+    SELECT solution_id FROM solution_modules WHERE module_id = ANY(CAST(:module_ids AS bigint[]))
+),
+affected AS (
+    SELECT id FROM touched
+    UNION
+    SELECT sp.parent_solution_id FROM solution_parts sp JOIN touched t ON sp.child_solution_id = t.id
+)
+INSERT INTO solution_tree_versions (solution_id, version)
+SELECT id, 1 FROM affected ORDER BY id
+ON CONFLICT (solution_id) DO UPDATE SET version = solution_tree_versions.version + 1
+""")
+
+
+async def bump_tree_versions(db: AsyncSession, solution_ids: Iterable[int] = (), module_ids: Iterable[int] = ()) -> None:
+    """Mark the trees showing these solutions/modules as changed (commit is up to the caller).
+
+    Call before a hard delete, while the links to the parents still exist.
+    """
+    ids, mids = sorted(set(solution_ids)), sorted(set(module_ids))
+    if ids or mids:
+        await db.execute(_BUMP, {"ids": ids, "module_ids": mids})
+
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _compress(raw: bytes) -> Dict[str, bytes]:
+    out = {"gzip": gzip.compress(raw, GZIP_LEVEL, mtime=0)}
+    if zstandard is not None:
+        out["zstd"] = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return out
+
+
+def _accepted(accept_encoding: str) -> set:
+    out = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        out.add(name.strip().lower())
+    return out
+
+
+@dataclass
+class Payload:
+    version: int
+    raw: bytes
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    def body(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """(body, Content-Encoding) for the client's Accept-Encoding; zstd over gzip."""
+        accepted = _accepted(accept_encoding)
+        for encoding in ("zstd", "gzip"):
+            if encoding in accepted and encoding in self.encoded:
+                return self.encoded[encoding], encoding
+        return self.raw, None
+
+
+def _ids(values: List[int]):
+    return any_(literal(values, ARRAY(BigInteger)))
+
+
+async def _render(db: AsyncSession, versions: Dict[int, int], everything: bool = False) -> Dict[int, bytes]:
+    """JSON per live Hauptprozess among versions' keys (all of them if everything=True)."""
+    ids = list(versions)
+    main_q = select(Solution.id, Solution.name).where(Solution.type == "Hauptprozess", Solution.deleted_at.is_(None))
+    part_q = (
+        select(SolutionPart.parent_solution_id, SolutionPart.child_solution_id, SolutionPart.qty, Solution.name)
+        .join(Solution, Solution.id == SolutionPart.child_solution_id)
+        .where(SolutionPart.deleted_at.is_(None), Solution.deleted_at.is_(None))
+        .order_by(SolutionPart.parent_solution_id, SolutionPart.child_solution_id)
+    )
+    if not everything:
+        main_q = main_q.where(Solution.id == _ids(ids))
+        part_q = part_q.where(SolutionPart.parent_solution_id == _ids(ids))
+    mains = (await db.execute(main_q)).all()
+    parts = (await db.execute(part_q)).all()
+
+    eff = SolutionModuleEffective
+    bom_q = (
+        select(eff.solution_id, eff.module_id, eff.qty, eff.role, Module.name, Module.typ, Module.hersteller)
+        .join(Module, Module.id == eff.module_id)
+        .where(Module.deleted_at.is_(None))
+        .order_by(eff.solution_id, eff.module_id, eff.role)
+    )
+    if not everything:
+        bom_q = bom_q.where(eff.solution_id == _ids(ids + [c for _, c, _, _ in parts]))
+    modules: Dict[int, List[dict]] = defaultdict(list)
+    for sid, mid, qty, role, name, typ, hersteller in (await db.execute(bom_q)).all():
+        modules[sid].append({"id": mid, "name": name, "typ": typ, "hersteller": hersteller, "qty": qty, "role": role})
+
+    children: Dict[int, List[dict]] = defaultdict(list)
+    for parent, child, qty, name in parts:
+        children[parent].append({"id": child, "name": name, "qty": qty, "modules": modules.get(child, [])})
+
+    return {
+        sid: _dumps({
+            "id": sid,
+            "name": name,
+            "version": versions.get(sid, 0),
+            "modules": modules.get(sid, []),
+            "parts": children.get(sid, []),
+        })
+        for sid, name in mains
+    }
+
+
+class TreeCache:
+    def __init__(self) -> None:
+        self._trees: Dict[int, Tuple[int, bytes]] = {}  # main id -> (version, JSON)
+        self._served: Dict[int, Payload] = {}  # main id -> compressed single-tree payload
+        self._dataset: Optional[Payload] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.trees_rendered = 0
+
+    async def tree(self, sid: int) -> Optional[Payload]:
+        """Payload for one Hauptprozess, or None if it is not a live Hauptprozess."""
+        # Short sessions only: a miss must not park a pooled connection behind the lock.
+        async with SessionLocal() as db:
+            version = (await db.execute(
+                select(SolutionTreeVersion.version).where(SolutionTreeVersion.solution_id == sid)
+            )).scalar_one_or_none() or 0
+        served = self._served.get(sid)
+        if served is not None and served.version == version:
+            self.hits += 1
+            return served
+        self.misses += 1
+        async with self._lock:
+            served = self._served.get(sid)
+            if served is not None and served.version == version:
+                return served  # built while we waited
+            entry = self._trees.get(sid)
+            if entry is None or entry[0] != version:
+                async with SessionLocal() as db:
+                    rendered = await _render(db, {sid: version})
+                self.trees_rendered += len(rendered)
+                if sid not in rendered:
+                    self._trees.pop(sid, None)
+                    self._served.pop(sid, None)
+                    return None
+                entry = self._trees[sid] = (version, rendered[sid])
+            payload = Payload(version, entry[1], await asyncio.to_thread(_compress, entry[1]))
+            self._served[sid] = payload
+            return payload
+
+    async def dataset(self) -> Payload:
+        """Payload with every live Hauptprozess tree, ordered by id."""
+        async with SessionLocal() as db:
+            version = (await db.execute(select(func.coalesce(func.sum(SolutionTreeVersion.version), 0)))).scalar_one()
+        current = self._dataset
+        if current is not None and current.version == version:
+            self.hits += 1
+            return current
+        self.misses += 1
+        async with self._lock:
+            if self._dataset is not None and self._dataset.version == version:
+                return self._dataset
+            async with SessionLocal() as db:
+                versions = dict((await db.execute(
+                    select(Solution.id, func.coalesce(SolutionTreeVersion.version, 0))
+                    .outerjoin(SolutionTreeVersion, SolutionTreeVersion.solution_id == Solution.id)
+                    .where(Solution.type == "Hauptprozess", Solution.deleted_at.is_(None))
+                    .order_by(Solution.id)
+                )).all())
+                stale = {sid: v for sid, v in versions.items() if self._trees.get(sid, (None,))[0] != v}
+                if stale:
+                    rendered = await _render(db, stale if len(stale) < len(versions) else versions,
+                                             everything=len(stale) == len(versions))
+                    self.trees_rendered += len(rendered)
+                    for sid, raw in rendered.items():
+                        self._trees[sid] = (versions[sid], raw)
+            for sid in set(self._trees) - set(versions):
+                del self._trees[sid]
+                self._served.pop(sid, None)
+            raw = b'{"version":%d,"trees":[' % version
+            raw += b",".join(self._trees[sid][1] for sid in versions if sid in self._trees) + b"]}"
+            self._dataset = Payload(version, raw, await asyncio.to_thread(_compress, raw))
+            return self._dataset
+
+    def stats(self) -> dict:
+        return {
+            "trees": len(self._trees),
+            "dataset_version": self._dataset.version if self._dataset is not None else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "trees_rendered": self.trees_rendered,
+            "encodings": ["zstd", "gzip"] if zstandard is not None else ["gzip"],
+        }
+
+
+tree_cache = TreeCache()
@@ -0,0 +1,108 @@
+"""Recording stand-in for the async Neo4j driver used by api.sync_neo4j.
+
+Implements the part of the AsyncDriver API the sync code touches (session(),
+execute_write/execute_read, tx.run(), result.consume()/data(), close()). Every
+statement is recorded with its UNWIND row count; optional per-statement and per-row
+latencies simulate a server so sync timings stay meaningful without Neo4j.
+
+  from bench.fake_neo4j import install
+  recorder = install(statement_latency=0.002, row_latency=0.00001)
+"""
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from api import sync_neo4j
+
+
+@dataclass
+class RecordedStatement:
+    cypher: str
+    rows: int
+    params: Dict[str, Any] = field(repr=False)
+
+
+class _Result:
+    def __init__(self, records: List[dict]) -> None:
+        self._records = records
+
+    async def consume(self) -> None:
+        return None
+
+    async def data(self) -> List[dict]:
+        return list(self._records)
+
+
+class _Transaction:
+    def __init__(self, driver: "RecordingDriver") -> None:
+        self._driver = driver
+
+    async def run(self, cypher: str, **params) -> _Result:
+        return _Result(await self._driver._execute(cypher, params))
+
+
+class _Session:
+    def __init__(self, driver: "RecordingDriver") -> None:
+        self._driver = driver
+
+    async def __aenter__(self) -> "_Session":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    async def execute_write(self, work: Callable, *args, **kwargs):
+        self._driver.transactions += 1
+        return await work(_Transaction(self._driver), *args, **kwargs)
+
+    execute_read = execute_write
+
+
+class RecordingDriver:
+    def __init__(
+        self,
+        statement_latency: float = 0.0,
+        row_latency: float = 0.0,
+        read_results: Optional[Callable[[str, dict], List[dict]]] = None,
+    ) -> None:
+        self.statement_latency = statement_latency
+        self.row_latency = row_latency
+        self.read_results = read_results
+        self.statements: List[RecordedStatement] = []
+        self.transactions = 0
+
+    def session(self, **_config) -> _Session:
+        return _Session(self)
+
+    async def close(self) -> None:
+        return None
+
+    async def _execute(self, cypher: str, params: dict) -> List[dict]:
+        rows = max((len(v) for v in params.values() if isinstance(v, (list, tuple))), default=1)
+        self.statements.append(RecordedStatement(" ".join(cypher.split()), rows, params))
+        delay = self.statement_latency + rows * self.row_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self.read_results(cypher, params) if self.read_results else []
+
+    def reset(self) -> None:
+        self.statements.clear()
+        self.transactions = 0
+
+    def summary(self) -> Dict[str, dict]:
+        """Statements and rows per distinct statement (first 80 chars of the Cypher)."""
+        out: Dict[str, dict] = defaultdict(lambda: {"statements": 0, "rows": 0})
+        for s in self.statements:
+            entry = out[s.cypher[:80]]
+            entry["statements"] += 1
+            entry["rows"] += s.rows
+        return dict(out)
+
+
+def install(statement_latency: float = 0.0, row_latency: float = 0.0) -> RecordingDriver:
+    """Make api.sync_neo4j use a RecordingDriver instead of a real connection."""
+    driver = RecordingDriver(statement_latency, row_latency)
+    sync_neo4j._driver = driver  # init_driver() keeps an existing driver
+    return driver
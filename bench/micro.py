@@ -0,0 +1,166 @@
+"""Micro-benchmarks for the staging build and the Neo4j sync functions.
+
+staging: scripts/prepare_staging.build_staging over generated building-block files
+  of increasing size, once per worker count.
+sync: every api.sync_neo4j write function over a generated catalog, split into
+  batches of each --batch-sizes value (the outbox worker calls them the same way).
+  By default the recording fake driver is used, so the numbers measure the Python
+  side (row shaping, parameter building) plus the simulated --statement-latency /
+  --row-latency; --neo4j runs against the NEO4J_* server instead.
+
+Each (function, batch size) pair is repeated --repeat times; the summary is per
+call, and throughput_per_s is rows per second.
+
+Usage:
+  python -m bench.micro staging --sizes 10000 100000 --workers 1 4 --out bench/results/staging.json
+  python -m bench.micro sync --batch-sizes 100 500 2000 --out bench/results/sync.json
+"""
+
+import argparse
+import asyncio
+import importlib
+import logging
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Sequence
+
+from .catalog import CatalogSpec, generate, write_csvs
+from .results import result_document, summarise, write_document
+
+
+LOGGER = logging.getLogger("bench.micro")
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load_prepare_staging():
+    # scripts/ is not a package; import it by name so worker processes can unpickle its functions
+    scripts = str(REPO_ROOT / "scripts")
+    if scripts not in sys.path:
+        sys.path.insert(0, scripts)
+    return importlib.import_module("prepare_staging")
+
+
+def bench_staging(sizes: Sequence[int], workers: Sequence[int], repeat: int, seed: int) -> Dict[str, dict]:
+    prepare_staging = _load_prepare_staging()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-staging-") as tmp:
+        root = Path(tmp)
+        for size in sizes:
+            src = root / f"input-{size}"
+            catalog = generate(CatalogSpec(mains=0, modules=size, seed=seed))
+            write_csvs(catalog, src)
+            for n in workers:
+                samples = []
+                for i in range(repeat):
+                    started = time.perf_counter()
+                    prepare_staging.build_staging(src / "building_blocks_cleaned.csv", root / f"out-{size}-{n}-{i}", workers=n)
+                    samples.append(time.perf_counter() - started)
+                name = f"build_staging rows={size} workers={n}"
+                results[name] = summarise(samples, work=size * repeat, rows=size)
+                LOGGER.info("%s: p50=%.1fms", name, results[name]["p50_ms"])
+    return results
+
+
+async def _time_batches(fn: Callable[[list], Awaitable], rows: list, batch_size: int, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        for i in range(0, len(rows), batch_size):
+            started = time.perf_counter()
+            await fn(rows[i:i + batch_size])
+            samples.append(time.perf_counter() - started)
+    return summarise(samples, work=len(rows) * repeat, rows=len(rows), batch_size=batch_size)
+
+
+async def bench_sync(spec: CatalogSpec, batch_sizes: Sequence[int], repeat: int, use_fake: bool,
+                     statement_latency: float, row_latency: float) -> Dict[str, dict]:
+    from api import sync_neo4j
+
+    recorder = None
+    if use_fake:
+        from .fake_neo4j import install
+
+        recorder = install(statement_latency, row_latency)
+    else:
+        sync_neo4j.init_driver()
+
+    catalog = generate(spec)
+    solutions = [(sid, name, typ) for sid, name, typ, _ in catalog.solutions]
+    modules = [(mid, name, typ, maker) for mid, name, _cat, maker, typ, _ in catalog.modules]
+    parts_by_parent: Dict[int, list] = {}
+    for edge in catalog.parts:
+        parts_by_parent.setdefault(edge[0], []).append(edge)
+    bom_by_solution: Dict[int, list] = {}
+    for row in catalog.bom:
+        bom_by_solution.setdefault(row[0], []).append(row)
+
+    def per_owner(fn, grouped: Dict[int, list]):
+        # the batch is a list of owner ids; their links travel along, as in the outbox worker
+        return lambda owners: fn(owners, [row for o in owners for row in grouped.get(o, ())])
+
+    cases: List[tuple] = [
+        ("upsert_solutions", sync_neo4j.upsert_solutions, solutions),
+        ("upsert_modules", sync_neo4j.upsert_modules, modules),
+        ("upsert_has_part", sync_neo4j.upsert_has_part, catalog.parts),
+        ("sync_has_part", per_owner(sync_neo4j.sync_has_part, parts_by_parent), list(parts_by_parent)),
+        ("sync_effective_boms", per_owner(sync_neo4j.sync_effective_boms, bom_by_solution), list(bom_by_solution)),
+        ("delete_modules", sync_neo4j.delete_modules, [m[0] for m in modules]),
+        ("delete_solutions", sync_neo4j.delete_solutions, [s[0] for s in solutions]),
+    ]
+    results = {}
+    try:
+        for name, fn, rows in cases:
+            for batch_size in batch_sizes:
+                if recorder is not None:
+                    recorder.reset()
+                summary = await _time_batches(fn, rows, batch_size, repeat)
+                if recorder is not None:
+                    summary["statements"] = len(recorder.statements)
+                    summary["transactions"] = recorder.transactions
+                key = f"{name} batch={batch_size}"
+                results[key] = summary
+                LOGGER.info("%s: p50=%.2fms rows/s=%s", key, summary["p50_ms"] or 0, summary["throughput_per_s"])
+    finally:
+        await sync_neo4j.close_driver()
+    return results
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for staging and graph sync")
+    sub = parser.add_subparsers(dest="suite", required=True)
+
+    staging = sub.add_parser("staging", help="scripts/prepare_staging.build_staging")
+    staging.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    staging.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+
+    sync = sub.add_parser("sync", help="api.sync_neo4j write functions")
+    sync.add_argument("--mains", type=int, default=500)
+    sync.add_argument("--modules", type=int, default=5000)
+    sync.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 500, 2000])
+    sync.add_argument("--neo4j", action="store_true", help="Use the NEO4J_* server instead of the recording fake")
+    sync.add_argument("--statement-latency", type=float, default=0.0, help="Fake driver: seconds per statement")
+    sync.add_argument("--row-latency", type=float, default=0.0, help="Fake driver: seconds per UNWIND row")
+
+    for p in (staging, sync):
+        p.add_argument("--repeat", type=int, default=3)
+        p.add_argument("--seed", type=int, default=CatalogSpec.seed)
+        p.add_argument("--out", type=Path, help="Result JSON (default: stdout)")
+    args = parser.parse_args()
+
+    params = {k: v for k, v in vars(args).items() if k != "out"}
+    if args.suite == "staging":
+        results = bench_staging(args.sizes, args.workers, args.repeat, args.seed)
+    else:
+        spec = replace(CatalogSpec(), mains=args.mains, modules=args.modules, seed=args.seed)
+        results = asyncio.run(bench_sync(
+            spec, args.batch_sizes, args.repeat, not args.neo4j, args.statement_latency, args.row_latency
+        ))
+    write_document(result_document(f"micro.{args.suite}", params, results), args.out)
+
+
+if __name__ == "__main__":
+    main()
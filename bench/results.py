@@ -0,0 +1,117 @@
+"""Latency summaries, result documents and release-to-release comparison.
+
+A result document is
+  {"meta": {...}, "kind": "...", "params": {...}, "results": {name: summary, ...}}
+where each summary holds count, errors, throughput_per_s and mean/p50/p95/p99/max
+in milliseconds. `compare` reports the relative change of those fields per name.
+
+Usage:
+  python -m bench.results old.json new.json [--metric p95_ms] [--threshold 0.10]
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+LATENCY_FIELDS = ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+
+
+def summarise(samples: Sequence[float], elapsed: Optional[float] = None, errors: int = 0,
+              work: Optional[int] = None, **extra) -> dict:
+    """Summary of latencies given in seconds.
+
+    throughput_per_s is `work` units (default: one per sample) over `elapsed` wall
+    seconds (default: the sum of the samples, i.e. sequential calls).
+    """
+    ms = np.asarray(samples, dtype=np.float64) * 1000.0
+    out = {"count": int(len(ms)), "errors": errors}
+    if len(ms):
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        out.update(mean_ms=float(ms.mean()), p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), max_ms=float(ms.max()))
+    else:
+        out.update({f: None for f in LATENCY_FIELDS})
+    wall = elapsed if elapsed is not None else float(ms.sum() / 1000.0)
+    units = len(ms) if work is None else work
+    out["throughput_per_s"] = float(units / wall) if wall > 0 else None
+    out.update(extra)
+    return {k: (round(v, 4) if isinstance(v, float) else v) for k, v in out.items()}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_document(kind: str, params: dict, results: Dict[str, dict], **extra) -> dict:
+    """`extra` holds context that is not compared (e.g. server-side stats snapshots)."""
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+        },
+        "kind": kind,
+        "params": params,
+        "results": results,
+        **extra,
+    }
+
+
+def write_document(doc: dict, path: Optional[Path]) -> None:
+    text = json.dumps(doc, indent=2, sort_keys=True, ensure_ascii=False)
+    if path is None:
+        print(text)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + "\n", encoding="utf-8")
+
+
+def compare(old: dict, new: dict, metric: str, threshold: float) -> List[dict]:
+    """Per-name change of `metric`; higher is worse except for throughput."""
+    rows = []
+    for name in sorted(set(old["results"]) | set(new["results"])):
+        a = old["results"].get(name, {}).get(metric)
+        b = new["results"].get(name, {}).get(metric)
+        change = (b - a) / a if a and b is not None else None
+        worse = change is not None and (-change if metric == "throughput_per_s" else change) > threshold
+        rows.append({"name": name, "old": a, "new": b, "change": change, "regression": worse})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--metric", default="p95_ms", choices=[*LATENCY_FIELDS, "throughput_per_s"])
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as regression")
+    args = parser.parse_args()
+
+    old = json.loads(args.old.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    rows = compare(old, new, args.metric, args.threshold)
+    width = max([len(r["name"]) for r in rows] + [4])
+    print(f"{'name':<{width}}  {'old':>12}  {'new':>12}  change   ({args.metric})")
+    for r in rows:
+        change = "" if r["change"] is None else f"{r['change'] * 100:+.1f}%"
+        flag = "  REGRESSION" if r["regression"] else ""
+        fmt = lambda v: "-" if v is None else f"{v:.3f}"
+        print(f"{r['name']:<{width}}  {fmt(r['old']):>12}  {fmt(r['new']):>12}  {change:>7}{flag}")
+    if any(r["regression"] for r in rows):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Load scenarios against the HTTP API.
+
+Scenarios are weighted operation mixes; --concurrency workers each pick the next
+operation from the mix (seeded, so two runs issue the same request sequence) until
+--requests have been sent or --duration seconds have passed.
+
+  read        entity GETs, keyset lists, exploded BOMs, where-used, fuzzy search
+  bom_upload  BOM replacement via PUT /solutions/{id}/modules and CSV /bulk imports
+  mixed       mostly reads with solution/module writes and BOM uploads mixed in
+
+Latencies are recorded per endpoint template ("GET /solutions/{id}"), plus an
+"ALL" row; status >= 400 and transport errors count as errors. The /sync/status
+and /cache/stats responses after the run are stored next to the results, so
+write-heavy runs also show how far the graph sync fell behind.
+
+Target either a running server (--base-url) or the app in-process (--in-process,
+uses the local Postgres in DATABASE_URL, mapped onto the API's POSTGRES_DSN and
+refused if unset or remote, see bench.use_local_database; add --fake-neo4j to
+replace Neo4j with the recording driver from bench.fake_neo4j). Load a catalog
+first with `python -m bench.catalog --load`.
+
+Usage:
+  python -m bench.scenarios read --base-url http://localhost:8000 --concurrency 32 --duration 60
+  python -m bench.scenarios mixed --in-process --fake-neo4j --requests 5000 --out bench/results/mixed.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from . import use_local_database
+from .results import result_document, summarise, write_document
+
+
+LOGGER = logging.getLogger("bench.scenarios")
+
+_SEARCH_TERMS = ["Etikett", "prüfen", "Pruefung", "Greifer", "KUKA", "Schunk", "Gehause", "Sensor", "drucken", "Ableiter"]
+
+
+class Catalog:
+    """Ids known to the server, fetched once via the streaming list endpoints."""
+
+    def __init__(self, solutions: List[dict], modules: List[int]) -> None:
+        self.solutions = solutions
+        self.solution_ids = [s["id"] for s in solutions]
+        self.modules = modules
+        # modules created by the run get ids above everything the server had
+        self.next_module_id = max(modules) + 1
+
+    @classmethod
+    async def fetch(cls, client: httpx.AsyncClient) -> "Catalog":
+        async def stream(path: str) -> List[dict]:
+            async with client.stream("GET", path, params={"stream": "true"}) as resp:
+                resp.raise_for_status()
+                return [json.loads(line) async for line in resp.aiter_lines() if line]
+
+        solutions, modules = await asyncio.gather(stream("/solutions"), stream("/modules"))
+        if not solutions or not modules:
+            raise RuntimeError("Server has no solutions/modules; run `python -m bench.catalog --load` first")
+        return cls(solutions, [m["id"] for m in modules])
+
+
+Request = Tuple[str, str, str, dict]  # (label, method, url, httpx kwargs)
+
+
+def _bom_lines(rng: random.Random, catalog: Catalog, sid: int, n: int) -> List[dict]:
+    return [
+        {"solution_id": sid, "module_id": mid, "qty": rng.randint(1, 4), "role": f"bench_{k}"}
+        for k, mid in enumerate(rng.sample(catalog.modules, min(n, len(catalog.modules))), start=1)
+    ]
+
+
+def op_get_solution(rng, catalog, _seq) -> Request:
+    return "GET /solutions/{id}", "GET", f"/solutions/{rng.choice(catalog.solution_ids)}", {}
+
+
+def op_get_module(rng, catalog, _seq) -> Request:
+    return "GET /modules/{id}", "GET", f"/modules/{rng.choice(catalog.modules)}", {}
+
+
+def op_list_solutions(rng, _catalog, _seq) -> Request:
+    return "GET /solutions", "GET", "/solutions", {"params": {"limit": 100}}
+
+
+def op_exploded_bom(rng, catalog, _seq) -> Request:
+    return "GET /solutions/{id}/bom/exploded", "GET", f"/solutions/{rng.choice(catalog.solution_ids)}/bom/exploded", {}
+
+
+def op_where_used(rng, catalog, _seq) -> Request:
+    return "GET /modules/{id}/where-used", "GET", f"/modules/{rng.choice(catalog.modules)}/where-used", {}
+
+
+def op_search(rng, _catalog, _seq) -> Request:
+    return "GET /search", "GET", "/search", {"params": {"q": rng.choice(_SEARCH_TERMS), "limit": 20}}
+
+
+def op_put_bom(rng, catalog, _seq) -> Request:
+    sid = rng.choice(catalog.solution_ids)
+    return "PUT /solutions/{id}/modules", "PUT", f"/solutions/{sid}/modules", {"json": _bom_lines(rng, catalog, sid, rng.randint(3, 20))}
+
+
+def op_bulk_bom(rng, catalog, _seq) -> Request:
+    lines = ["solution_id,module_id,qty,role"]
+    for sid in rng.sample(catalog.solution_ids, min(20, len(catalog.solution_ids))):
+        lines.extend(f"{r['solution_id']},{r['module_id']},{r['qty']},{r['role']}" for r in _bom_lines(rng, catalog, sid, 10))
+    body = ("\n".join(lines) + "\n").encode("utf-8")
+    return "POST /bulk/solution_modules", "POST", "/bulk/solution_modules", {"content": body, "headers": {"Content-Type": "text/csv"}}
+
+
+def op_patch_solution(rng, catalog, _seq) -> Request:
+    s = rng.choice(catalog.solutions)
+    payload = {"id": s["id"], "name": s["name"], "type": s["type"], "hinweise": f"bench {rng.random():.6f}"}
+    return "PATCH /solutions/{id}", "PATCH", f"/solutions/{s['id']}", {"json": payload}
+
+
+def op_create_module(rng, catalog, seq) -> Request:
+    mid = catalog.next_module_id + seq
+    payload = {"id": mid, "name": f"Bench Modul {mid}", "bauteilkategorie": "Sensor", "hersteller": "Bench", "typ": f"B-{mid}"}
+    return "POST /modules", "POST", "/modules", {"json": payload}
+
+
+Operation = Callable[[random.Random, Catalog, int], Request]
+
+SCENARIOS: Dict[str, List[Tuple[Operation, int]]] = {
+    "read": [
+        (op_get_solution, 35), (op_get_module, 20), (op_list_solutions, 10),
+        (op_exploded_bom, 15), (op_where_used, 10), (op_search, 10),
+    ],
+    "bom_upload": [(op_put_bom, 70), (op_bulk_bom, 10), (op_exploded_bom, 20)],
+    "mixed": [
+        (op_get_solution, 30), (op_get_module, 15), (op_list_solutions, 5), (op_exploded_bom, 15),
+        (op_where_used, 5), (op_search, 10), (op_put_bom, 10), (op_patch_solution, 5), (op_create_module, 5),
+    ],
+}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, catalog: Catalog, concurrency: int,
+                       requests: Optional[int], duration: Optional[float], seed: int,
+                       first_seq: int = 0) -> Tuple[Dict[str, dict], float]:
+    ops, weights = zip(*SCENARIOS[name])
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    counter = iter(range(first_seq, first_seq + requests if requests is not None else 2**62))
+    deadline = time.perf_counter() + duration if duration is not None else None
+
+    async def worker(index: int) -> None:
+        rng = random.Random(seed * 1_000_003 + index)
+        for seq in counter:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            label, method, url, kwargs = rng.choices(ops, weights)[0](rng, catalog, seq)
+            started = time.perf_counter()
+            try:
+                resp = await client.request(method, url, **kwargs)
+                failed = resp.status_code >= 400
+                if failed and errors[label] < 3:
+                    LOGGER.warning("%s %s -> %d %s", method, url, resp.status_code, resp.text[:200])
+            except httpx.HTTPError as e:
+                failed = True
+                LOGGER.warning("%s %s failed: %s", method, url, e)
+            samples[label].append(time.perf_counter() - started)
+            errors[label] += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {label: summarise(samples[label], elapsed, errors[label]) for label in sorted(samples)}
+    results["ALL"] = summarise([s for v in samples.values() for s in v], elapsed, sum(errors.values()))
+    return results, elapsed
+
+
+async def _server_snapshot(client: httpx.AsyncClient) -> dict:
+    out = {}
+    for key, path in (("sync_status", "/sync/status"), ("cache_stats", "/cache/stats")):
+        try:
+            resp = await client.get(path)
+            out[key] = resp.json() if resp.status_code == 200 else {"status": resp.status_code}
+        except httpx.HTTPError as e:
+            out[key] = {"error": str(e)}
+    return out
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float) -> None:
+    """In-process startup loads the indexes in the background; wait for them."""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        resp = await client.get("/search", params={"q": "a"})
+        if resp.status_code != 503:
+            return
+        await asyncio.sleep(0.2)
+    LOGGER.warning("Indexes still loading after %.0fs; results include 503s", timeout)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    async with AsyncExitStack() as stack:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        if args.in_process:
+            if args.fake_neo4j:
+                from .fake_neo4j import install
+
+                install(args.statement_latency, args.row_latency)
+            from api.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app=app)
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+            )
+            await _wait_ready(client, args.timeout)
+        else:
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits)
+            )
+
+        catalog = await Catalog.fetch(client)
+        LOGGER.info("Catalog: solutions=%d modules=%d", len(catalog.solution_ids), len(catalog.modules))
+        if args.warmup:
+            await run_scenario(client, args.scenario, catalog, args.concurrency, args.warmup, None, args.seed + 1)
+        results, elapsed = await run_scenario(
+            client, args.scenario, catalog, args.concurrency, args.requests, args.duration, args.seed,
+            first_seq=args.warmup,
+        )
+        LOGGER.info("Done in %.1fs: %s", elapsed, results["ALL"])
+        params = {k: v for k, v in vars(args).items() if k != "out"}
+        params.update(solutions=len(catalog.solution_ids), modules=len(catalog.modules), elapsed_s=round(elapsed, 3))
+        return result_document(f"scenario.{args.scenario}", params, results, server=await _server_snapshot(client))
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Run a load scenario against the API")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--base-url", default="http://localhost:8000")
+    target.add_argument("--in-process", action="store_true", help="Drive api.main:app through ASGI, no server")
+    parser.add_argument("--fake-neo4j", action="store_true", help="In-process: use the recording Neo4j driver")
+    parser.add_argument("--statement-latency", type=float, default=0.0, help="Fake driver: seconds per statement")
+    parser.add_argument("--row-latency", type=float, default=0.0, help="Fake driver: seconds per UNWIND row")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--warmup", type=int, default=200, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, help="Result JSON (default: stdout)")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 2000
+    if args.fake_neo4j and not args.in_process:
+        parser.error("--fake-neo4j needs --in-process")
+    if args.in_process:
+        try:
+            use_local_database()
+        except ValueError as e:
+            parser.error(str(e))
+
+    try:
+        doc = asyncio.run(run(args))
+    except Exception:
+        LOGGER.exception("Scenario failed")
+        raise SystemExit(1)
+    write_document(doc, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,3 +18,18 @@ FOR (s:PartialSolutionV2)
 REQUIRE s.id IS UNIQUE;
 
 
+// Dataset-scoped reads (reconcile, exports) seek these instead of scanning labels
+CREATE INDEX main_solution_v2_dataset IF NOT EXISTS
+FOR (s:MainSolutionV2) ON (s.dataset);
+
+CREATE INDEX partial_solution_v2_dataset IF NOT EXISTS
+FOR (s:PartialSolutionV2) ON (s.dataset);
+
+CREATE INDEX module_v2_dataset IF NOT EXISTS
+FOR (m:ModuleV2) ON (m.dataset);
+
+CREATE INDEX has_part_dataset IF NOT EXISTS
+FOR ()-[h:HAS_PART]-() ON (h.dataset);
+
+CREATE INDEX uses_module_dataset IF NOT EXISTS
+FOR ()-[u:USES_MODULE]-() ON (u.dataset);
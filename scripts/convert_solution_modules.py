@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Convert the wide solution_modules.csv matrix into solution_modules_edges.csv.
+
+Input layout (one column per process, first column is a row label):
+  Prozessname,        <role>,   <role>,   ...   -> role per column
+  Prozessbezeichnung, <id>,     <id>,     ...   -> solution id per column
+  Baukastenelemente,  ,         ,         ...   -> optional label row
+  1,                  <module>, <module>, ...   -> one module id per cell
+  ...
+
+Output: solution_id,module_id,qty,role (long form, row-major: all columns of matrix
+row 1, then row 2, ...).
+
+Design notes:
+- Columns whose role or solution id is '#REF!' or empty are dropped.
+- Roles that occur on more than one column are disambiguated in column order
+  (e.g., "Etikett applizieren_1", "Etikett applizieren_2"); unique roles stay as-is.
+- Module rows are read in chunks of --chunk-size rows; non-empty cells are found with
+  one vectorized nonzero over the chunk's cell-length matrix, and only those cells are
+  turned into edges and written out, so the cell data in memory is bounded by the chunk.
+- A module listed more than once in the same column is emitted once (qty 1). A column
+  runs through every chunk, so the (column, module) pairs already written are kept for
+  the whole file: that set grows with the number of edges written (the matrix's
+  non-empty cells), not with the chunk size.
+
+Usage:
+  python3 scripts/convert_solution_modules.py [--input solution_modules.csv] [--out solution_modules_edges.csv]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+from collections import Counter
+from itertools import chain, islice
+from pathlib import Path
+from typing import Iterator, List, Set, Tuple
+
+import numpy as np
+
+
+LOGGER = logging.getLogger("convert_solution_modules")
+
+ROLE_ROW = "Prozessname"
+SOLUTION_ROW = "Prozessbezeichnung"
+LABEL_ROW = "Baukastenelemente"
+BROKEN = "#REF!"
+DEFAULT_CHUNK_SIZE = 5_000
+
+
+def configure_logging(debug: bool) -> None:
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s - %(message)s",
+    )
+
+
+def disambiguate_roles(roles: List[str]) -> List[str]:
+    """Suffix _1, _2, ... onto roles that occur on several columns, in column order."""
+    totals = Counter(roles)
+    seen: Counter = Counter()
+    out = []
+    for role in roles:
+        if totals[role] > 1:
+            seen[role] += 1
+            out.append(f"{role}_{seen[role]}")
+        else:
+            out.append(role)
+    return out
+
+
+def read_header(reader: Iterator[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str]]:
+    """Consume the header rows; return (kept column indexes, solution ids, roles, first data row).
+
+    The first data row is returned (possibly empty) because the label row is optional.
+    """
+    header = {}
+    first_data: List[str] = []
+    for row in reader:
+        label = row[0].strip() if row else ""
+        if label in (ROLE_ROW, SOLUTION_ROW):
+            header[label] = [c.strip() for c in row[1:]]
+            continue
+        if label == LABEL_ROW:
+            continue
+        first_data = row
+        break
+    if ROLE_ROW not in header or SOLUTION_ROW not in header:
+        raise ValueError(f"Missing {ROLE_ROW!r}/{SOLUTION_ROW!r} header rows")
+
+    width = max(len(header[ROLE_ROW]), len(header[SOLUTION_ROW]))
+    roles = np.array(header[ROLE_ROW] + [""] * (width - len(header[ROLE_ROW])))
+    sids = np.array(header[SOLUTION_ROW] + [""] * (width - len(header[SOLUTION_ROW])))
+    keep = np.flatnonzero((roles != BROKEN) & (sids != BROKEN) & (roles != "") & (sids != ""))
+    dropped = width - len(keep)
+    if dropped:
+        LOGGER.info("Dropping %d columns with %s or empty headers", dropped, BROKEN)
+    return keep, sids[keep], np.array(disambiguate_roles(roles[keep].tolist())), first_data
+
+
+def _chunks(first: List[str], reader: Iterator[List[str]], size: int) -> Iterator[List[List[str]]]:
+    pending = [first] if first else []
+    while True:
+        chunk = pending + list(islice(reader, size - len(pending)))
+        pending = []
+        if not chunk:
+            return
+        yield chunk
+
+
+def convert(input_path: Path, out_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    LOGGER.info("Converting %s -> %s", input_path, out_path)
+    edges = 0
+    duplicates = 0
+    seen: Set[Tuple[int, str]] = set()  # (column, module) written so far; one per output edge
+    with input_path.open(newline="", encoding="utf-8") as f_in, out_path.open("w", newline="", encoding="utf-8") as f_out:
+        reader = csv.reader(f_in)
+        keep, sids, roles, first = read_header(reader)
+        width = int(keep.max()) + 2 if len(keep) else 1  # + label column
+        writer = csv.writer(f_out)
+        writer.writerow(["solution_id", "module_id", "qty", "role"])
+
+        cols_in = width - 1
+        for chunk in _chunks(first, reader, chunk_size):
+            # Pad/trim to a rectangle without the label column; only cell lengths become
+            # an array, strings are touched again just for the (sparse) non-empty cells.
+            flat = list(chain.from_iterable((row + [""] * width)[1:width] for row in chunk))
+            lengths = np.fromiter(map(len, flat), dtype=np.int32, count=len(flat)).reshape(len(chunk), cols_in)
+            r_idx, c_idx = np.nonzero(lengths[:, keep])  # row-major order
+            cells = (r_idx * cols_in + keep[c_idx]).tolist()
+            rows_out = []
+            for col, cell, sid, role in zip(c_idx.tolist(), cells, sids[c_idx].tolist(), roles[c_idx].tolist()):
+                mid = flat[cell].strip()
+                if not mid or mid == BROKEN:
+                    continue
+                if (col, mid) in seen:
+                    duplicates += 1
+                    continue
+                seen.add((col, mid))
+                rows_out.append((sid, mid, 1, role))
+            writer.writerows(rows_out)
+            edges += len(rows_out)
+
+    if duplicates:
+        LOGGER.warning("Skipped %d repeated module ids within a column", duplicates)
+    LOGGER.info("Wrote %d edges for %d solutions", edges, len(sids))
+    return edges
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Convert the wide solution/module matrix to long-form edges")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=Path("solution_modules.csv"),
+        help="Wide matrix CSV (default: solution_modules.csv)",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=Path("solution_modules_edges.csv"),
+        help="Long-form edges CSV (default: solution_modules_edges.csv)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Matrix rows per vectorized chunk (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Enable debug logging",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    configure_logging(args.debug)
+    try:
+        convert(args.input, args.out, args.chunk_size)
+    except Exception as exc:
+        LOGGER.exception("Conversion failed: %s", exc)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Load the staging CSVs and the V2 solution dataset into Neo4j over Bolt.
+
+Replaces the LOAD CSV scripts in ./neo4j for bulk loads: files are read from local
+disk (no raw.githubusercontent access needed) and written with UNWIND in batches of
+--batch-size rows, one managed transaction per batch, by --workers parallel sessions.
+
+Inputs:
+  staging/   categories, manufacturers, properties, components, component_manufacturer,
+             component_category, component_properties (see scripts/prepare_staging.py)
+  ./         solutions.csv, modules.csv, solution_parts.csv, solution_modules_edges.csv
+
+Design notes:
+- Rows of a stage are partitioned so parallel sessions never lock the same node:
+  node stages by id hash; relationship stages on a (start, end) hash grid processed
+  in rounds where no two buckets of a round share a start or end partition.
+- MainSolutionV2 / PartialSolutionV2 are assigned in the MERGE itself from the
+  Prozessart column, so there is no SolutionV2 label and no relabelling scan.
+- The MAIN-with-children rule for USES_MODULE is applied here from solution_parts.csv,
+  as in v_solution_modules_effective; one edge per (solution, module), greatest role wins.
+- Every stage reports rows, elapsed time and rows/sec.
+
+Usage:
+  python3 scripts/load_neo4j.py [--staging staging] [--root .] [--batch-size 1000] [--workers 4]
+                                [--stage components --stage made_by ...] [--no-constraints]
+
+Connection: NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD (as for the API).
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from neo4j import Driver, GraphDatabase, ManagedTransaction
+
+
+LOGGER = logging.getLogger("load_neo4j")
+
+DATASET = "equipment_solution_v2"
+MAIN_TYPE = "Hauptprozess"
+CONSTRAINT_FILES = ("neo4j/constraints.cypher", "neo4j/constraints_v2.cypher")
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    cypher: str
+    rows: Callable[[], List[dict]]
+    start: str  # row key of the (start) node
+    end: Optional[str] = None  # row key of the end node; None for node stages
+
+
+@dataclass
+class StageResult:
+    name: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def configure_logging(debug: bool) -> None:
+    logging.basicConfig(
+        level=logging.DEBUG if debug else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s - %(message)s",
+    )
+
+
+def read_csv(path: Path) -> Iterable[Dict[str, str]]:
+    try:
+        with path.open(newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    except FileNotFoundError:
+        LOGGER.exception("Input CSV not found: %s", path)
+        raise
+
+
+def _value(raw: Optional[str]) -> Optional[str]:
+    # LOAD CSV yields null for empty fields; keep that so SET += clears them
+    if raw is None:
+        return None
+    v = raw.strip()
+    return v or None
+
+
+def _qty(raw: Optional[str]) -> int:
+    v = _value(raw)
+    return int(float(v)) if v else 1
+
+
+def _bucket(key: object, n: int) -> int:
+    return zlib.crc32(str(key).encode("utf-8")) % n
+
+
+# -- row sources -------------------------------------------------------------------
+
+
+def _names(path: Path) -> Callable[[], List[dict]]:
+    return lambda: [{"name": r["name"]} for r in read_csv(path) if _value(r.get("name"))]
+
+
+def _staging_rows(path: Path, *fields: str) -> Callable[[], List[dict]]:
+    return lambda: [{f: r.get(f, "") for f in fields} for r in read_csv(path)]
+
+
+def _component_properties(path: Path) -> Callable[[], List[dict]]:
+    def load() -> List[dict]:
+        return [
+            {
+                "component_id": r["component_id"],
+                "property_name": r["property_name"],
+                "unit": _value(r.get("unit")),
+                "numeric_value": float(r["numeric_value"]) if _value(r.get("numeric_value")) else None,
+                "text_value": _value(r.get("text_value")),
+                "source": r.get("source"),
+            }
+            for r in read_csv(path)
+        ]
+
+    return load
+
+
+class V2Dataset:
+    """Repo-root V2 CSVs, with solution types and parents needed for labels and the BOM rule."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._solutions: Optional[List[dict]] = None
+        self._parts: Optional[List[dict]] = None
+
+    def solutions(self) -> List[dict]:
+        if self._solutions is None:
+            rows = []
+            for r in read_csv(self.root / "solutions.csv"):
+                sid = _value(r.get("Prozessnummer"))
+                if not sid:
+                    continue
+                props = {k: _value(v) for k, v in r.items() if k and k != "Prozessnummer"}
+                props["name"] = props.pop("Prozessname", None)
+                props["type"] = props.pop("Prozessart", None)
+                rows.append({"id": sid, "props": props})
+            self._solutions = rows
+        return self._solutions
+
+    def types(self) -> Dict[str, Optional[str]]:
+        return {r["id"]: r["props"]["type"] for r in self.solutions()}
+
+    def solutions_of(self, main: bool) -> Callable[[], List[dict]]:
+        return lambda: [r for r in self.solutions() if (r["props"]["type"] == MAIN_TYPE) == main]
+
+    def modules(self) -> List[dict]:
+        rows = []
+        for r in read_csv(self.root / "modules.csv"):
+            mid = _value(r.get("Lfd. Nummer"))
+            if not mid:
+                continue
+            props = {k: _value(v) for k, v in r.items() if k and k != "Lfd. Nummer"}
+            props["name"] = props.pop("Bauteilnamen", None)
+            props["version"] = props.pop("Version", None)
+            # lower-case copies as written by the API sync (api/sync_neo4j.py)
+            props["typ"] = props.get("Typ") or ""
+            props["hersteller"] = props.get("Hersteller") or ""
+            rows.append({"id": mid, "props": props})
+        return rows
+
+    def parts(self) -> List[dict]:
+        if self._parts is None:
+            self._parts = [
+                {"parent": _value(r.get("parent_solution_id")), "child": _value(r.get("child_solution_id")), "qty": _qty(r.get("qty"))}
+                for r in read_csv(self.root / "solution_parts.csv")
+                if _value(r.get("parent_solution_id")) and _value(r.get("child_solution_id"))
+            ]
+        return self._parts
+
+    def bom_of(self, main: bool) -> Callable[[], List[dict]]:
+        def load() -> List[dict]:
+            types = self.types()
+            with_children = {r["parent"] for r in self.parts()}
+            best: Dict[Tuple[str, str], dict] = {}
+            skipped = 0
+            for r in read_csv(self.root / "solution_modules_edges.csv"):
+                sid, mid = _value(r.get("solution_id")), _value(r.get("module_id"))
+                if not sid or not mid or sid not in types:
+                    skipped += 1
+                    continue
+                is_main = types[sid] == MAIN_TYPE
+                if is_main != main or (is_main and sid in with_children):
+                    continue  # other stage / MAIN-with-children contributes no direct modules
+                row = {"sid": sid, "mid": mid, "qty": _qty(r.get("qty")), "role": _value(r.get("role"))}
+                current = best.get((sid, mid))
+                if current is None or (row["role"] or "") >= (current["role"] or ""):
+                    best[(sid, mid)] = row
+            if skipped:
+                LOGGER.warning("Skipped %d BOM rows with missing or unknown solution ids", skipped)
+            return [best[k] for k in sorted(best)]
+
+        return load
+
+
+# -- Cypher ------------------------------------------------------------------------
+
+_SOLUTION_CYPHER = """
+UNWIND $rows AS r
+OPTIONAL MATCH (old:{other} {{id: r.id}})
+FOREACH (o IN CASE WHEN old IS NULL THEN [] ELSE [old] END | REMOVE o:{other} SET o:{label})
+MERGE (s:{label} {{id: r.id}})
+SET s += r.props, s.dataset = $dataset
+"""
+
+_USES_MODULE_CYPHER = """
+UNWIND $rows AS r
+MATCH (s:{label} {{id: r.sid}})
+MATCH (m:ModuleV2 {{id: r.mid}})
+MERGE (s)-[u:USES_MODULE]->(m)
+SET u.dataset = $dataset, u.qty = r.qty, u.role = r.role
+"""
+
+
+def build_stages(staging: Path, root: Path) -> List[Stage]:
+    v2 = V2Dataset(root)
+    return [
+        # Component graph (staging/)
+        Stage("categories", "UNWIND $rows AS r MERGE (:Category {name: r.name})", _names(staging / "categories.csv"), "name"),
+        Stage("manufacturers", "UNWIND $rows AS r MERGE (:Manufacturer {name: r.name})", _names(staging / "manufacturers.csv"), "name"),
+        Stage("properties", "UNWIND $rows AS r MERGE (:Property {name: r.name})", _names(staging / "properties.csv"), "name"),
+        Stage(
+            "components",
+            "UNWIND $rows AS r MERGE (c:Component {id: r.id}) SET c.type = r.type, c.component_names = r.component_names",
+            _staging_rows(staging / "components.csv", "id", "type", "component_names"),
+            "id",
+        ),
+        Stage(
+            "made_by",
+            """
+            UNWIND $rows AS r
+            MATCH (c:Component {id: r.component_id})
+            MATCH (m:Manufacturer {name: r.manufacturer_name})
+            MERGE (c)-[:MADE_BY]->(m)
+            """,
+            _staging_rows(staging / "component_manufacturer.csv", "component_id", "manufacturer_name"),
+            "component_id",
+            "manufacturer_name",
+        ),
+        Stage(
+            "in_category",
+            """
+            UNWIND $rows AS r
+            MATCH (c:Component {id: r.component_id})
+            MATCH (cat:Category {name: r.category_name})
+            MERGE (c)-[:IN_CATEGORY]->(cat)
+            """,
+            _staging_rows(staging / "component_category.csv", "component_id", "category_name"),
+            "component_id",
+            "category_name",
+        ),
+        Stage(
+            "has_property",
+            """
+            UNWIND $rows AS r
+            MATCH (c:Component {id: r.component_id})
+            MATCH (p:Property {name: r.property_name})
+            MERGE (c)-[h:HAS_PROPERTY]->(p)
+            SET h.unit = r.unit, h.numeric_value = r.numeric_value, h.text_value = r.text_value, h.source = r.source
+            """,
+            _component_properties(staging / "component_properties.csv"),
+            "component_id",
+            "property_name",
+        ),
+        # V2 solution dataset (repo root)
+        Stage("solutions_main", _SOLUTION_CYPHER.format(label="MainSolutionV2", other="PartialSolutionV2"), v2.solutions_of(True), "id"),
+        Stage("solutions_partial", _SOLUTION_CYPHER.format(label="PartialSolutionV2", other="MainSolutionV2"), v2.solutions_of(False), "id"),
+        Stage(
+            "modules",
+            "UNWIND $rows AS r MERGE (m:ModuleV2 {id: r.id}) SET m += r.props, m.dataset = $dataset",
+            v2.modules,
+            "id",
+        ),
+        Stage(
+            "has_part",
+            """
+            UNWIND $rows AS r
+            MATCH (p:MainSolutionV2 {id: r.parent})
+            MATCH (c:PartialSolutionV2 {id: r.child})
+            MERGE (p)-[h:HAS_PART]->(c)
+            SET h.dataset = $dataset, h.qty = r.qty
+            """,
+            v2.parts,
+            "parent",
+            "child",
+        ),
+        Stage("uses_module_main", _USES_MODULE_CYPHER.format(label="MainSolutionV2"), v2.bom_of(True), "sid", "mid"),
+        Stage("uses_module_partial", _USES_MODULE_CYPHER.format(label="PartialSolutionV2"), v2.bom_of(False), "sid", "mid"),
+    ]
+
+
+# -- execution ---------------------------------------------------------------------
+
+
+def _write_batch(tx: ManagedTransaction, cypher: str, rows: List[dict], dataset: str) -> None:
+    tx.run(cypher, rows=rows, dataset=dataset).consume()
+
+
+def _run_bucket(driver: Driver, database: Optional[str], cypher: str, rows: List[dict], batch_size: int, dataset: str) -> None:
+    with driver.session(database=database) as session:
+        for i in range(0, len(rows), batch_size):
+            session.execute_write(_write_batch, cypher, rows[i : i + batch_size], dataset)
+
+
+def partition_rounds(rows: List[dict], start: str, end: Optional[str], workers: int) -> List[List[List[dict]]]:
+    """Split rows into rounds of buckets that may run in parallel without shared nodes.
+
+    Node stages: one round of `workers` id buckets. Relationship stages: a
+    workers x workers grid on (start, end) hashes, run as `workers` rounds where
+    round r holds buckets (i, (i + r) % workers), so within a round every start and
+    every end partition is owned by exactly one session.
+    """
+    if end is None:
+        buckets: List[List[dict]] = [[] for _ in range(workers)]
+        for row in rows:
+            buckets[_bucket(row[start], workers)].append(row)
+        return [buckets]
+    grid: List[List[List[dict]]] = [[[] for _ in range(workers)] for _ in range(workers)]
+    for row in rows:
+        grid[_bucket(row[start], workers)][_bucket(row[end], workers)].append(row)
+    return [[grid[i][(i + r) % workers] for i in range(workers)] for r in range(workers)]
+
+
+def run_stage(
+    driver: Driver,
+    database: Optional[str],
+    stage: Stage,
+    pool: ThreadPoolExecutor,
+    workers: int,
+    batch_size: int,
+    dataset: str,
+) -> StageResult:
+    rows = stage.rows()
+    started = time.perf_counter()
+    for round_ in partition_rounds(rows, stage.start, stage.end, workers):
+        futures = [
+            pool.submit(_run_bucket, driver, database, stage.cypher, bucket, batch_size, dataset)
+            for bucket in round_
+            if bucket
+        ]
+        for future in futures:
+            future.result()
+    result = StageResult(stage.name, len(rows), time.perf_counter() - started)
+    LOGGER.info("%-20s rows=%-8d %.2fs  %.0f rows/s", result.name, result.rows, result.seconds, result.rows_per_sec)
+    return result
+
+
+def apply_constraints(driver: Driver, database: Optional[str], root: Path) -> None:
+    for name in CONSTRAINT_FILES:
+        path = root / name
+        text = "\n".join(line for line in path.read_text(encoding="utf-8").splitlines() if not line.strip().startswith("//"))
+        with driver.session(database=database) as session:
+            for statement in (s.strip() for s in text.split(";")):
+                if statement:
+                    session.run(statement).consume()
+        LOGGER.info("Applied %s", path)
+
+
+def parse_args(stage_names: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batched Neo4j loader for staging and V2 CSVs")
+    parser.add_argument("--staging", type=Path, default=Path("staging"), help="Staging CSV directory (default: staging)")
+    parser.add_argument("--root", type=Path, default=Path("."), help="Directory with the V2 CSVs and neo4j/ (default: .)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per UNWIND transaction (default: 1000)")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel writer sessions (default: 4)")
+    parser.add_argument(
+        "--stage",
+        action="append",
+        choices=stage_names,
+        help="Run only these stages (repeatable; default: all, in dependency order)",
+    )
+    parser.add_argument("--no-constraints", action="store_true", help="Skip applying neo4j/constraints*.cypher first")
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USER", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("NEO4J_PASSWORD", ""))
+    parser.add_argument("--database", default=os.getenv("NEO4J_DATABASE") or None)
+    parser.add_argument("--dataset", default=DATASET)
+    parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    return parser.parse_args()
+
+
+def main() -> None:
+    stage_names = [s.name for s in build_stages(Path("staging"), Path("."))]
+    args = parse_args(stage_names)
+    configure_logging(args.debug)
+    stages = [s for s in build_stages(args.staging, args.root) if not args.stage or s.name in args.stage]
+    workers = max(1, args.workers)
+    try:
+        with GraphDatabase.driver(args.uri, auth=(args.user, args.password), max_connection_pool_size=workers + 2) as driver:
+            driver.verify_connectivity()
+            if not args.no_constraints:
+                apply_constraints(driver, args.database, args.root)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = [run_stage(driver, args.database, s, pool, workers, args.batch_size, args.dataset) for s in stages]
+    except Exception as exc:
+        LOGGER.exception("Neo4j load failed: %s", exc)
+        raise SystemExit(1)
+    total_rows = sum(r.rows for r in results)
+    total_secs = sum(r.seconds for r in results)
+    LOGGER.info("Loaded %d rows in %.2fs (%.0f rows/s)", total_rows, total_secs, total_rows / total_secs if total_secs else 0.0)
+
+
+if __name__ == "__main__":
+    main()
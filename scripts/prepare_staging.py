@@ -17,9 +17,17 @@ Design notes:
 - Values are split into numeric_value (float when parseable) or text_value (string).
 - Empty strings and '-' placeholders are treated as NULL and omitted where appropriate.
 - The pipeline is deterministic and idempotent: rerunning regenerates the same staging files.
+- Rows are streamed in chunks (--chunk-size) and written as they are parsed, so memory
+  is bounded by the number of distinct components, not by the input size.
+- --workers N parses chunks in N processes; results are consumed in input order, so
+  the files are byte-identical to a single-process run.
+- --incremental keeps <out>/manifest.csv (component id -> content hash) and writes only
+  added/changed components to <out>/delta/ (same file layout), plus
+  component_changes.csv and removed_components.csv.
 
 Usage:
   python3 scripts/prepare_staging.py [--input path/to/building_blocks_cleaned.csv] [--out staging]
+                                     [--chunk-size 10000] [--workers 4] [--incremental]
 """
 
 from __future__ import annotations
@@ -28,10 +36,14 @@ import argparse
 import csv
 import hashlib
 import logging
+import multiprocessing
 import re
+from collections import deque
+from contextlib import ExitStack
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
 
 
 LOGGER = logging.getLogger("prepare_staging")
@@ -40,6 +52,8 @@ LOGGER = logging.getLogger("prepare_staging")
 PROPERTY_COLUMNS: Tuple[str, str, str] = ("property_1", "property_2", "property_3")
 VALUE_COLUMNS: Tuple[str, str, str] = ("value_1", "value_2", "value_3")
 
+DEFAULT_CHUNK_SIZE = 10_000
+
 
 @dataclass(frozen=True)
 class Component:
@@ -140,108 +154,248 @@ def write_csv(path: Path, header: List[str], rows: Iterable[Iterable[object]]) -
         raise
 
 
-def build_staging(input_path: Path, out_dir: Path) -> None:
-    LOGGER.info("Building staging from: %s", input_path)
+class ParsedRow(NamedTuple):
+    component: Component
+    category: str  # "" when missing
+    manufacturer: str  # "" when missing
+    properties: Tuple[Tuple[str, str, Optional[float], str, str], ...]
+    # tuple: (property_name, unit, numeric_value, text_value, source)
+    content_hash: str  # everything above except `source`, so line shifts are not changes
+
+
+def parse_row(idx: int, row: Dict[str, str], source_name: str) -> Optional[ParsedRow]:
+    """Turn one source row into staging tuples; None for rows without any key field."""
+    category = (row.get("component_category") or "").strip()
+    manufacturer = (row.get("manufacturer") or "").strip()
+    type_name = (row.get("type") or "").strip()
+    component_names = (row.get("component_names") or "").strip()
+
+    if is_nullish(category) and is_nullish(manufacturer) and is_nullish(type_name) and is_nullish(component_names):
+        LOGGER.debug("Skipping empty row at line %d", idx)
+        return None
 
-    categories: Set[str] = set()
-    manufacturers: Set[str] = set()
-    properties: Set[str] = set()
-    components: Dict[str, Component] = {}
+    comp_id = generate_component_id(manufacturer, type_name, component_names)
+    props: List[Tuple[str, str, Optional[float], str, str]] = []
+    # Extract up to three property/value pairs
+    for p_col, v_col in zip(PROPERTY_COLUMNS, VALUE_COLUMNS):
+        p_raw = row.get(p_col)
+        v_raw = row.get(v_col)
+        if is_nullish(p_raw) or is_nullish(v_raw):
+            continue
+        prop_name = p_raw.strip()
+        unit = parse_unit_from_property(prop_name)
+        numeric_value = parse_float(v_raw)
+        text_value = "" if numeric_value is not None else v_raw.strip()
+        source = f"{source_name}:{idx}:{p_col}/{v_col}"
+        props.append((prop_name, unit, numeric_value, text_value, source))
+
+    category = "" if is_nullish(category) else category
+    manufacturer = "" if is_nullish(manufacturer) else manufacturer
+    content = [type_name, component_names, category, manufacturer]
+    for prop_name, unit, num, text_value, _ in props:
+        content.extend((prop_name, unit, "" if num is None else f"{num}", text_value))
+    content_hash = hashlib.sha1("\x1f".join(content).encode("utf-8")).hexdigest()
+
+    return ParsedRow(
+        component=Component(component_id=comp_id, type=type_name, component_names=component_names),
+        category=category,
+        manufacturer=manufacturer,
+        properties=tuple(props),
+        content_hash=content_hash,
+    )
 
-    component_to_manufacturer: List[Tuple[str, str]] = []
-    component_to_category: List[Tuple[str, str]] = []
-    component_properties: List[Tuple[str, str, str, Optional[float], str, str]] = []
-    # tuple: (component_id, property_name, unit, numeric_value, text_value, source)
 
-    for idx, row in enumerate(read_rows(input_path), start=2):  # header is line 1
+def _parse_chunk(source_name: str, chunk: List[Tuple[int, Dict[str, str]]]) -> List[ParsedRow]:
+    parsed: List[ParsedRow] = []
+    for idx, row in chunk:
         try:
-            category = (row.get("component_category") or "").strip()
-            manufacturer = (row.get("manufacturer") or "").strip()
-            type_name = (row.get("type") or "").strip()
-            component_names = (row.get("component_names") or "").strip()
-
-            if is_nullish(category) and is_nullish(manufacturer) and is_nullish(type_name) and is_nullish(component_names):
-                LOGGER.debug("Skipping empty row at line %d", idx)
-                continue
-
-            comp_id = generate_component_id(manufacturer, type_name, component_names)
-            if comp_id not in components:
-                components[comp_id] = Component(
-                    component_id=comp_id,
-                    type=type_name,
-                    component_names=component_names,
-                )
-
-            if not is_nullish(category):
-                categories.add(category)
-                component_to_category.append((comp_id, category))
-
-            if not is_nullish(manufacturer):
-                manufacturers.add(manufacturer)
-                component_to_manufacturer.append((comp_id, manufacturer))
-
-            # Extract up to three property/value pairs
-            for p_col, v_col in zip(PROPERTY_COLUMNS, VALUE_COLUMNS):
-                p_raw = row.get(p_col)
-                v_raw = row.get(v_col)
-                if is_nullish(p_raw) or is_nullish(v_raw):
-                    continue
-                prop_name = p_raw.strip()
-                properties.add(prop_name)
-                unit = parse_unit_from_property(prop_name)
-                numeric_value = parse_float(v_raw)
-                text_value = "" if numeric_value is not None else v_raw.strip()
-                source = f"{input_path.name}:{idx}:{p_col}/{v_col}"
-                component_properties.append(
-                    (comp_id, prop_name, unit, numeric_value, text_value, source)
-                )
+            item = parse_row(idx, row, source_name)
         except Exception:
             LOGGER.exception("Error processing row at line %d", idx)
             raise
+        if item is not None:
+            parsed.append(item)
+    return parsed
 
-    LOGGER.info("Counts -> components=%d, categories=%d, manufacturers=%d, properties=%d, rel_props=%d",
-                len(components), len(categories), len(manufacturers), len(properties), len(component_properties))
 
-    ensure_dir(out_dir)
+def _chunks(input_path: Path, chunk_size: int) -> Iterator[List[Tuple[int, Dict[str, str]]]]:
+    rows = enumerate(read_rows(input_path), start=2)  # header is line 1
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
 
-    # Write reference files
-    write_csv(out_dir / "categories.csv", ["name"], sorted((c,) for c in categories))
-    write_csv(out_dir / "manufacturers.csv", ["name"], sorted((m,) for m in manufacturers))
-    write_csv(out_dir / "properties.csv", ["name"], sorted((p,) for p in properties))
 
-    # Write components
-    write_csv(
-        out_dir / "components.csv",
-        ["id", "type", "component_names"],
-        ((c.component_id, c.type, c.component_names) for c in components.values()),
-    )
+def iter_parsed(input_path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1) -> Iterator[ParsedRow]:
+    """Parse the source in chunks of `chunk_size` rows, in input order.
 
-    # Write relationships
-    write_csv(
-        out_dir / "component_manufacturer.csv",
-        ["component_id", "manufacturer_name"],
-        component_to_manufacturer,
-    )
-    write_csv(
-        out_dir / "component_category.csv",
-        ["component_id", "category_name"],
-        component_to_category,
-    )
-    write_csv(
-        out_dir / "component_properties.csv",
-        ["component_id", "property_name", "unit", "numeric_value", "text_value", "source"],
-        (
-            (
-                comp_id,
-                prop_name,
-                unit,
-                ("" if num is None else f"{num}"),
-                text_value,
-                source,
+    With workers > 1 chunks are parsed in a process pool. At most 2 * workers chunks
+    are in flight and results are consumed in submission order, so memory stays
+    bounded and the output is identical to a single-process run.
+    """
+    source_name = input_path.name
+    if workers <= 1:
+        for chunk in _chunks(input_path, chunk_size):
+            yield from _parse_chunk(source_name, chunk)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending: Deque = deque()
+        for chunk in _chunks(input_path, chunk_size):
+            pending.append(pool.apply_async(_parse_chunk, (source_name, chunk)))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+class StagingWriter:
+    """Writes staging CSVs while rows stream in.
+
+    Components and relationship rows go straight to disk (components in first-seen
+    order, relationships in input order); only the distinct component ids and the
+    small category/manufacturer/property name sets are held in memory. Files are
+    written under a temporary name and renamed by commit(), so a failed run leaves
+    the previous staging files intact.
+
+    If `keep` is given, only rows of those component ids are written.
+    """
+
+    STREAMED = {
+        "components.csv": ["id", "type", "component_names"],
+        "component_manufacturer.csv": ["component_id", "manufacturer_name"],
+        "component_category.csv": ["component_id", "category_name"],
+        "component_properties.csv": ["component_id", "property_name", "unit", "numeric_value", "text_value", "source"],
+    }
+
+    def __init__(self, out_dir: Path, keep: Optional[Set[str]] = None) -> None:
+        ensure_dir(out_dir)
+        self.out_dir = out_dir
+        self.keep = keep
+        self.categories: Set[str] = set()
+        self.manufacturers: Set[str] = set()
+        self.properties: Set[str] = set()
+        self.seen: Set[str] = set()
+        self.rel_props = 0
+        self._stack = ExitStack()
+        self._writers = {}
+        for name, header in self.STREAMED.items():
+            f = self._stack.enter_context(self._tmp_path(name).open("w", newline="", encoding="utf-8"))
+            self._writers[name] = csv.writer(f)
+            self._writers[name].writerow(header)
+
+    def _tmp_path(self, name: str) -> Path:
+        return self.out_dir / f"{name}.tmp"
+
+    def add(self, parsed: ParsedRow) -> None:
+        comp = parsed.component
+        comp_id = comp.component_id
+        if self.keep is not None and comp_id not in self.keep:
+            return
+        if comp_id not in self.seen:
+            self.seen.add(comp_id)
+            self._writers["components.csv"].writerow((comp_id, comp.type, comp.component_names))
+        if parsed.category:
+            self.categories.add(parsed.category)
+            self._writers["component_category.csv"].writerow((comp_id, parsed.category))
+        if parsed.manufacturer:
+            self.manufacturers.add(parsed.manufacturer)
+            self._writers["component_manufacturer.csv"].writerow((comp_id, parsed.manufacturer))
+        for prop_name, unit, num, text_value, source in parsed.properties:
+            self.properties.add(prop_name)
+            self._writers["component_properties.csv"].writerow(
+                (comp_id, prop_name, unit, ("" if num is None else f"{num}"), text_value, source)
             )
-            for (comp_id, prop_name, unit, num, text_value, source) in component_properties
-        ),
+            self.rel_props += 1
+
+    def commit(self) -> None:
+        self._stack.close()
+        for name in self.STREAMED:
+            self._tmp_path(name).replace(self.out_dir / name)
+        # Write reference files
+        write_csv(self.out_dir / "categories.csv", ["name"], sorted((c,) for c in self.categories))
+        write_csv(self.out_dir / "manufacturers.csv", ["name"], sorted((m,) for m in self.manufacturers))
+        write_csv(self.out_dir / "properties.csv", ["name"], sorted((p,) for p in self.properties))
+        LOGGER.info("Counts -> components=%d, categories=%d, manufacturers=%d, properties=%d, rel_props=%d",
+                    len(self.seen), len(self.categories), len(self.manufacturers), len(self.properties), self.rel_props)
+
+    def abort(self) -> None:
+        self._stack.close()
+        for name in self.STREAMED:
+            self._tmp_path(name).unlink(missing_ok=True)
+
+
+def _write_all(writer: StagingWriter, parsed: Iterable[ParsedRow]) -> None:
+    try:
+        for item in parsed:
+            writer.add(item)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.commit()
+
+
+def build_staging(input_path: Path, out_dir: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1) -> None:
+    LOGGER.info("Building staging from: %s (chunk_size=%d, workers=%d)", input_path, chunk_size, workers)
+    _write_all(StagingWriter(out_dir), iter_parsed(input_path, chunk_size, workers))
+
+
+# -- incremental mode ------------------------------------------------------------
+
+MANIFEST_NAME = "manifest.csv"
+
+
+def read_manifest(path: Path) -> Dict[str, str]:
+    if not path.exists():
+        LOGGER.info("No manifest at %s; every component counts as added", path)
+        return {}
+    with path.open(newline="", encoding="utf-8") as f:
+        return {row["component_id"]: row["content_hash"] for row in csv.DictReader(f)}
+
+
+def component_hashes(parsed: Iterable[ParsedRow]) -> Dict[str, str]:
+    """Content hash per component id over all of its rows, in input order."""
+    digests: Dict[str, "hashlib._Hash"] = {}
+    for item in parsed:
+        comp_id = item.component.component_id
+        h = digests.get(comp_id)
+        if h is None:
+            h = digests[comp_id] = hashlib.sha1()
+        h.update(item.content_hash.encode("ascii"))
+    return {comp_id: h.hexdigest() for comp_id, h in digests.items()}
+
+
+def build_delta(input_path: Path, out_dir: Path, chunk_size: int = DEFAULT_CHUNK_SIZE, workers: int = 1) -> None:
+    """Emit staging files for added/changed components only, plus the removed ids.
+
+    Pass 1 hashes every component and diffs against <out>/manifest.csv; pass 2
+    re-streams the source and writes the rows of added/changed components to
+    <out>/delta/. The manifest is replaced only after the delta was written.
+    """
+    manifest_path = out_dir / MANIFEST_NAME
+    delta_dir = out_dir / "delta"
+    LOGGER.info("Building delta from: %s against %s", input_path, manifest_path)
+
+    old = read_manifest(manifest_path)
+    new = component_hashes(iter_parsed(input_path, chunk_size, workers))
+    added = {c for c in new if c not in old}
+    changed = {c for c in new if c in old and old[c] != new[c]}
+    removed = sorted(c for c in old if c not in new)
+    LOGGER.info("Delta -> added=%d, changed=%d, removed=%d, unchanged=%d",
+                len(added), len(changed), len(removed), len(new) - len(added) - len(changed))
+
+    _write_all(StagingWriter(delta_dir, keep=added | changed), iter_parsed(input_path, chunk_size, workers))
+    write_csv(
+        delta_dir / "component_changes.csv",
+        ["component_id", "change"],
+        [(c, "added") for c in sorted(added)] + [(c, "changed") for c in sorted(changed)] + [(c, "removed") for c in removed],
     )
+    write_csv(delta_dir / "removed_components.csv", ["component_id"], ((c,) for c in removed))
+
+    tmp = manifest_path.with_name(MANIFEST_NAME + ".tmp")
+    write_csv(tmp, ["component_id", "content_hash"], sorted(new.items()))
+    tmp.replace(manifest_path)
 
 
 def parse_args() -> argparse.Namespace:
@@ -258,6 +412,23 @@ def parse_args() -> argparse.Namespace:
         default=Path("staging"),
         help="Output directory for staging CSVs (default: staging)",
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Rows parsed per chunk; bounds memory (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parser processes; output is identical for any value (default: 1)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Write only added/changed/removed components to <out>/delta and update <out>/manifest.csv",
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -270,8 +441,12 @@ def main() -> None:
     args = parse_args()
     configure_logging(args.debug)
     try:
-        build_staging(args.input, args.out)
-        LOGGER.info("Staging files written to: %s", args.out.resolve())
+        if args.incremental:
+            build_delta(args.input, args.out, args.chunk_size, args.workers)
+            LOGGER.info("Delta files written to: %s", (args.out / "delta").resolve())
+        else:
+            build_staging(args.input, args.out, args.chunk_size, args.workers)
+            LOGGER.info("Staging files written to: %s", args.out.resolve())
     except Exception as exc:
         LOGGER.exception("Staging preparation failed: %s", exc)
         raise SystemExit(1)